@@ -0,0 +1,260 @@
+# ann.py
+import math
+import numpy as np
+import faiss
+
+# 🔧 Index configuration: "flat" | "hnsw" | "ivf" | "ivfpq" | "ivfsq8"
+INDEX_TYPE = "flat"
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 64
+HNSW_MAX_DEAD = 0.2      # share of removed (tombstoned) HNSW rows that triggers a rebuild
+IVF_NPROBE = 16
+TRAIN_SAMPLE = 100_000  # vectors used to train IVF / PQ quantizers
+MIN_TRAIN_PER_LIST = 39  # FAISS warns below this many points per centroid
+
+INDEX_TYPES = ("flat", "hnsw", "ivf", "ivfpq", "ivfsq8")
+
+
+def ideal_nlist(n):
+    """~4·sqrt(n) inverted lists, bounded so training stays meaningful."""
+    return int(min(65536, max(16, 4 * math.sqrt(max(n, 1)))))
+
+
+def trainable_nlist(ntotal, n_train):
+    """Inverted lists for `ntotal` vectors, capped by what `n_train` training vectors support."""
+    return min(ideal_nlist(ntotal), n_train // MIN_TRAIN_PER_LIST)
+
+
+def _pq_m(dim):
+    # Largest sub-quantizer count that divides dim with >= 4 dims per sub-vector
+    for m in (64, 48, 32, 24, 16, 12, 8, 4):
+        if dim % m == 0 and dim // m >= 4:
+            return m
+    return 1
+
+
+def needs_training(kind):
+    return kind.startswith("ivf")
+
+
+def min_train_vectors(kind):
+    """Fewest vectors `kind` is trained on; make_index builds a flat index below that."""
+    if not needs_training(kind):
+        return 0
+    # 16 lists at least, and 256 PQ centroids per sub-quantizer for ivfpq
+    return (256 if kind == "ivfpq" else 16) * MIN_TRAIN_PER_LIST
+
+
+def make_index(dim, kind=None, train_vectors=None, ntotal=None):
+    """
+    Build an empty index of the requested kind (inner-product metric) that
+    accepts add_with_ids/remove_ids with our own ids.
+
+    Flat and HNSW are wrapped in IndexIDMap2. IVF variants store ids
+    natively and are returned bare: wrapping them would break remove_ids,
+    since IVF doesn't renumber its internal ids. They are trained on
+    `train_vectors`, and `ntotal` (expected corpus size) picks nlist. Falls
+    back to a flat index when there is too little data to train on.
+    """
+    kind = kind or INDEX_TYPE
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{kind}', expected one of {INDEX_TYPES}")
+
+    metric = faiss.METRIC_INNER_PRODUCT
+    if kind == "flat":
+        inner = faiss.IndexFlatIP(dim)
+    elif kind == "hnsw":
+        inner = faiss.IndexHNSWFlat(dim, HNSW_M, metric)
+        inner.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        inner.hnsw.efSearch = HNSW_EF_SEARCH
+    else:
+        n_train = 0 if train_vectors is None else len(train_vectors)
+        nlist = trainable_nlist(ntotal or n_train, n_train)
+        if n_train < min_train_vectors(kind):
+            print(f"⚠ Only {n_train} training vectors, using a flat index instead of '{kind}'")
+            return make_index(dim, "flat")
+
+        quantizer = faiss.IndexFlatIP(dim)
+        if kind == "ivf":
+            inner = faiss.IndexIVFFlat(quantizer, dim, nlist, metric)
+        elif kind == "ivfpq":
+            inner = faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_m(dim), 8, metric)
+        else:
+            inner = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, faiss.ScalarQuantizer.QT_8bit, metric)
+        inner.train(np.ascontiguousarray(train_vectors, dtype="float32"))
+        inner.nprobe = min(IVF_NPROBE, nlist)
+        return inner
+
+    return faiss.IndexIDMap2(inner)
+
+
+def _inner(index):
+    return faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+
+
+def is_id_mapped(index):
+    """True for indexes whose search results are our own (chunk) ids."""
+    return isinstance(index, (faiss.IndexIDMap2, faiss.IndexIVF))
+
+
+def index_kind(index):
+    inner = _inner(index)
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(inner, faiss.IndexIVFScalarQuantizer):
+        return "ivfsq8"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def supports_remove(index):
+    return index_kind(index) != "hnsw"
+
+
+def dead_rows(index):
+    """Tombstoned rows of an HNSW index: removed ids whose vectors are still in the graph."""
+    if index is None or index_kind(index) != "hnsw":
+        return 0
+    return int(np.count_nonzero(faiss.vector_to_array(index.id_map) < 0))
+
+
+def live_count(index):
+    return index.ntotal - dead_rows(index)
+
+
+def stored_ids(index):
+    """
+    Every id in the index. For IndexIDMap2 they come in internal (row)
+    order, so position i is the row FAISS reports before id translation.
+    """
+    if isinstance(index, faiss.IndexIVF):
+        # Ids live in the inverted lists
+        invlists = index.invlists
+        return np.concatenate([np.zeros(0, dtype="int64")] + [
+            faiss.rev_swig_ptr(invlists.get_ids(l), invlists.list_size(l)).copy()
+            for l in range(index.nlist) if invlists.list_size(l)
+        ])
+    if isinstance(index, faiss.IndexIDMap2):
+        return faiss.vector_to_array(index.id_map)
+    return np.arange(index.ntotal, dtype="int64")  # legacy positional index
+
+
+def stored_vectors(index, batch=100_000):
+    """Yield (vectors, ids) slices of everything stored in the index."""
+    ids = stored_ids(index)
+    if isinstance(index, faiss.IndexIVF):
+        # A hashtable direct map makes IVF vectors reconstructable by id
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        for start in range(0, len(ids), batch):
+            yield index.reconstruct_batch(ids[start:start + batch]), ids[start:start + batch]
+        return
+
+    inner = _inner(index)
+    for start in range(0, index.ntotal, batch):
+        n = min(batch, index.ntotal - start)
+        yield inner.reconstruct_n(start, n), ids[start:start + n]
+
+
+def convert_index(index, kind=None):
+    """
+    Rebuild an ID-mapped index as `kind`, training on a sample of its own
+    vectors. Tombstoned HNSW rows are dropped on the way.
+    """
+    kind = kind or INDEX_TYPE
+    train = None
+    if needs_training(kind):
+        rng = np.random.default_rng(0)
+        take = np.sort(rng.choice(index.ntotal, min(TRAIN_SAMPLE, index.ntotal), replace=False))
+        parts = []
+        offset = 0
+        for vectors, _ in stored_vectors(index):
+            rows = take[(take >= offset) & (take < offset + len(vectors))] - offset
+            parts.append(vectors[rows])
+            offset += len(vectors)
+        train = np.concatenate(parts)
+
+    new_index = make_index(index.d, kind, train_vectors=train, ntotal=index.ntotal)
+    for vectors, ids in stored_vectors(index):
+        keep = ids >= 0
+        vectors, ids = vectors[keep], ids[keep]
+        if len(ids):
+            new_index.add_with_ids(np.ascontiguousarray(vectors), ids)
+    return new_index
+
+
+def remove_ids(index, ids):
+    """
+    Remove ids in place and return the index to keep using.
+
+    HNSW can't delete, so its rows are tombstoned instead: their id becomes
+    -1, which FilterIndex never matches and searches skip (see
+    dead_rows). ensure_index_type rebuilds the graph once more than
+    HNSW_MAX_DEAD of it is dead, so a watcher update of one file costs an
+    id-map rewrite rather than a rebuild.
+    """
+    ids = np.asarray(ids, dtype="int64")
+    if not len(ids):
+        return index
+    if supports_remove(index):
+        index.remove_ids(ids)
+        return index
+    id_map = faiss.vector_to_array(index.id_map)
+    dead = np.isin(id_map, ids)
+    if dead.any():
+        id_map[dead] = -1
+        faiss.copy_array_to_vector(id_map, index.id_map)
+        index.construct_rev_map()
+    return index
+
+
+def ensure_index_type(index, kind=None):
+    """
+    Convert to the configured type, retrain IVF once the corpus has outgrown
+    its lists, or compact an HNSW index that is more than HNSW_MAX_DEAD dead.
+    """
+    kind = kind or INDEX_TYPE
+    if index is None or index.ntotal == 0:
+        return index
+    current = index_kind(index)
+    if index.ntotal < min_train_vectors(kind):
+        return index  # too small to train, stay exact
+    if current != kind:
+        print(f"🔁 Converting FAISS index {current} → {kind} ({index.ntotal} vectors)...")
+        return convert_index(index, kind)
+    dead = dead_rows(index)
+    if dead > HNSW_MAX_DEAD * index.ntotal:
+        print(f"🔁 Compacting {kind} index: {dead} of {index.ntotal} vectors were removed...")
+        return convert_index(index, kind)
+    if needs_training(kind):
+        nlist = index.nlist
+        if trainable_nlist(index.ntotal, min(index.ntotal, TRAIN_SAMPLE)) > 4 * nlist:
+            print(f"🔁 Retraining {kind} index: {nlist} lists is too few for {index.ntotal} vectors...")
+            return convert_index(index, kind)
+    return index
+
+
+def search_params(index, nprobe=None, ef_search=None, sel=None):
+    """
+    Per-query FAISS SearchParameters (thread-safe, unlike mutating the index).
+    `sel` is an optional faiss.IDSelector restricting the search; the
+    index's own efSearch / nprobe still apply unless overridden.
+    Returns None when the defaults stored in the index should be used.
+    """
+    kind = index_kind(index)
+    if kind == "hnsw" and (ef_search or sel is not None):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = int(ef_search or _inner(index).hnsw.efSearch)
+    elif needs_training(kind) and (nprobe or sel is not None):
+        params = faiss.SearchParametersIVF()
+        params.nprobe = int(nprobe or _inner(index).nprobe)
+    elif sel is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+    if sel is not None:
+        params.sel = sel
+    return params
@@ -1,12 +1,17 @@
 import os
 import time
 import json
-import pickle
 from flask import Flask
-from embedder import Embedder
-from reader import read_file_content
-from db import init_db, insert_documents
-import faiss
+from embedder import get_embedder, EmbeddingEngine
+from embed_cache import CachedEmbedder
+from extraction import extract_files, EXTRACT_WORKERS, EXTRACT_TIMEOUT
+from db import init_db, get_paths_under
+from pipeline import run_pipeline, build_index, INDEX_LOCK
+from store import STORE_DIR
+from shards import index_exists
+from watcher import Watcher
+from walker import ExclusionRules, walk_roots
+from filters import get_folder_category
 
 app = Flask(__name__)
 
@@ -24,58 +29,72 @@ EXCLUDED_DIRS = [
     "site-packages", "Lib", "dist", "build", ".mypy_cache"
 ]
 
-INDEX_PATH = "Aaryan_store/index.faiss"
-META_PATH = "Aaryan_store/meta.pkl"
+WATCH_FILES = True      # keep the index fresh from filesystem events after the first scan
+WATCH_POLLING = False   # force the polling fallback (e.g. network drives without inotify)
 
-embedder = Embedder()
+embedder = get_embedder()  # shared, loads on first use
+# Indexing goes through the on-disk cache so unchanged text is never re-encoded,
+# and cache misses through the length-bucketed multi-process engine
+index_embedder = CachedEmbedder(EmbeddingEngine(embedder))
+
+# Exact folder-name matching, compiled once
+_exclusions = ExclusionRules(EXCLUDED_DIRS)
 
 # ✅ Check if a path should be excluded
 def should_exclude(path):
-    return any(excl.lower() in path.lower() for excl in EXCLUDED_DIRS)
-
-# ✅ Get category based on folder name
-def get_folder_category(path):
-    parts = path.lower().split(os.sep)
-    for folder in ["downloads", "documents", "desktop", "pictures", "videos", "music"]:
-        if folder in parts:
-            return folder.capitalize()
-    return "Other"
+    return _exclusions.match_path(path)
+
+# ✅ Whether a file path is something we index
+def is_indexable(path):
+    return os.path.splitext(path)[1].lower() in VALID_EXTS and not should_exclude(path)
+
+# ✅ Metadata for one file, or None if it can't be read
+def file_meta(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return {
+        "filename": os.path.basename(path),
+        "path": path,
+        "extension": os.path.splitext(path)[1].lower(),
+        "size": st.st_size,
+        "modified": st.st_mtime,
+    }
+
+# ✅ The SCAN_DIRS entry a path lives under
+def scan_root(path):
+    for root in SCAN_DIRS:
+        if path.startswith(root):
+            return root
+    return os.path.dirname(path)
+
+# ✅ Walk SCAN_DIRS, or some of them (concurrently) and yield (root, metadata) for every indexable file.
+# Directories that can't be listed are appended to `unlisted`
+def walk_files(roots=None, unlisted=None):
+    roots = roots or SCAN_DIRS
+    for root in roots:
+        print(f"📁 Scanning {root}")
+    yield from walk_roots(roots, VALID_EXTS, _exclusions, unlisted)
 
-# ✅ Scan files recursively from SCAN_DIRS
-def scan_files():
+# ✅ Extract content for walked files, returns the {path: metadata} dict
+def extract_documents(walked, workers=EXTRACT_WORKERS, timeout=EXTRACT_TIMEOUT):
     files = {}
     folder_counts = {}
     drive_counts = {}
 
-    print("🔍 Starting file scan...")
-    for root in SCAN_DIRS:
-        print(f"📁 Scanning {root}")
-        drive_counts[root] = 0
-        for dirpath, dirnames, filenames in os.walk(root):
-            dirnames[:] = [d for d in dirnames if not should_exclude(os.path.join(dirpath, d))]
-            for file in filenames:
-                path = os.path.join(dirpath, file)
-                ext = os.path.splitext(file)[1].lower()
-                if ext in VALID_EXTS and os.path.exists(path):
-                    try:
-                        content = read_file_content(path)
-                        files[path] = {
-                            "filename": file,
-                            "path": path,
-                            "extension": ext,
-                            "size": os.path.getsize(path),
-                            "modified": os.path.getmtime(path),
-                            "content": content
-                        }
-
-                        # Folder count
-                        category = get_folder_category(path)
-                        folder_counts[category] = folder_counts.get(category, 0) + 1
-
-                        # Drive count
-                        drive_counts[root] += 1
-                    except:
-                        continue
+    # ✅ Walk on this thread, extract on the process/thread pools
+    items = ((meta["path"], (root, meta)) for root, meta in walked)
+    for path, (root, meta), content in extract_files(items, workers=workers, timeout=timeout):
+        meta["content"] = content
+        files[path] = meta
+
+        # Folder count
+        category = get_folder_category(path)
+        folder_counts[category] = folder_counts.get(category, 0) + 1
+
+        # Drive count
+        drive_counts[root] = drive_counts.get(root, 0) + 1
 
     # ✅ Scan Summary
     print(f"\n📊 Scan Summary:")
@@ -83,28 +102,86 @@ def scan_files():
         print(f"  📂 {drive} → {count} files")
     for folder, count in folder_counts.items():
         print(f"  📁 {folder}: {count} files")
+    return files
+
+# ✅ Scan files recursively from SCAN_DIRS
+def scan_files(workers=EXTRACT_WORKERS, timeout=EXTRACT_TIMEOUT):
+    print("🔍 Starting file scan...")
+    files = extract_documents(walk_files(), workers=workers, timeout=timeout)
     print(f"\n✅ File scan complete. Total valid files found: {len(files)}")
     return files
 
-# ✅ Create and save FAISS index
+# ✅ Create and save a fresh FAISS index from a scanned {path: metadata} dict
 def index_documents(documents: dict):
-    texts = [v["content"] if v["content"] else v["filename"] for v in documents.values()]
-    paths = list(documents.keys())
-
-    print(f"🧠 Starting embedding for {len(texts)} documents...")
-    vectors = embedder.embed_texts(texts)
-    print("✅ Embedding complete.")
-
-    faiss.normalize_L2(vectors)
-    index = faiss.IndexFlatIP(vectors.shape[1])
-    index.add(vectors)
-
-    os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
-    faiss.write_index(index, INDEX_PATH)
-    with open(META_PATH, "wb") as f:
-        pickle.dump(paths, f)
-
-    print(f"✅ FAISS index saved to '{INDEX_PATH}'. Total documents indexed: {len(paths)}")
+    print(f"🧠 Starting embedding for {len(documents)} documents...")
+    try:
+        indexed, shard_count = build_index(documents, index_embedder, roots=SCAN_DIRS)
+    finally:
+        index_embedder.close()
+    print(f"✅ FAISS index saved to '{STORE_DIR}' ({shard_count} shards). Total documents indexed: {indexed}")
+
+# ✅ Streamed (re-)index: only new or changed files unless full=True
+def refresh_index(full=False, workers=EXTRACT_WORKERS, timeout=EXTRACT_TIMEOUT, stop=None, progress=None,
+                  roots=None):
+    """
+    Diff the filesystem against the documents table and stream new or changed
+    files through extract → embed → DB → FAISS in fixed-size batches. Vectors
+    of deleted files are dropped. Partial results become searchable at every
+    pipeline checkpoint.
+
+    `roots` limits the run to some of SCAN_DIRS: only their shards are
+    loaded and rewritten, searches over the other roots are unaffected.
+
+    Returns:
+        dict: counts of added/updated/deleted/unchanged files.
+    """
+    print("🔍 Starting streamed scan + index...")
+    roots = [root for root in SCAN_DIRS if root in roots] if roots else []
+    roots = roots or SCAN_DIRS
+    unlisted = []
+    with INDEX_LOCK:
+        try:
+            stats = run_pipeline(walk_files(roots, unlisted), index_embedder, full=full, workers=workers,
+                                 timeout=timeout, stop=stop, progress=progress, roots=roots, unlisted=unlisted)
+        finally:
+            index_embedder.close()  # watcher updates are small and encode in-process
+
+    print("\n📊 Scan Summary:")
+    for drive, count in stats["drives"].items():
+        print(f"  📂 {drive} → {count} files processed")
+    print(f"✅ Index refresh complete: {stats['added']} added, {stats['updated']} updated, "
+          f"{stats['deleted']} deleted, {stats['unchanged']} unchanged")
+    print(f"🧠 Embedding cache: {index_embedder.hits} hits, {index_embedder.misses} encoded")
+    return stats
+
+# ✅ Targeted update from the watcher: re-index changed files, drop deleted ones
+def index_changes(changed, deleted=(), deleted_dirs=()):
+    walked = []
+    gone = set(deleted)
+    for path in changed:
+        meta = file_meta(path)
+        if meta is None:
+            gone.add(path)  # vanished again before we got to it
+        else:
+            walked.append((scan_root(path), meta))
+    for directory in deleted_dirs:
+        gone.update(get_paths_under(directory))
+
+    with INDEX_LOCK:
+        stats = run_pipeline(walked, index_embedder, deleted=gone, roots=SCAN_DIRS)
+    print(f"✅ Watcher update: {stats['added']} added, {stats['updated']} updated, "
+          f"{stats['deleted']} deleted, {stats['unchanged']} unchanged")
+    return stats
+
+_watcher = None
+
+# ✅ Start watching SCAN_DIRS (once per process)
+def start_watcher(polling=WATCH_POLLING):
+    global _watcher
+    if _watcher is None:
+        _watcher = Watcher(SCAN_DIRS, index_changes, accept=is_indexable, exclude=should_exclude,
+                           rescan=refresh_index, polling=polling).start()
+    return _watcher
 
 # ✅ Simple API test route
 @app.route("/")
@@ -115,16 +192,12 @@ def index():
 if __name__ == "__main__":
     init_db()
 
-    if not os.path.exists(INDEX_PATH) or not os.path.exists(META_PATH):
+    if not index_exists():
         print("📡 Starting full scan + index process...")
-        docs = scan_files()
-        if not docs:
-            print("⚠ No valid files to index.")
-        else:
-            inserted = insert_documents(docs)
-            print(f"🗃 Metadata inserted into DB: {inserted}")
-            index_documents(docs)
     else:
-        print("📦 Existing FAISS index found. Skipping re-indexing.")
+        print("📦 Existing FAISS index found. Refreshing changed files only...")
+    refresh_index()
+    if WATCH_FILES:
+        start_watcher()
 
     app.run(port=5001)
@@ -1,20 +1,34 @@
-from flask import Flask, request, jsonify
-from embedder import Embedder
-from search import search_documents
-from db import init_db, insert_documents
-from api import scan_files, index_documents
-import os
-import pickle
+from flask import Flask, Response, request, jsonify
+from embedder import get_embedder, warm_up_async
+from metrics import registry
+from filters import SearchFilter
+from search import SEARCH_MODES, parse_batch, search_batch, search_documents, searcher
+from db import init_db
+from api import refresh_index, start_watcher, WATCH_FILES, SCAN_DIRS
+from jobs import JobManager
+from shards import index_exists
 
 app = Flask(__name__)
-embedder = Embedder()
-
-INDEX_PATH = "Aaryan_store/index.faiss"
-META_PATH = "Aaryan_store/meta.pkl"
+embedder = get_embedder()  # shared with api.py, loads on first use
 
 # ✅ Track T&C acceptance in memory
 ACCEPTED = {"user": False}
 
+
+def run_index_job(stop, progress, full=False, roots=None):
+    init_db()
+    # ✅ Streams new/changed files into the index (everything if "full" is set,
+    # only the given scan roots' shards if "roots" is)
+    stats = refresh_index(full=full, stop=stop, progress=progress, roots=roots)
+    searcher.invalidate()
+    if WATCH_FILES and not stop.is_set():
+        start_watcher()  # from here on, saves show up within seconds without a rescan
+    return stats
+
+
+# ✅ Scans run on a background worker; /accept only enqueues them
+jobs = JobManager(run_index_job)
+
 @app.route("/accept", methods=["POST"])
 def accept_terms():
     data = request.get_json()
@@ -22,21 +36,43 @@ def accept_terms():
         return jsonify({"error": "Terms not accepted"}), 400
 
     ACCEPTED["user"] = True
-    print("✅ Terms accepted. Starting scan...")
+    roots = data.get("roots")
+    if roots is not None and not (isinstance(roots, list) and all(root in SCAN_DIRS for root in roots)):
+        return jsonify({"error": f'"roots" must be a list of scan directories from {SCAN_DIRS}'}), 400
+    job, created = jobs.submit(full=bool(data.get("full")), roots=roots or None)
+    print(f"✅ Terms accepted. Scan job {job.id} {'queued' if created else 'already ' + job.status}")
+    return jsonify({
+        "message": "✅ Scan started" if created else "⏳ A scan is already in progress",
+        "job_id": job.id,
+        "status_url": f"/jobs/{job.id}",
+        "job": job.to_dict(),
+    }), 202
 
-    init_db()
-    docs = scan_files()
-    if not docs:
-        return jsonify({"message": "⚠ No valid files found to index."})
-    inserted = insert_documents(docs)
-    index_documents(docs)
-    return jsonify({"message": f"✅ Scan complete. Indexed: {inserted} files"})
+@app.route("/jobs", methods=["GET"])
+def list_jobs():
+    return jsonify({"jobs": [j.to_dict() for j in jobs.all_jobs()]})
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.to_dict())
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.to_dict())
 
 @app.route("/status")
 def check_status():
+    active = jobs.active_job()
     return jsonify({
         "termsAccepted": ACCEPTED["user"],
-        "indexExists": os.path.exists(INDEX_PATH) and os.path.exists(META_PATH)
+        "indexExists": index_exists(),
+        "activeJob": active.to_dict() if active else None,
     })
 
 @app.route("/search", methods=["GET"])
@@ -47,16 +83,64 @@ def search():
     query = request.args.get("q", "").strip()
     if not query:
         return jsonify({"error": "No query provided"}), 400
+    mode = request.args.get("mode", "vector")
+    if mode not in SEARCH_MODES:
+        return jsonify({"error": f"mode must be one of {', '.join(SEARCH_MODES)}"}), 400
+    # ✅ Optional filters: ext=pdf,docx  category=Downloads  modified_after / modified_before=YYYY-MM-DD
+    try:
+        filters = SearchFilter.from_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
+    # ?timings=1 adds this request's per-stage breakdown (ms) to the response
+    timings = {} if request.args.get("timings") else None
     try:
-        results = search_documents(query, embedder)
+        results = search_documents(
+            query, embedder,
+            nprobe=request.args.get("nprobe", type=int),
+            ef_search=request.args.get("ef", type=int),
+            mode=mode,
+            timings=timings,
+            filters=filters,
+        )
+        if timings is not None:
+            return jsonify({"results": results, "timings": timings})
         return jsonify({"results": results})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/search/batch", methods=["POST"])
+def search_batch_route():
+    if not ACCEPTED["user"]:
+        return jsonify({"error": "Terms not accepted"}), 403
+
+    # ✅ {"queries": ["...", {"q": "...", "top_k": 10, "ext": "pdf"}], "mode": "hybrid", ...}
+    try:
+        batch = parse_batch(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    timings = {} if request.args.get("timings") else None
+    try:
+        results = search_batch(batch, embedder, timings=timings)
+        if timings is not None:
+            return jsonify({"results": results, "timings": timings})
+        return jsonify({"results": results})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/metrics")
+def metrics():
+    # Prometheus text format; ?format=json adds the slowest files and recent failures
+    if request.args.get("format") == "json":
+        return jsonify(registry.snapshot())
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route("/")
 def root():
     return "📁 Document Finder API running. Awaiting T&C acceptance."
 
 if __name__ == "__main__":
-    app.run(port=5000)
+    warm_up_async()  # serve right away, the model loads in the background
+    jobs.start()  # resumes jobs interrupted by a restart
+    app.run(port=5000, threaded=True)
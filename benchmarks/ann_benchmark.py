@@ -0,0 +1,123 @@
+# benchmarks/ann_benchmark.py
+"""
+Recall/latency benchmark for the index types in ann.py.
+
+Builds synthetic, clustered 384-d corpora, uses an exact IndexFlatIP as
+ground truth and reports recall@k plus p50/p99 single-query latency for
+each index type and search setting as JSON.
+
+Usage:
+    python benchmarks/ann_benchmark.py --sizes 10000,100000,1000000 --out ann.json
+    python benchmarks/ann_benchmark.py --sizes 5000000 --types hnsw,ivfpq   # needs ~8 GB RAM
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import faiss
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ann  # noqa: E402
+
+
+def synthetic_corpus(n, dim, n_queries, seed=0, clusters=1000, chunk=500_000):
+    """Gaussian blobs around random centres, L2-normalised like real embeddings."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype("float32")
+    parts = []
+    for start in range(0, n, chunk):
+        m = min(chunk, n - start)
+        x = centres[rng.integers(0, clusters, m)] + 0.6 * rng.standard_normal((m, dim)).astype("float32")
+        parts.append(x)
+    base = np.concatenate(parts)
+    faiss.normalize_L2(base)
+    queries = centres[rng.integers(0, clusters, n_queries)] + 0.6 * rng.standard_normal((n_queries, dim)).astype("float32")
+    faiss.normalize_L2(queries)
+    return base, queries
+
+
+def build(kind, base, ids):
+    start = time.perf_counter()
+    if ann.needs_training(kind):
+        sample = base[np.random.default_rng(1).choice(len(base), min(ann.TRAIN_SAMPLE, len(base)), replace=False)]
+        index = ann.make_index(base.shape[1], kind, train_vectors=sample, ntotal=len(base))
+    else:
+        index = ann.make_index(base.shape[1], kind)
+    for s in range(0, len(base), 100_000):
+        index.add_with_ids(base[s:s + 100_000], ids[s:s + 100_000])
+    return index, time.perf_counter() - start
+
+
+def measure(index, queries, truth, k, params):
+    latencies = []
+    found = 0
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        _, I = index.search(queries[i:i + 1], k, params=params)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found += len(np.intersect1d(I[0], truth[i]))
+    lat = np.array(latencies)
+    return {
+        "recall_at_k": round(found / (len(queries) * k), 4),
+        "p50_ms": round(float(np.percentile(lat, 50)), 3),
+        "p99_ms": round(float(np.percentile(lat, 99)), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", default="flat,hnsw,ivf,ivfpq,ivfsq8")
+    parser.add_argument("--nprobe", default="4,16,64")
+    parser.add_argument("--ef", default="32,64,128")
+    parser.add_argument("--threads", type=int, default=1, help="FAISS OpenMP threads (1 = per-query latency)")
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(args.threads)
+    report = {"dim": args.dim, "k": args.k, "queries": args.queries, "threads": args.threads, "runs": []}
+
+    for n in [int(s) for s in args.sizes.split(",")]:
+        print(f"📦 Generating {n} x {args.dim} corpus...", file=sys.stderr)
+        base, queries = synthetic_corpus(n, args.dim, args.queries)
+        ids = np.arange(n, dtype="int64")
+
+        exact = faiss.IndexFlatIP(args.dim)
+        exact.add(base)
+        _, truth = exact.search(queries, args.k)
+        del exact
+
+        for kind in args.types.split(","):
+            index, build_s = build(kind, base, ids)
+            if kind == "hnsw":
+                settings = [("ef_search", int(v)) for v in args.ef.split(",")]
+            elif ann.needs_training(kind):
+                settings = [("nprobe", int(v)) for v in args.nprobe.split(",")]
+            else:
+                settings = [(None, None)]
+
+            for name, value in settings:
+                params = ann.search_params(index, **({name: value} if name else {}))
+                run = {"n": n, "type": ann.index_kind(index), "build_s": round(build_s, 2)}
+                if name:
+                    run[name] = value
+                run.update(measure(index, queries, truth, args.k, params))
+                report["runs"].append(run)
+                print(f"  {run}", file=sys.stderr)
+            del index
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,463 @@
+# benchmarks/e2e_benchmark.py
+"""
+End-to-end benchmark: generates a reproducible synthetic corpus and times
+each stage of the indexing and search path separately.
+
+Stages: walk → read_file_content per extension → parallel extraction →
+chunk + embed → insert_documents → FAISS build (per index type) →
+search_documents latency under concurrent load (per search mode) →
+filtered vector search (extension / date filters pushed into FAISS).
+Search runs are reported twice: with a cold query-vector cache, then warm.
+
+Everything runs offline in a scratch directory (the real Aaryan_store and
+Aaryan_database.db are never touched). `--embedder stub` swaps the model
+for a deterministic hashing embedder so it also runs without model weights.
+Image files are only OCR'd when a tesseract binary is found.
+
+Usage:
+    python benchmarks/e2e_benchmark.py --files 2000 --out e2e.json
+    python benchmarks/e2e_benchmark.py --embedder model --concurrency 1,8,32
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import hashlib
+import argparse
+import platform
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+# Share of generated files per extension
+MIX = {".txt": 0.35, ".py": 0.2, ".pdf": 0.15, ".docx": 0.12, ".xlsx": 0.08, ".png": 0.1}
+FOLDERS = ["Documents", "Downloads", "Desktop", "Projects", "Pictures"]
+EXCLUDED_DIRS = ["node_modules", ".git", "__pycache__"]  # generated too, the walk must prune them
+
+_VOCAB = None
+
+
+def vocabulary(seed=0, size=5000):
+    """Pseudo-words with a Zipf-like frequency so keyword search has realistic skew."""
+    global _VOCAB
+    if _VOCAB is None:
+        rng = random.Random(seed)
+        letters = "abcdefghijklmnopqrstuvwxyz"
+        words = sorted({"".join(rng.choice(letters) for _ in range(rng.randint(3, 10))) for _ in range(size)})
+        weights = [1 / (rank + 1) for rank in range(len(words))]
+        _VOCAB = (words, weights)
+    return _VOCAB
+
+
+def sentence(rng, n):
+    words, weights = vocabulary()
+    return " ".join(rng.choices(words, weights, k=n))
+
+
+# ✅ File generators
+def write_txt(path, rng):
+    lines = [sentence(rng, rng.randint(8, 20)) for _ in range(rng.randint(5, 200))]
+    with open(path, "w") as f:
+        f.write("\n".join(lines))
+
+
+def write_py(path, rng):
+    body = []
+    for i in range(rng.randint(2, 30)):
+        name = sentence(rng, 1)
+        body.append(f"def {name}_{i}(x):\n    \"\"\"{sentence(rng, 12)}\"\"\"\n    return x + {i}\n")
+    with open(path, "w") as f:
+        f.write("\n".join(body))
+
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, rng):
+    """Minimal one-page PDF with Helvetica text, so no PDF writer library is needed."""
+    lines = [sentence(rng, rng.randint(6, 12)) for _ in range(rng.randint(10, 60))]
+    text = "\n".join(f"({_pdf_escape(line)}) Tj T*" for line in lines)
+    stream = f"BT /F1 10 Tf 12 TL 40 800 Td\n{text}\nET".encode("latin-1", "replace")
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_docx(path, rng):
+    from docx import Document
+    doc = Document()
+    for _ in range(rng.randint(3, 40)):
+        doc.add_paragraph(sentence(rng, rng.randint(10, 30)))
+    doc.save(path)
+
+
+def write_xlsx(path, rng):
+    import openpyxl
+    wb = openpyxl.Workbook()
+    sheet = wb.active
+    for _ in range(rng.randint(5, 100)):
+        sheet.append([sentence(rng, 2), rng.randint(0, 10_000), round(rng.random() * 100, 2), sentence(rng, 4)])
+    wb.save(path)
+
+
+def write_png(path, rng):
+    from PIL import Image, ImageDraw
+    img = Image.new("RGB", (900, 260), "white")
+    draw = ImageDraw.Draw(img)
+    for row in range(6):
+        draw.text((20, 20 + row * 38), sentence(rng, 6), fill="black")
+    img.save(path)
+
+
+GENERATORS = {".txt": write_txt, ".py": write_py, ".pdf": write_pdf,
+              ".docx": write_docx, ".xlsx": write_xlsx, ".png": write_png}
+
+
+def generate_corpus(root, n_files, seed=0):
+    """Nested folders with a fixed extension mix; same seed → same corpus."""
+    rng = random.Random(seed)
+    counts = {ext: 0 for ext in MIX}
+    skipped = {}
+    exts = rng.choices(list(MIX), list(MIX.values()), k=n_files)
+    for i, ext in enumerate(exts):
+        if ext in skipped:
+            continue
+        depth = rng.randint(0, 3)
+        folder = os.path.join(root, rng.choice(FOLDERS), *[f"d{rng.randint(0, 9)}" for _ in range(depth)])
+        os.makedirs(folder, exist_ok=True)
+        try:
+            GENERATORS[ext](os.path.join(folder, f"file{i}{ext}"), rng)
+            counts[ext] += 1
+        except ImportError as e:
+            skipped[ext] = f"generator needs {e.name}"
+
+    # Noise the walker has to prune
+    for excluded in EXCLUDED_DIRS:
+        folder = os.path.join(root, "Projects", "app", excluded)
+        os.makedirs(folder, exist_ok=True)
+        for i in range(50):
+            with open(os.path.join(folder, f"noise{i}.py"), "w") as f:
+                f.write("x = 1\n")
+    return counts, skipped
+
+
+class StubEmbedder:
+    """Deterministic hashed bag-of-words vectors: no weights, no network."""
+    model_name = "stub-hash"
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def embed_texts(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                h = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+                out[row, h % self.dim] += 1.0 if (h >> 32) & 1 else -1.0
+        return out
+
+
+class ReplayEmbedder:
+    """Serves vectors computed in the embed stage so later stages don't re-embed."""
+
+    def __init__(self, embedder, cache):
+        self.embedder = embedder
+        self.cache = cache
+
+    def embed_texts(self, texts):
+        missing = [t for t in texts if t not in self.cache]
+        if missing:
+            self.cache.update(zip(missing, self.embedder.embed_texts(missing)))
+        return np.stack([self.cache[t] for t in texts]).astype("float32")
+
+
+def percentiles(values_ms):
+    values = np.asarray(values_ms)
+    if not len(values):
+        return {}
+    return {
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def log(message):
+    print(message, file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embedder", choices=("stub", "model"), default="stub")
+    parser.add_argument("--embed-batch", type=int, default=64)
+    parser.add_argument("--index-types", default="flat,hnsw", help="FAISS types to build and time")
+    parser.add_argument("--search-index", default="flat", help="type used for the search stage")
+    parser.add_argument("--modes", default="vector,keyword,hybrid")
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--queries", type=int, default=200, help="queries per concurrency level and mode")
+    parser.add_argument("--workers", type=int, help="extraction processes (default: extraction.EXTRACT_WORKERS)")
+    parser.add_argument("--tesseract", default=shutil.which("tesseract"), help="tesseract binary for image OCR")
+    parser.add_argument("--workdir", help="scratch directory to keep (default: a temp dir, removed afterwards)")
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    if args.out:
+        args.out = os.path.abspath(args.out)
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="docfinder-bench-"))
+    os.makedirs(workdir, exist_ok=True)
+    corpus = os.path.join(workdir, "corpus")
+    os.chdir(workdir)  # DB and store paths are relative: keep them in the scratch dir
+
+    import reader
+    import ann
+    import db
+    from chunker import chunk_text
+    from extraction import extract_files, EXTRACT_WORKERS
+    from pipeline import index_batch, BATCH_SIZE
+    from store import save_store
+    from shards import ShardSet
+    from walker import ExclusionRules, walk_roots
+
+    if args.tesseract:
+        reader.pytesseract.pytesseract.tesseract_cmd = args.tesseract
+    ocr = bool(args.tesseract)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "files": args.files,
+        "seed": args.seed,
+        "embedder": args.embedder,
+        "ocr": ocr,
+        "stages": {},
+    }
+    stages = report["stages"]
+
+    # ✅ Corpus
+    start = time.perf_counter()
+    if not os.path.isdir(corpus):
+        counts, skipped = generate_corpus(corpus, args.files, args.seed)
+        stages["generate"] = {"seconds": round(time.perf_counter() - start, 3), "by_extension": counts,
+                              "skipped": skipped}
+        log(f"📦 Generated {sum(counts.values())} files in {stages['generate']['seconds']}s")
+
+    # ✅ Walk
+    start = time.perf_counter()
+    walked = list(walk_roots([corpus], MIX.keys(), ExclusionRules(EXCLUDED_DIRS)))
+    seconds = time.perf_counter() - start
+    stages["walk"] = {"seconds": round(seconds, 4), "files": len(walked),
+                      "files_per_second": round(len(walked) / seconds, 1) if seconds else None}
+    log(f"📁 Walk: {stages['walk']}")
+
+    # ✅ read_file_content per extension (serial, so numbers are per-file costs)
+    by_ext = {}
+    contents = {}
+    for _, meta in walked:
+        ext = meta["extension"]
+        if ext == ".png" and not ocr:
+            continue
+        start = time.perf_counter()
+        text = reader.read_file_content(meta["path"])
+        elapsed = (time.perf_counter() - start) * 1000
+        entry = by_ext.setdefault(ext, {"ms": [], "bytes": 0, "failed": 0})
+        entry["ms"].append(elapsed)
+        entry["bytes"] += meta["size"]
+        entry["failed"] += text is None
+        contents[meta["path"]] = text
+    stages["read_file_content"] = {
+        ext: {"files": len(e["ms"]), "failed": e["failed"],
+              "mb_per_second": round(e["bytes"] / 1e6 / (sum(e["ms"]) / 1000), 2) if sum(e["ms"]) else None,
+              **percentiles(e["ms"])}
+        for ext, e in sorted(by_ext.items())
+    }
+    if not ocr:
+        stages["read_file_content"][".png"] = {"skipped": "no tesseract binary (--tesseract)"}
+    log(f"📄 read_file_content: { {k: v.get('p50_ms') for k, v in stages['read_file_content'].items()} }")
+
+    # ✅ Parallel extraction (the pipeline's process + thread pools)
+    items = [(meta["path"], None) for _, meta in walked if ocr or meta["extension"] != ".png"]
+    workers = args.workers or EXTRACT_WORKERS
+    start = time.perf_counter()
+    extracted = sum(1 for _ in extract_files(items, workers=workers))
+    seconds = time.perf_counter() - start
+    stages["extract_parallel"] = {"seconds": round(seconds, 3), "files": extracted, "workers": workers,
+                                  "files_per_second": round(extracted / seconds, 1) if seconds else None}
+    log(f"⚙️ Parallel extraction: {stages['extract_parallel']}")
+
+    # ✅ Chunk + embed
+    if args.embedder == "model":
+        from embedder import get_embedder
+        embedder = get_embedder().warm_up()
+    else:
+        embedder = StubEmbedder()
+    docs = {}
+    texts = []
+    for _, meta in walked:
+        if meta["path"] in contents:
+            docs[meta["path"]] = dict(meta, content=contents[meta["path"]])
+    start = time.perf_counter()
+    for meta in docs.values():
+        texts.extend(text for _, _, text in chunk_text(meta["content"] or "") or [(0, 0, meta["filename"])])
+    chunk_s = time.perf_counter() - start
+    unique = list(dict.fromkeys(texts))
+
+    vectors = {}
+    start = time.perf_counter()
+    for i in range(0, len(unique), args.embed_batch):
+        batch = unique[i:i + args.embed_batch]
+        vectors.update(zip(batch, embedder.embed_texts(batch)))
+    embed_s = time.perf_counter() - start
+    stages["embed"] = {
+        "chunk_seconds": round(chunk_s, 3),
+        "chunks": len(texts),
+        "unique_chunks": len(unique),
+        "seconds": round(embed_s, 3),
+        "chunks_per_second": round(len(unique) / embed_s, 1) if embed_s else None,
+        "files_per_second": round(len(docs) / embed_s, 1) if embed_s else None,
+        "batch_size": args.embed_batch,
+    }
+    log(f"🧠 Embed: {stages['embed']}")
+
+    # ✅ insert_documents
+    db.init_db()
+    start = time.perf_counter()
+    inserted = db.insert_documents(docs)
+    seconds = time.perf_counter() - start
+    stages["insert_documents"] = {"seconds": round(seconds, 3), "rows": inserted,
+                                  "rows_per_second": round(inserted / seconds, 1) if seconds else None}
+    log(f"🗄 insert_documents: {stages['insert_documents']}")
+
+    # Chunk rows + exact index for the search stage, reusing the embed stage's vectors.
+    # The corpus is one scan root, so everything lands in a single in-memory shard
+    replay = ReplayEmbedder(embedder, vectors)
+    shards = ShardSet(roots=[corpus], fresh=True)
+    items = list(docs.items())
+    for i in range(0, len(items), BATCH_SIZE):
+        index_batch(dict(items[i:i + BATCH_SIZE]), replay, shards)
+    if shards.empty:
+        log("⚠ Nothing was indexed, stopping before the FAISS and search stages")
+        return finish(report, args, workdir)
+    index, paths_by_id, modified = shards.shard(next(iter(shards.labels)))
+
+    # ✅ FAISS build per index type
+    stages["faiss_build"] = {}
+    built = {}
+    for kind in args.index_types.split(","):
+        start = time.perf_counter()
+        converted = ann.convert_index(index, kind)
+        seconds = time.perf_counter() - start
+        built[kind] = converted
+        stages["faiss_build"][kind] = {"seconds": round(seconds, 3), "vectors": converted.ntotal,
+                                       "actual_type": ann.index_kind(converted)}
+    log(f"🏗 FAISS build: {stages['faiss_build']}")
+
+    # ✅ search_documents under concurrent load
+    search_index = built.get(args.search_index) or ann.convert_index(index, args.search_index)
+    save_store(search_index, paths_by_id, modified=modified)
+    from search import search_documents, searcher
+    from filters import SearchFilter
+    from query_embedder import get_query_encoder
+    searcher.invalidate()
+    query_cache = get_query_encoder(embedder)
+
+    rng = random.Random(args.seed + 1)
+    queries = [sentence(rng, rng.randint(1, 4)) for _ in range(args.queries)]
+    search_documents(queries[0], embedder)  # load the store outside the timings
+
+    # Every run starts with an empty query-vector cache so each one pays for its
+    # own encodes ("cold"), then repeats the same queries from the cache ("warm")
+    stages["search"] = {"index_type": ann.index_kind(search_index), "runs": []}
+    for mode in args.modes.split(","):
+        for threads in [int(c) for c in args.concurrency.split(",")]:
+            def timed(query):
+                start = time.perf_counter()
+                search_documents(query, embedder, mode=mode)
+                return (time.perf_counter() - start) * 1000
+
+            query_cache.clear()
+            for cache in ("cold", "warm"):
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=threads) as pool:
+                    latencies = list(pool.map(timed, queries))
+                wall = time.perf_counter() - start
+                run = {"mode": mode, "concurrency": threads, "query_cache": cache, "queries": len(queries),
+                       "qps": round(len(queries) / wall, 1), **percentiles(latencies)}
+                stages["search"]["runs"].append(run)
+                log(f"🔎 {run}")
+
+    # ✅ Filtered vector search, sequential, against the unfiltered baseline
+    mtimes = sorted(db.get_modified_times().values())
+    filter_cases = {
+        "none": SearchFilter(),
+        "ext=.pdf": SearchFilter(exts=[".pdf"]),
+        "ext=.txt,.py": SearchFilter(exts=[".txt", ".py"]),
+        "newest_10pct": SearchFilter(modified_after=mtimes[int(len(mtimes) * 0.9)] if mtimes else None),
+    }
+    stages["search_filtered"] = []
+    for name, search_filter in filter_cases.items():
+        search_documents(queries[0], embedder, filters=search_filter)  # build and cache the selector
+        query_cache.clear()
+        for cache in ("cold", "warm"):
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                search_documents(query, embedder, filters=search_filter)
+                latencies.append((time.perf_counter() - start) * 1000)
+            run = {"filter": name, "query_cache": cache, "queries": len(queries), **percentiles(latencies)}
+            stages["search_filtered"].append(run)
+            log(f"🔎 {run}")
+
+    return finish(report, args, workdir)
+
+
+def finish(report, args, workdir):
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    if not args.workdir:
+        os.chdir(REPO)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# chunker.py
+import re
+import numpy as np
+
+# 🔧 Chunking configuration
+CHUNK_WORDS = 180     # ~240 word-pieces, just under all-MiniLM-L6-v2's 256-token limit
+CHUNK_OVERLAP = 30    # words shared between neighbouring chunks
+MAX_CHUNKS = 64       # upper bound on model inputs per document
+
+# FAISS ids pack the owning document: id = doc_id << CHUNK_BITS | chunk_no
+CHUNK_BITS = 12
+
+_WORD = re.compile(r"\S+")
+
+
+def chunk_id(doc_id, chunk_no):
+    return (doc_id << CHUNK_BITS) | chunk_no
+
+
+def doc_ids_of(ids):
+    """Map an array of FAISS chunk ids back to document ids."""
+    return np.asarray(ids, dtype="int64") >> CHUNK_BITS
+
+
+def chunk_text(text, size=CHUNK_WORDS, overlap=CHUNK_OVERLAP, max_chunks=MAX_CHUNKS):
+    """
+    Split text into overlapping word windows.
+
+    Long documents are covered with at most `max_chunks` evenly spaced
+    windows, so a 500-page PDF costs the same number of model calls as a
+    short report.
+
+    Returns:
+        list of (start, end, chunk) with character offsets into `text`.
+    """
+    if not text:
+        return []
+    spans = [m.span() for m in _WORD.finditer(text)]
+    if not spans:
+        return []
+
+    size = max(1, size)
+    step = max(1, size - overlap)
+    last = max(0, len(spans) - size)
+    starts = list(range(0, last + 1, step))
+    if starts[-1] != last:
+        starts.append(last)
+    if len(starts) > max_chunks:
+        starts = sorted(set(np.linspace(0, last, max_chunks).astype(int).tolist()))
+
+    chunks = []
+    for first in starts:
+        end_word = min(first + size, len(spans)) - 1
+        start, end = spans[first][0], spans[end_word][1]
+        chunks.append((start, end, text[start:end]))
+    return chunks
@@ -1,11 +1,66 @@
 import sqlite3
 import os
+import queue
+from contextlib import contextmanager
+from filters import get_folder_category
 
 DB_PATH = "Aaryan_database.db"
 
+# 🔧 Ingestion tuning
+INGEST_BATCH = 5000          # rows per executemany / transaction
+OPTIMIZE_EVERY = 200_000     # FTS rows written between full 'optimize' passes
+SCHEMA_VERSION = 1           # PRAGMA user_version; 1 = FTS rows keyed by documents.id
+READ_POOL_SIZE = 8           # read-only connections shared by search threads
+
+# Contentless FTS (no second copy of the text) needs DELETE support, SQLite 3.43+
+CONTENTLESS_FTS = sqlite3.sqlite_version_info >= (3, 43, 0)
+
+_fts_rows_written = 0
+
+def _connect():
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+def _open_read():
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    conn.execute("PRAGMA query_only=1")
+    # Lets keyword search filter by category with the same rules as vector search
+    conn.create_function("folder_category", 1, get_folder_category, deterministic=True)
+    return conn
+
+# ✅ Read connections are pooled, so search paths don't pay a connect per call and
+# werkzeug's new thread per request doesn't leak one each. READ_POOL_SIZE slots,
+# each None or (DB_PATH, connection); a query checks one out and puts it back.
+_read_pool = queue.Queue()
+for _ in range(READ_POOL_SIZE):
+    _read_pool.put(None)
+
+@contextmanager
+def _read_conn():
+    slot = _read_pool.get()
+    try:
+        if slot is None or slot[0] != DB_PATH:
+            if slot is not None:
+                slot[1].close()
+            slot = None  # a failed open leaves the slot empty, not closed
+            slot = (DB_PATH, _open_read())
+        yield slot[1]
+    finally:
+        _read_pool.put(slot)
+
+def _create_fts(conn, name="documents_fts"):
+    options = ", content='', contentless_delete=1" if CONTENTLESS_FTS else ""
+    conn.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {name} USING fts5(
+            filename, path, content{options}
+        )
+    ''')
+
 def init_db():
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True) if os.path.dirname(DB_PATH) else None
-    with sqlite3.connect(DB_PATH) as conn:
+    with _connect() as conn:
         conn.execute('''
             CREATE TABLE IF NOT EXISTS documents (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -16,46 +71,284 @@ def init_db():
                 modified REAL
             )
         ''')
+        # One row per embedded passage; id is the FAISS id (see chunker.chunk_id)
         conn.execute('''
-            CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
-                filename, path, content
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY,
+                doc_id INTEGER NOT NULL,
+                chunk_no INTEGER,
+                start INTEGER,
+                end INTEGER
             )
         ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_doc ON chunks(doc_id)")
 
-def insert_documents(docs: dict):
-    with sqlite3.connect(DB_PATH) as conn:
-        inserted = 0
-        for path, meta in docs.items():
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'documents_fts'"
+        ).fetchone()
+        if exists and version < 1:
+            # Old table: free rowids and one extra row per rescan. Keep the
+            # newest row per path, re-keyed by documents.id
+            print("🗃 Migrating documents_fts to id-keyed rows...")
+            _create_fts(conn, "documents_fts_v1")
+            conn.execute('''
+                INSERT INTO documents_fts_v1 (rowid, filename, path, content)
+                SELECT d.id, f.filename, f.path, f.content
+                FROM documents_fts f
+                JOIN (SELECT path, MAX(rowid) AS last FROM documents_fts GROUP BY path) newest
+                    ON f.rowid = newest.last
+                JOIN documents d ON d.path = f.path
+            ''')
+            conn.execute("DROP TABLE documents_fts")
+            conn.execute("ALTER TABLE documents_fts_v1 RENAME TO documents_fts")
+        _create_fts(conn)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+def _upsert_rows(conn, rows):
+    # Upsert keeps documents.id stable, the FAISS index and FTS rows are keyed by it
+    sql = '''
+        INSERT INTO documents
+        (filename, path, extension, size, modified)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(path) DO UPDATE SET
+            filename = excluded.filename,
+            extension = excluded.extension,
+            size = excluded.size,
+            modified = excluded.modified
+    '''
+    try:
+        conn.executemany(sql, rows)
+        return rows
+    except (sqlite3.Error, UnicodeEncodeError):
+        # Find the bad row(s), e.g. undecodable file names, and keep the rest
+        ok = []
+        for row in rows:
             try:
-                conn.execute('''
-                    INSERT OR REPLACE INTO documents
-                    (filename, path, extension, size, modified)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (
-                    meta["filename"], path,
-                    meta["extension"], meta["size"], meta["modified"]
-                ))
-                conn.execute('''
-                    INSERT INTO documents_fts (filename, path, content)
-                    VALUES (?, ?, ?)
-                ''', (
-                    meta["filename"], path, meta.get("content", "")
+                conn.execute(sql, row)
+                ok.append(row)
+            except (sqlite3.Error, UnicodeEncodeError) as e:
+                print(f"[DB ERROR] {row[1]!r}: {e}")
+        return ok
+
+def upsert_documents(docs: dict):
+    """
+    Bulk-upsert metadata and FTS rows in batched transactions.
+    Rescans replace FTS rows instead of adding new ones.
+
+    Returns:
+        dict: path ➝ documents.id for every row written.
+    """
+    global _fts_rows_written
+    items = list(docs.items())
+    ids = {}
+    with _connect() as conn:
+        for i in range(0, len(items), INGEST_BATCH):
+            batch = items[i:i + INGEST_BATCH]
+            rows = _upsert_rows(conn, [
+                (meta["filename"], path, meta["extension"], meta["size"], meta["modified"])
+                for path, meta in batch
+            ])
+            written = {row[1] for row in rows}
+
+            batch_ids = {}
+            paths = list(written)
+            for j in range(0, len(paths), 500):
+                chunk = paths[j:j + 500]
+                placeholders = ",".join("?" * len(chunk))
+                batch_ids.update(conn.execute(
+                    f"SELECT path, id FROM documents WHERE path IN ({placeholders})", chunk
                 ))
-                inserted += 1
-            except Exception as e:
-                print(f"[DB ERROR] {e}")
+
+            conn.executemany(
+                "DELETE FROM documents_fts WHERE rowid = ?",
+                [(doc_id,) for doc_id in batch_ids.values()]
+            )
+            conn.executemany(
+                "INSERT INTO documents_fts (rowid, filename, path, content) VALUES (?, ?, ?, ?)",
+                [(batch_ids[path], meta["filename"], path, meta.get("content") or "")
+                 for path, meta in batch if path in batch_ids]
+            )
+            conn.commit()
+            ids.update(batch_ids)
+            _fts_rows_written += len(batch_ids)
+
+    if _fts_rows_written >= OPTIMIZE_EVERY:
+        optimize_fts()
+    return ids
+
+def insert_documents(docs: dict):
+    return len(upsert_documents(docs))
+
+# ✅ Merge FTS b-tree segments so the index stays compact after big ingests
+def optimize_fts():
+    global _fts_rows_written
+    with _connect() as conn:
+        conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('optimize')")
+    _fts_rows_written = 0
+
+# ✅ Snapshot of what is already indexed: {path: (id, size, modified)}
+def get_indexed_files(paths=None):
+    """All documents, or only those whose path is in `paths`."""
+    with sqlite3.connect(DB_PATH) as conn:
+        if paths is None:
+            rows = conn.execute("SELECT id, path, size, modified FROM documents")
+            return {path: (doc_id, size, modified) for doc_id, path, size, modified in rows}
+
+        found = {}
+        paths = list(paths)
+        for i in range(0, len(paths), 500):
+            batch = paths[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT id, path, size, modified FROM documents WHERE path IN ({placeholders})", batch
+            )
+            found.update((path, (doc_id, size, modified)) for doc_id, path, size, modified in rows)
+        return found
+
+# ✅ Modification time of every document: {id: modified}, for the store's date filters
+def get_modified_times():
+    with sqlite3.connect(DB_PATH) as conn:
+        return dict(conn.execute("SELECT id, modified FROM documents"))
+
+# ✅ Indexed paths inside a directory (range scan on the unique path index)
+def get_paths_under(directory):
+    prefix = directory.rstrip("/\\") + os.sep
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    with sqlite3.connect(DB_PATH) as conn:
+        rows = conn.execute("SELECT path FROM documents WHERE path >= ? AND path < ?", (prefix, upper))
+        return [path for (path,) in rows]
+
+# ✅ Map paths to their stable document ids
+def get_document_ids(paths):
+    ids = {}
+    paths = list(paths)
+    with sqlite3.connect(DB_PATH) as conn:
+        for i in range(0, len(paths), 500):
+            batch = paths[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT path, id FROM documents WHERE path IN ({placeholders})", batch
+            )
+            ids.update(rows)
+    return ids
+
+# ✅ Remove documents that no longer exist on disk, returns their ids
+def delete_documents(paths):
+    paths = list(paths)
+    ids = list(get_document_ids(paths).values())
+    with _connect() as conn:
+        for i in range(0, len(paths), 500):
+            batch = paths[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            conn.execute(f"DELETE FROM documents WHERE path IN ({placeholders})", batch)
+        conn.executemany("DELETE FROM documents_fts WHERE rowid = ?", [(i,) for i in ids])
+        for i in range(0, len(ids), 500):
+            batch = ids[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            conn.execute(f"DELETE FROM chunks WHERE doc_id IN ({placeholders})", batch)
+        conn.commit()
+    return ids
+
+# ✅ Replace the chunk rows of some documents, returns the chunk ids they had before
+def replace_chunks(doc_chunks: dict):
+    """
+    Args:
+        doc_chunks (dict): doc_id ➝ list of (chunk_id, chunk_no, start, end)
+    """
+    doc_ids = list(doc_chunks.keys())
+    old_ids = []
+    with _connect() as conn:
+        for i in range(0, len(doc_ids), 500):
+            batch = doc_ids[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(f"SELECT id FROM chunks WHERE doc_id IN ({placeholders})", batch)
+            old_ids.extend(row[0] for row in rows)
+            conn.execute(f"DELETE FROM chunks WHERE doc_id IN ({placeholders})", batch)
+        conn.executemany(
+            "INSERT INTO chunks (id, doc_id, chunk_no, start, end) VALUES (?, ?, ?, ?, ?)",
+            [(cid, doc_id, no, start, end)
+             for doc_id, chunks in doc_chunks.items()
+             for cid, no, start, end in chunks]
+        )
         conn.commit()
-    return inserted
+    return old_ids
+
+# ✅ Character spans of chunks: {chunk_id: (start, end)}
+def get_chunk_spans(chunk_ids):
+    chunk_ids = list(dict.fromkeys(int(c) for c in chunk_ids))
+    spans = {}
+    for i in range(0, len(chunk_ids), 500):
+        batch = chunk_ids[i:i + 500]
+        placeholders = ",".join("?" * len(batch))
+        with _read_conn() as conn:
+            rows = conn.execute(
+                f"SELECT id, start, end FROM chunks WHERE id IN ({placeholders})", batch
+            ).fetchall()
+        spans.update((cid, (start, end)) for cid, start, end in rows)
+    return spans
+
+# ✅ Metadata for many documents in one query: {id: {filename, extension, size, modified}}
+def get_documents_by_ids(ids):
+    ids = list(dict.fromkeys(int(i) for i in ids))
+    documents = {}
+    for i in range(0, len(ids), 500):
+        batch = ids[i:i + 500]
+        placeholders = ",".join("?" * len(batch))
+        with _read_conn() as conn:
+            rows = conn.execute(
+                f"SELECT id, filename, extension, size, modified FROM documents WHERE id IN ({placeholders})", batch
+            ).fetchall()
+        documents.update(
+            (doc_id, {"filename": filename, "extension": extension, "size": size, "modified": modified})
+            for doc_id, filename, extension, size, modified in rows
+        )
+    return documents
+
+# ✅ BM25 keyword search over documents_fts: [(doc_id, path, score)], best first
+def keyword_search(query, limit=20, filters=None):
+    # Quote every term so user text can't trip FTS5 query syntax;
+    # "get_folder_category" becomes a phrase of its sub-tokens
+    terms = [t.replace('"', '""') for t in query.split()]
+    if not terms:
+        return []
+    match = " OR ".join(f'"{t}"' for t in terms)
+
+    # filters.SearchFilter: pushed into the WHERE clause so LIMIT still yields `limit` rows
+    where, params = ["documents_fts MATCH ?"], [match]
+    if filters and filters.exts:
+        where.append(f"d.extension IN ({','.join('?' * len(filters.exts))})")
+        params.extend(filters.exts)
+    if filters and filters.categories:
+        where.append(f"folder_category(d.path) IN ({','.join('?' * len(filters.categories))})")
+        params.extend(filters.categories)
+    if filters and filters.modified_after is not None:
+        where.append("d.modified >= ?")
+        params.append(filters.modified_after)
+    if filters and filters.modified_before is not None:
+        where.append("d.modified < ?")
+        params.append(filters.modified_before)
+
+    with _read_conn() as conn:
+        rows = conn.execute(f'''
+            SELECT d.id, d.path, bm25(documents_fts, 10.0, 5.0, 1.0) AS score
+            FROM documents_fts
+            JOIN documents d ON d.id = documents_fts.rowid
+            WHERE {" AND ".join(where)}
+            ORDER BY score
+            LIMIT ?
+        ''', (*params, limit)).fetchall()
+
+    # bm25() is "lower is better"; flip it so higher scores rank first
+    return [(doc_id, path, -score) for doc_id, path, score in rows]
 
 # ✅ NEW: Helper to get extension (filetype) from DB using path
 def get_filetype_by_path(path):
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT extension FROM documents WHERE path = ?", (path,))
-            row = cursor.fetchone()
-            
-            return row[0] if row else "Unknown"
+        with _read_conn() as conn:
+            row = conn.execute("SELECT extension FROM documents WHERE path = ?", (path,)).fetchone()
+
+        return row[0] if row else "Unknown"
     except Exception as e:
         print(f"[DB ERROR] Failed to fetch filetype for {path}: {e}")
         return "Unknown"
\ No newline at end of file
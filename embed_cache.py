@@ -0,0 +1,118 @@
+# embed_cache.py
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import numpy as np
+
+CACHE_PATH = "Aaryan_store/embed_cache.db"
+MAX_ENTRIES = 500_000   # ~0.4 GB of float16 384-d vectors, least recently used go first
+
+_SPACES = re.compile(r"\s+")
+
+
+def cache_key(model_name, text):
+    """sha1 over (model, whitespace-normalised text)."""
+    normalized = _SPACES.sub(" ", text or "").strip()
+    return hashlib.sha1(f"{model_name}\0{normalized}".encode("utf-8", "ignore")).digest()
+
+
+class CachedEmbedder:
+    """
+    Wraps an embedder and keeps its vectors on disk keyed by content hash, so
+    unchanged text (and duplicate copies of a file) is never encoded twice.
+    """
+
+    def __init__(self, embedder, model_name=None, path=CACHE_PATH, max_entries=MAX_ENTRIES):
+        self.embedder = embedder
+        self._model_name = model_name
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True) if os.path.dirname(path) else None
+        with sqlite3.connect(self.path) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key BLOB PRIMARY KEY,
+                    vector BLOB,
+                    last_used REAL
+                ) WITHOUT ROWID
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_used ON embeddings(last_used)")
+            self._count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @property
+    def model_name(self):
+        # model_id tells backends apart (e.g. torch vs int8 ONNX vectors)
+        return self._model_name or getattr(self.embedder, "model_id", None) or getattr(self.embedder, "model_name", "default")
+
+    def close(self):
+        # Stops the wrapped EmbeddingEngine's encoder processes, if any
+        close = getattr(self.embedder, "close", None)
+        if close is not None:
+            close()
+
+    def embed_texts(self, texts):
+        model_name = self.model_name
+        keys = [cache_key(model_name, t) for t in texts]
+        found = self._lookup(set(keys))
+
+        # ✅ Encode each distinct missing text once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        self.hits += sum(1 for k in keys if k in found)
+        self.misses += len(missing)
+
+        if missing:
+            fresh = np.asarray(self.embedder.embed_texts(list(missing.values())), dtype="float32")
+            new = dict(zip(missing.keys(), fresh))
+            self._store(new)
+            found.update(new)
+
+        if not texts:
+            return np.zeros((0, 0), dtype="float32")
+        return np.stack([found[k] for k in keys]).astype("float32")
+
+    def _lookup(self, keys):
+        keys = list(keys)
+        found = {}
+        now = time.time()
+        with sqlite3.connect(self.path) as conn:
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype="float16").astype("float32")
+                conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key, _ in rows]
+                )
+        return found
+
+    def _store(self, vectors: dict):
+        now = time.time()
+        with sqlite3.connect(self.path) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, vec.astype("float16").tobytes(), now) for key, vec in vectors.items()]
+            )
+            self._count += len(vectors)
+
+            # ✅ Size-bounded: evict least recently used entries
+            if self._count > self.max_entries:
+                excess = self._count - self.max_entries
+                conn.execute('''
+                    DELETE FROM embeddings WHERE key IN (
+                        SELECT key FROM embeddings ORDER BY last_used LIMIT ?
+                    )
+                ''', (excess,))
+                self._count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
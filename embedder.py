@@ -1,11 +1,259 @@
 # embedder.py
+import os
+import time
+import atexit
+import threading
+import multiprocessing
+import numpy as np
+from metrics import EMBED_BATCH_SECONDS, EMBED_TEXTS, EMBED_TOKENS
 
-from sentence_transformers import SentenceTransformer
+MODEL_NAME = "all-MiniLM-L6-v2"  # Or any other model
+
+# 🔧 Backend: "torch" (sentence-transformers default) or "onnx" (ONNX Runtime, int8 on CPU)
+EMBED_BACKEND = os.environ.get("DOCFINDER_EMBED_BACKEND", "torch")
+ONNX_QUANTIZATION = "avx2"          # "avx2" | "avx512" | "avx512_vnni" | "arm64"
+ONNX_DIR = "Aaryan_store/onnx"      # exported + quantized models are cached here
+WARMUP_TEXT = "warm up the embedding model"
+
+# 🔧 Bulk (indexing) embedding
+EMBED_PROCESSES = max(1, min(4, (os.cpu_count() or 1) // 2))  # encoder processes (one model copy each); 1 = in-process
+EMBED_IDLE_SECONDS = 120      # encoder processes are stopped after this long without work
+EMBED_TOKEN_BUDGET = 16_384   # ~tokens per model batch: short texts get big batches, long ones small
+EMBED_MIN_BATCH = 8
+EMBED_MAX_BATCH = 256
+EMBED_TASK_TEXTS = 1024       # max texts per length bucket / pool task
+EMBED_MIN_PARALLEL = 256      # fewer texts than this are encoded in-process
+MAX_SEQ_LENGTH = 256          # all-MiniLM-L6-v2's limit; the loaded model's value wins
+CHARS_PER_TOKEN = 6           # generous: truncation must never cut text the model would have seen
 
 class Embedder:
-    def __init__(self):
-        print("🧠 Loading embedding model...")
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")  # Or any other model
+    """
+    Sentence embedding model, loaded on first use.
+
+    Prefer get_embedder() over constructing this directly so every module
+    in the process shares one model copy.
+    """
+
+    def __init__(self, model_name=MODEL_NAME, backend=None):
+        self.model_name = model_name
+        self.backend = backend or EMBED_BACKEND
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model_id(self):
+        # Quantized vectors differ slightly, so caches must not mix backends
+        return self.model_name if self.backend == "torch" else f"{self.model_name}@onnx-{ONNX_QUANTIZATION}"
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._load()
+        return self._model
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def _load(self):
+        # Imported here: pulling in torch is most of a cold start
+        from sentence_transformers import SentenceTransformer
+
+        if self.backend == "onnx":
+            try:
+                return self._load_onnx()
+            except Exception as e:
+                print(f"⚠ ONNX backend unavailable ({type(e).__name__}: {e}), using torch")
+                self.backend = "torch"
+
+        print(f"🧠 Loading embedding model {self.model_name}...")
+        return SentenceTransformer(self.model_name)
+
+    def _load_onnx(self):
+        """int8 dynamically quantized ONNX model, exported once into ONNX_DIR."""
+        from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+        local = os.path.join(ONNX_DIR, self.model_name.replace("/", "_"))
+        file_name = f"onnx/model_qint8_{ONNX_QUANTIZATION}.onnx"
+        if not os.path.exists(os.path.join(local, file_name)):
+            print(f"🔧 Exporting {self.model_name} to int8 ONNX (one-off)...")
+            exported = SentenceTransformer(self.model_name, backend="onnx")
+            exported.save_pretrained(local)
+            export_dynamic_quantized_onnx_model(exported, ONNX_QUANTIZATION, local)
+
+        print(f"🧠 Loading embedding model {self.model_name} (ONNX int8)...")
+        return SentenceTransformer(local, backend="onnx", model_kwargs={"file_name": file_name})
+
+    def warm_up(self):
+        """Load the model and run one encode so the first real request doesn't pay for it."""
+        self.embed_texts([WARMUP_TEXT])
+        return self
+
+    def embed_texts(self, texts, batch_size=32):
+        model = self.model
+        with EMBED_BATCH_SECONDS.time():
+            vectors = model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+        EMBED_TEXTS.inc(len(texts))
+        EMBED_TOKENS.inc(sum(len(t.split()) for t in texts))
+        return vectors
+
+
+# ✅ Process-wide registry: one model copy per (model, backend)
+_embedders = {}
+_registry_lock = threading.Lock()
+
+def get_embedder(model_name=MODEL_NAME, backend=None):
+    key = (model_name, backend or EMBED_BACKEND)
+    with _registry_lock:
+        embedder = _embedders.get(key)
+        if embedder is None:
+            embedder = _embedders[key] = Embedder(model_name, key[1])
+        return embedder
+
+def warm_up_async(model_name=MODEL_NAME, backend=None):
+    """Load the shared embedder on a background thread; returns the thread."""
+    thread = threading.Thread(target=get_embedder(model_name, backend).warm_up, name="embedder-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+# ✅ Bulk embedding engine for indexing
+_worker_embedder = None
+
+def _init_worker(model_name, backend, threads):
+    global _worker_embedder
+    try:
+        import torch
+        torch.set_num_threads(threads)  # one core per process scales better than shared intra-op threads
+    except ImportError:
+        pass
+    _worker_embedder = get_embedder(model_name, backend)
+    _worker_embedder.warm_up()
+
+def _encode_task(task):
+    texts, batch_size = task
+    start = time.perf_counter()
+    vectors = _worker_embedder.model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+    return np.asarray(vectors, dtype="float32"), time.perf_counter() - start
+
+class EmbeddingEngine:
+    """
+    Throughput-oriented embed_texts for indexing.
+
+    Inputs are truncated to what the model can see, sorted by length and cut
+    into length buckets, so each model batch pads to similar lengths and
+    its size follows EMBED_TOKEN_BUDGET. Large jobs are spread over a pool
+    of encoder processes (one model copy each). Vectors come back in the
+    original order.
+
+    The processes start on the first large job and stop after
+    EMBED_IDLE_SECONDS without one, on close() (end of a scan) and at exit,
+    so a long-running server doesn't keep the extra model copies resident.
+    """
+
+    def __init__(self, embedder=None, processes=EMBED_PROCESSES, token_budget=EMBED_TOKEN_BUDGET):
+        self.embedder = embedder or get_embedder()
+        self.processes = processes
+        self.token_budget = token_budget
+        self._pool = None
+        self._lock = threading.Lock()
+        self._busy = 0
+        self._idle_timer = None
+        atexit.register(self.close)
+
+    @property
+    def model_name(self):
+        return self.embedder.model_name
+
+    @property
+    def model_id(self):
+        return self.embedder.model_id
+
+    def _max_chars(self):
+        model = self.embedder._model
+        seq = getattr(model, "max_seq_length", None) or MAX_SEQ_LENGTH
+        return seq * CHARS_PER_TOKEN
+
+    def _batch_size(self, texts):
+        # Bucket is length-sorted: its longest text decides the padded length
+        longest = max(len(texts[-1]) // CHARS_PER_TOKEN + 2, 1)
+        return int(min(EMBED_MAX_BATCH, max(EMBED_MIN_BATCH, self.token_budget // longest)))
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                threads = max(1, (os.cpu_count() or 1) // self.processes)
+                print(f"🧠 Starting {self.processes} embedding processes...")
+                self._pool = multiprocessing.get_context("spawn").Pool(
+                    self.processes, initializer=_init_worker,
+                    initargs=(self.embedder.model_name, self.embedder.backend, threads),
+                )
+            self._busy += 1
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            return self._pool
+
+    def _release_pool(self):
+        with self._lock:
+            self._busy -= 1
+            if not self._busy and self._pool is not None:
+                self._idle_timer = threading.Timer(EMBED_IDLE_SECONDS, self._close_idle)
+                self._idle_timer.daemon = True
+                self._idle_timer.start()
+
+    def _close_idle(self):
+        with self._lock:
+            if self._busy or self._pool is None:
+                return
+            print("🧠 Stopping idle embedding processes")
+            self._stop()
+
+    def _stop(self):
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+
+    def close(self):
+        """Stop the encoder processes; the next large job starts them again."""
+        with self._lock:
+            self._stop()
 
     def embed_texts(self, texts):
-        return self.model.encode(texts, convert_to_numpy=True)
+        if not texts:
+            return np.zeros((0, 0), dtype="float32")
+        max_chars = self._max_chars()
+        texts = [t[:max_chars] for t in texts]
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        parallel = self.processes > 1 and len(texts) >= EMBED_MIN_PARALLEL
+        # Enough buckets to keep every process busy
+        size = min(EMBED_TASK_TEXTS, -(-len(texts) // self.processes)) if parallel else EMBED_TASK_TEXTS
+        tasks = []
+        for start in range(0, len(order), size):
+            bucket = [texts[i] for i in order[start:start + size]]
+            tasks.append((bucket, self._batch_size(bucket)))
+
+        if parallel:
+            pool = self._get_pool()
+            try:
+                results = pool.map(_encode_task, tasks)
+            finally:
+                self._release_pool()
+            for (bucket, _), (_, seconds) in zip(tasks, results):
+                EMBED_BATCH_SECONDS.observe(seconds)
+                EMBED_TEXTS.inc(len(bucket))
+                EMBED_TOKENS.inc(sum(len(t.split()) for t in bucket))
+            parts = [vectors for vectors, _ in results]
+        else:
+            parts = [np.asarray(self.embedder.embed_texts(bucket, batch_size), dtype="float32")
+                     for bucket, batch_size in tasks]
+
+        sorted_vectors = np.concatenate(parts)
+        out = np.empty_like(sorted_vectors)
+        out[order] = sorted_vectors
+        return out
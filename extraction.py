@@ -0,0 +1,211 @@
+# extraction.py
+import os
+import time
+import queue
+import atexit
+import itertools
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from reader import extract, IMAGE_EXTENSIONS
+from metrics import registry, EXTRACT_SECONDS, EXTRACT_FAILURES, EXTRACT_TRUNCATED
+
+# 🔧 Pool configuration
+EXTRACT_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # processes for CPU-bound formats
+EXTRACT_THREADS = 8                                   # threads for plain-text formats
+EXTRACT_TIMEOUT = 120                                 # seconds allowed per file
+MAX_TASKS_PER_CHILD = 200                             # recycle workers to cap leaks
+START_POLL = 0.5                                      # seconds between checks for tasks that have started
+
+# Parsing/OCR is CPU-bound; everything else is just a file read
+CPU_BOUND_EXTS = {".pdf", ".docx", ".xlsx", ".xls", *IMAGE_EXTENSIONS}
+
+
+def _kind(path):
+    return "cpu" if os.path.splitext(path)[1].lower() in CPU_BOUND_EXTS else "io"
+
+
+# ✅ One process pool per process, started on first use and kept between scans.
+# "spawn": the caller already runs Flask, watcher and encoder threads, whose
+# locks a forked child could inherit mid-acquire.
+_pool = None
+_pool_workers = 0
+_pool_started = None   # workers report (token) here when a task begins
+_pool_lock = threading.Lock()
+_tokens = itertools.count()  # unique across calls: late reports of old tasks are ignored
+_worker_started = None
+
+
+def _init_worker(started):
+    global _worker_started
+    _worker_started = started
+
+
+def _get_pool(workers):
+    global _pool, _pool_workers, _pool_started
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            _stop_pool()
+            context = multiprocessing.get_context("spawn")
+            _pool_started = context.SimpleQueue()
+            _pool = context.Pool(workers, initializer=_init_worker, initargs=(_pool_started,),
+                                 maxtasksperchild=MAX_TASKS_PER_CHILD)
+            _pool_workers = workers
+        return _pool, _pool_started
+
+
+def _stop_pool():
+    global _pool
+    if _pool is not None:
+        _pool.terminate()
+        _pool = None
+
+
+def reset_pool():
+    """Terminate the extraction processes (e.g. wedged on bad files); the next scan starts new ones."""
+    with _pool_lock:
+        _stop_pool()
+
+
+atexit.register(reset_pool)
+
+
+def read_timed(path, token=None, started=None):
+    """Run in a worker: (content, seconds, error message or None, truncated budget or None)."""
+    started = started or _worker_started
+    if token is not None and started is not None:
+        started.put(token)  # the timeout starts now, not when the task was queued
+    start = time.perf_counter()
+    try:
+        (content, truncated), error = extract(path), None
+    except Exception as e:
+        content, truncated, error = None, None, f"{type(e).__name__}: {e}"
+    return content, time.perf_counter() - start, error, truncated
+
+
+def _record(path, seconds, error=None, content=None, timed_out=False, truncated=None):
+    ext = os.path.splitext(path)[1].lower()
+    EXTRACT_SECONDS.observe(seconds, ext=ext)
+    registry.note_file(path, ext, seconds)
+    if truncated:
+        EXTRACT_TRUNCATED.inc(ext=ext, reason=truncated)
+    reason = "timeout" if timed_out else "error" if error else "empty" if not content else None
+    if reason:
+        EXTRACT_FAILURES.inc(ext=ext, reason=reason)
+        if reason != "empty":
+            registry.note_failure(path, ext, reason, error)
+
+
+def extract_files(items, workers=EXTRACT_WORKERS, threads=EXTRACT_THREADS, timeout=EXTRACT_TIMEOUT):
+    """
+    Run read_file_content over many files in parallel, recording per-extension
+    latency and failures in metrics. CPU-bound files go to the shared
+    process pool; callers are serialized by pipeline.INDEX_LOCK.
+
+    Args:
+        items: iterable of (path, payload) pairs; payload is passed through untouched.
+        workers (int): process-pool size for PDFs, Office files and images.
+        threads (int): thread-pool size for text and code files.
+        timeout (float): seconds a file may take once a worker has started on it.
+
+    Yields:
+        (path, payload, content) in completion order. content is None when the
+        file could not be read or hit the timeout.
+    """
+    source = iter(items)
+    exhausted = False
+    waiting = {"cpu": deque(), "io": deque()}
+    running = {}  # token -> (kind, path, payload, deadline or None until the task starts)
+    stuck_cpu = 0  # timed-out tasks still occupying a worker process
+    done = queue.Queue()
+    io_started = queue.Queue()
+
+    pool, cpu_started = _get_pool(workers)
+    io_pool = ThreadPoolExecutor(max_workers=threads)
+
+    def submit(kind, path, payload):
+        token = next(_tokens)
+        running[token] = (kind, path, payload, None)
+        if kind == "cpu":
+            pool.apply_async(
+                read_timed, (path, token),
+                callback=lambda result, t=token: done.put((t, result)),
+                error_callback=lambda e, t=token: done.put((t, (None, 0.0, f"{type(e).__name__}: {e}", None))),
+            )
+        else:
+            future = io_pool.submit(read_timed, path, token, io_started)
+            future.add_done_callback(
+                # read_timed catches its own errors; only cancellation lands here
+                lambda f, t=token: done.put((t, (None, 0.0, "cancelled", None) if f.cancelled() else f.result()))
+            )
+
+    try:
+        while True:
+            # ✅ Keep a bounded backlog so the walker never runs far ahead
+            while not exhausted and len(waiting["cpu"]) + len(waiting["io"]) < 4 * (workers + threads):
+                try:
+                    path, payload = next(source)
+                except StopIteration:
+                    exhausted = True
+                    break
+                waiting[_kind(path)].append((path, payload))
+
+            # ✅ Fill free slots; in-flight CPU tasks never exceed the live workers
+            busy = {"cpu": stuck_cpu, "io": 0}
+            for kind, *_ in running.values():
+                busy[kind] += 1
+            limits = {"cpu": workers, "io": threads}
+            for kind in ("cpu", "io"):
+                while waiting[kind] and busy[kind] < limits[kind]:
+                    submit(kind, *waiting[kind].popleft())
+                    busy[kind] += 1
+
+            if not running:
+                if exhausted and not waiting["cpu"] and not waiting["io"]:
+                    return
+                continue
+
+            # ✅ Deadlines start when a worker picks the task up
+            for started in (cpu_started, io_started):
+                while not started.empty():
+                    token = started.get()
+                    if token in running and running[token][3] is None:
+                        running[token] = running[token][:3] + (time.monotonic() + timeout,)
+
+            # ✅ Wait for the next result, but never past the earliest deadline
+            now = time.monotonic()
+            next_deadline = min([r[3] for r in running.values() if r[3] is not None] + [now + START_POLL])
+            try:
+                token, (content, seconds, error, truncated) = done.get(
+                    timeout=max(0.0, next_deadline - time.monotonic()))
+                if token in running:
+                    _, path, payload, _ = running.pop(token)
+                    _record(path, seconds, error, content, truncated=truncated)
+                    yield path, payload, content
+                continue
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            for token in [t for t, r in running.items() if r[3] is not None and r[3] <= now]:
+                kind, path, payload, _ = running.pop(token)
+                print(f"⏱ Extraction timed out after {timeout}s: {path}")
+                _record(path, timeout, timed_out=True)
+                if kind == "cpu":
+                    stuck_cpu += 1
+                yield path, payload, None
+
+            # ✅ Half the workers wedged on bad files: recycle the process pool
+            if stuck_cpu and stuck_cpu >= max(1, workers // 2):
+                reset_pool()
+                pool, cpu_started = _get_pool(workers)
+                stuck_cpu = 0
+                for token in [t for t, r in running.items() if r[0] == "cpu"]:
+                    _, path, payload, _ = running.pop(token)
+                    waiting["cpu"].appendleft((path, payload))
+    finally:
+        # A worker still busy on a timed-out or abandoned file would hold up the next scan
+        if stuck_cpu or any(r[0] == "cpu" for r in running.values()):
+            reset_pool()
+        io_pool.shutdown(wait=False, cancel_futures=True)
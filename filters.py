@@ -0,0 +1,252 @@
+# filters.py
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+import numpy as np
+import faiss
+from ann import search_params, stored_ids
+from chunker import CHUNK_BITS
+
+# 🔧 Folder categories, first match wins; the position is the code stored in the path table
+FOLDER_CATEGORIES = ["downloads", "documents", "desktop", "pictures", "videos", "music"]
+CATEGORY_NAMES = ["Other"] + [folder.capitalize() for folder in FOLDER_CATEGORIES]
+CATEGORY_CODES = {name: code for code, name in enumerate(CATEGORY_NAMES)}
+
+# 🔧 Filtered vector search
+EXACT_SEARCH_MAX = 4096    # matching chunks up to this are scored exactly instead of through the ANN index
+FILTER_CACHE = 64          # selectors kept per loaded store, keyed by filter
+EXT_WIDTH = 8              # bytes per extension in the path table (".docx" fits)
+
+
+# ✅ Folder category from path
+def get_folder_category(path):
+    parts = path.lower().split(os.sep)
+    for folder in FOLDER_CATEGORIES:
+        if folder in parts:
+            return folder.capitalize()
+    return "Other"
+
+
+def path_columns(paths):
+    """
+    Per-document filter columns derived from the path alone.
+
+    Returns:
+        (extension array of S8, category code array of uint8)
+    """
+    extensions = np.array(
+        [os.path.splitext(p)[1].lower().encode("utf-8", "surrogateescape")[:EXT_WIDTH] for p in paths],
+        dtype=f"S{EXT_WIDTH}",
+    )
+    categories = np.fromiter((CATEGORY_CODES[get_folder_category(p)] for p in paths), dtype="u1", count=len(paths))
+    return extensions, categories
+
+
+def parse_time(value):
+    """A Unix timestamp or an ISO date/datetime (local time) → timestamp; empty → None."""
+    if value is None or str(value).strip() == "":
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}', expected YYYY-MM-DD[THH:MM] or a Unix timestamp")
+
+
+def _split(value, name):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    elif not isinstance(value, (list, tuple)) or not all(isinstance(v, str) for v in value):
+        raise ValueError(f'"{name}" must be a comma-separated string or a list of strings')
+    return [v.strip() for v in value if v and v.strip()]
+
+
+class SearchFilter:
+    """
+    What a search is restricted to. Empty fields don't filter; several
+    extensions or categories match any of them. modified_before is exclusive.
+    """
+
+    def __init__(self, exts=(), categories=(), modified_after=None, modified_before=None):
+        self.exts = tuple(sorted({"." + e.lower().lstrip(".") for e in exts}))
+        names = {c.capitalize() for c in categories}
+        unknown = names - CATEGORY_CODES.keys()
+        if unknown:
+            raise ValueError(f"Unknown category {sorted(unknown)}, expected any of {CATEGORY_NAMES}")
+        self.categories = tuple(sorted(names))
+        self.modified_after = modified_after
+        self.modified_before = modified_before
+
+    @classmethod
+    def from_args(cls, args):
+        """
+        Parse ?ext=pdf,docx&category=Downloads&modified_after=2024-09-01
+        from request args (or any dict). Raises ValueError on bad input.
+        """
+        return cls(
+            exts=_split(args.get("ext"), "ext"),
+            categories=_split(args.get("category"), "category"),
+            modified_after=parse_time(args.get("modified_after")),
+            modified_before=parse_time(args.get("modified_before")),
+        )
+
+    def __bool__(self):
+        return bool(self.exts or self.categories or self.dated)
+
+    @property
+    def dated(self):
+        return self.modified_after is not None or self.modified_before is not None
+
+    def key(self):
+        return self.exts, self.categories, self.modified_after, self.modified_before
+
+
+class FilterIndex:
+    """
+    Attribute filters over one loaded store, pushed into FAISS as ID selectors.
+
+    Extension, folder category and modified time are columns of the path
+    table. On the first filtered query every stored chunk is mapped to its
+    document row once; after that a filter costs a few vectorized masks
+    and the plan is cached:
+
+    - flat / HNSW (IndexIDMap2): a bitmap over the index's internal rows,
+      searched on the inner index, with rows translated back to chunk ids.
+      Very selective filters skip the ANN index and score the few matching
+      vectors exactly.
+    - IVF: ids are checked as stored, so the smaller of the matching or
+      non-matching chunk ids goes into an IDSelectorBatch, and nprobe is
+      widened by 1 / selectivity so as many matching vectors get scored as
+      an unfiltered query would score.
+    """
+
+    def __init__(self, index, paths, fmt):
+        self.index = index
+        self.paths = paths
+        self.fmt = fmt
+        self._lock = threading.Lock()
+        self._ready = False
+        self._masks = {}
+        self._plans = OrderedDict()
+
+    def _prepare(self):
+        paths = self.paths
+        if getattr(paths, "extension", None) is not None:
+            doc_ids, extensions, categories, modified = paths.ids, paths.extension, paths.category, paths.modified
+        else:
+            # Store written without filter columns: derive what the paths tell us
+            items = sorted(paths.items())
+            doc_ids = np.array([doc_id for doc_id, _ in items], dtype="int64")
+            extensions, categories = path_columns([path for _, path in items])
+            modified = np.full(len(items), np.nan)
+        self.extension, self.category = extensions, categories
+        self.by_modified = np.argsort(modified, kind="stable")  # undated (NaN) last
+        self.sorted_modified = modified[self.by_modified]
+        self.n_dated = int(np.count_nonzero(~np.isnan(modified)))
+
+        # Chunk → document row; chunks without a row (sentinel n) never match
+        n = len(doc_ids)
+        self.chunk_ids = stored_ids(self.index)
+        docs = self.chunk_ids >> CHUNK_BITS if self.fmt >= 2 else self.chunk_ids
+        rows = np.searchsorted(doc_ids, docs)
+        found = rows < n
+        found[found] = doc_ids[rows[found]] == docs[found]
+        rows[~found] = n
+        self.chunk_rows = rows
+        self.n_docs = n
+        self.row_mapped = not isinstance(self.index, faiss.IndexIVF)
+        self._ready = True
+
+    def _value_mask(self, column, value):
+        mask = self._masks.get((column, value))
+        if mask is None:
+            mask = self._masks[(column, value)] = getattr(self, column) == value
+        return mask
+
+    def _doc_mask(self, search_filter):
+        mask = np.ones(self.n_docs + 1, dtype=bool)
+        mask[-1] = False
+        if search_filter.exts:
+            wanted = np.zeros(self.n_docs, dtype=bool)
+            for ext in search_filter.exts:
+                wanted |= self._value_mask("extension", ext.encode("utf-8", "surrogateescape")[:EXT_WIDTH])
+            mask[:-1] &= wanted
+        if search_filter.categories:
+            wanted = np.zeros(self.n_docs, dtype=bool)
+            for name in search_filter.categories:
+                wanted |= self._value_mask("category", CATEGORY_CODES[name])
+            mask[:-1] &= wanted
+        if search_filter.dated:
+            dated = self.sorted_modified[:self.n_dated]
+            after, before = search_filter.modified_after, search_filter.modified_before
+            lo = 0 if after is None else np.searchsorted(dated, after, "left")
+            hi = self.n_dated if before is None else np.searchsorted(dated, before, "left")
+            wanted = np.zeros(self.n_docs, dtype=bool)
+            wanted[self.by_modified[lo:hi]] = True
+            mask[:-1] &= wanted
+        return mask
+
+    def _plan(self, search_filter):
+        key = search_filter.key()
+        with self._lock:
+            if not self._ready:
+                self._prepare()
+            if key in self._plans:
+                self._plans.move_to_end(key)
+                return self._plans[key]
+
+            chunk_mask = self._doc_mask(search_filter)[self.chunk_rows]
+            allowed = np.flatnonzero(chunk_mask)
+            if not len(allowed):
+                plan = None
+            elif self.row_mapped and len(allowed) <= EXACT_SEARCH_MAX:
+                plan = ("exact", allowed)
+            elif self.row_mapped:
+                bitmap = np.packbits(chunk_mask, bitorder="little")
+                plan = ("rows", (bitmap, faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))))
+            else:
+                # Hash whichever side is smaller
+                negate = len(allowed) * 2 > len(chunk_mask)
+                ids = np.ascontiguousarray(self.chunk_ids[~chunk_mask if negate else allowed])
+                batch = faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids))
+                selectivity = len(allowed) / len(chunk_mask)
+                plan = ("ids", (ids, batch, faiss.IDSelectorNot(batch) if negate else batch, selectivity))
+
+            self._plans[key] = plan
+            if len(self._plans) > FILTER_CACHE:
+                self._plans.popitem(last=False)
+            return plan
+
+    def _inner(self):
+        return faiss.downcast_index(self.index.index) if isinstance(self.index, faiss.IndexIDMap2) else self.index
+
+    def search(self, query_vectors, k, search_filter, nprobe=None, ef_search=None):
+        """
+        Like index.search, but only over chunks of documents matching
+        `search_filter`. May return fewer than k columns (or -1 labels)
+        when fewer chunks match.
+        """
+        plan = self._plan(search_filter)
+        if plan is None:
+            return np.zeros((len(query_vectors), 0), dtype="float32"), np.zeros((len(query_vectors), 0), dtype="int64")
+
+        kind, payload = plan
+        if kind == "exact":
+            vectors = self._inner().reconstruct_batch(payload)
+            scores = query_vectors @ vectors.T  # inner product, like the index metric
+            top = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+            return np.take_along_axis(scores, top, axis=1), self.chunk_ids[payload][top]
+        if kind == "rows":
+            params = search_params(self.index, nprobe=nprobe, ef_search=ef_search, sel=payload[1])
+            D, rows = self._inner().search(query_vectors, k, params=params)
+            return D, np.where(rows >= 0, self.chunk_ids[np.maximum(rows, 0)], -1)
+        nprobe = min(self.index.nlist, int(np.ceil((nprobe or self.index.nprobe) / payload[3])))
+        params = search_params(self.index, nprobe=nprobe, sel=payload[2])
+        return self.index.search(query_vectors, k, params=params)
@@ -1,30 +1,29 @@
 # ✅ indexer.py
-import os
-import pickle
-import faiss
-from embedder import Embedder
-
-INDEX_PATH = "Aaryan_store/index.faiss"
-META_PATH = "Aaryan_store/meta.pkl"
-
-embedder = Embedder()
-
-def index_documents(documents: dict):
-    texts = [v["content"] if v["content"] else v["filename"] for v in documents.values()]
-    metadata = list(documents.values())
-
-    print(f"🧠 Starting embedding for {len(texts)} documents...")
-    vectors = embedder.embed_texts(texts)
-    print("✅ Embedding complete.")
-
-    faiss.normalize_L2(vectors)
-    index = faiss.IndexFlatIP(vectors.shape[1])
-    index.add(vectors)
-
-    os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
-    faiss.write_index(index, INDEX_PATH)
-
-    with open(META_PATH, "wb") as f:
-        pickle.dump(documents, f)
-
-    print(f"✅ FAISS index saved to '{INDEX_PATH}'. Total documents indexed: {len(documents)}")
+from embedder import get_embedder, EmbeddingEngine
+from embed_cache import CachedEmbedder
+from db import init_db
+from pipeline import build_index
+from store import STORE_DIR
+
+embedder = get_embedder()  # shared, loads on first use
+
+# ✅ Same chunked, cached path as api.py and the scanner
+index_embedder = CachedEmbedder(EmbeddingEngine(embedder))
+
+def index_documents(documents: dict, roots=()):
+    """
+    Replace the index with a fresh one built from a {path: metadata} dict,
+    through the same pipeline.build_index as api.index_documents, so
+    Searcher sees the result.
+
+    Args:
+        documents (dict): {path: {"filename", "path", "extension", "size", "modified", "content"}}.
+        roots: scan roots to shard by (default: drive or top-level folder).
+    """
+    init_db()
+    print(f"🧠 Starting embedding for {len(documents)} documents...")
+    try:
+        indexed, shard_count = build_index(documents, index_embedder, roots=roots)
+    finally:
+        index_embedder.close()
+    print(f"✅ FAISS index saved to '{STORE_DIR}' ({shard_count} shards). Total documents indexed: {indexed}")
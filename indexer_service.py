@@ -1,80 +1,181 @@
 # indexer_service.py
 
-from flask import Flask, request, jsonify
-from query_embedder import QueryEmbedder
-from indexer import index_documents
-import faiss
-import numpy as np
-import pickle
 import os
+import json
+import time
+from flask import Flask, Response, request, jsonify, stream_with_context
+from embedder import get_embedder, EmbeddingEngine
+from embed_cache import CachedEmbedder
+from db import init_db
+from pipeline import index_batch, Checkpoints, INDEX_LOCK, BATCH_SIZE
+from store import STORE_DIR
+from shards import ShardSet
+from metrics import INDEX_SECONDS
 
 app = Flask(__name__)
 
-# Paths
-<<<<<<< HEAD
-INDEX_PATH = "vector_storeAaru/index.faiss"
-META_PATH = "vector_storeAaru/meta.pkl"
-=======
-INDEX_PATH = "vector_store/index.faiss"
-META_PATH = "vector_store/meta.pkl"
->>>>>>> main
-
-# Load embedding model once
-embedder = QueryEmbedder()
-
-def save_index(index, metadata):
-    os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
-    faiss.write_index(index, INDEX_PATH)
-    with open(META_PATH, "wb") as f:
-        pickle.dump(metadata, f)
-    print(f"✅ Saved FAISS index to {INDEX_PATH} and metadata to {META_PATH}")
-
-def index_documents(documents: dict):
+# 🔧 Streaming ingestion
+STREAM_BATCH = BATCH_SIZE     # documents per embed / FAISS add / acknowledgement
+MAX_LINE_BYTES = 64 << 20     # longest NDJSON line (one document) accepted
+LOCK_TIMEOUT = 30             # seconds to wait for another writer before answering 409
+
+# Load embedding model once; same cached, length-bucketed path as the scanner
+index_embedder = CachedEmbedder(EmbeddingEngine(get_embedder()))
+
+
+def document_meta(doc):
     """
-    Embed and index the parsed documents using FAISS.
-    
-    Args:
-        documents (dict): Mapping of file paths ➝ extracted text
+    One ingested document → (path, metadata) in the shape the pipeline
+    indexes. `doc` is a dict or a JSON line with "path" and "content", and
+    optionally "filename", "size" and "modified" (Unix time). Raises
+    ValueError on anything else.
     """
-    if not documents:
-        print("[INDEXER] No documents to index.")
-        return
+    if isinstance(doc, (bytes, str)):
+        doc = json.loads(doc)
+    if not isinstance(doc, dict) or not isinstance(doc.get("path"), str) or not doc["path"]:
+        raise ValueError('expected an object with a "path"')
+    content = doc.get("content")
+    if content is not None and not isinstance(content, str):
+        raise ValueError('"content" must be a string')
+    path = doc["path"]
+    return path, {
+        "filename": doc.get("filename") or os.path.basename(path),
+        "path": path,
+        "extension": os.path.splitext(path)[1].lower(),
+        "size": int(doc["size"]) if doc.get("size") is not None else len((content or "").encode("utf-8", "ignore")),
+        "modified": float(doc["modified"]) if doc.get("modified") is not None else time.time(),
+        "content": content,
+    }
+
+
+def ndjson_lines(stream):
+    """Lines of a request body as they arrive; None stands in for a line over MAX_LINE_BYTES."""
+    while True:
+        line = stream.readline(MAX_LINE_BYTES + 1)
+        if not line:
+            return
+        if len(line) > MAX_LINE_BYTES and not line.endswith(b"\n"):
+            # Skip the rest of the oversized line
+            while line and not line.endswith(b"\n"):
+                line = stream.readline(MAX_LINE_BYTES)
+            yield None
+            continue
+        yield line
+
+
+def ingest(documents, batch_size=STREAM_BATCH):
+    """
+    Index documents as they are read, growing the shards they route to in
+    place.
 
-    paths = list(documents.keys())
-    texts = list(documents.values())
+    Reading stops while a batch is embedded and added, so a client streaming
+    faster than the model keeps is held back by TCP flow control instead of
+    being buffered here. The caller must hold INDEX_LOCK.
 
-    # Embed documents
-    print(f"📊 Embedding {len(texts)} documents...")
-    vectors = embedder.embed_documents(texts)
+    Args:
+        documents: iterable of dicts or JSON lines (see document_meta); None
+            marks a line that was too long.
+        batch_size (int): documents per embed / FAISS add.
 
-    # Normalize for cosine similarity
-    faiss.normalize_L2(vectors)
+    Yields:
+        one acknowledgement dict per batch, then a summary with "done": True.
+    """
+    shards = ShardSet()
+    checkpoints = Checkpoints(shards)
+    batch = {}
+    errors = []
+    totals = {"received": 0, "indexed": 0, "failed": 0, "batches": 0}
+    acked = 0  # totals["received"] at the last acknowledgement
+
+    def flush():
+        nonlocal batch, errors, acked
+        count = index_batch(batch, index_embedder, shards)
+        totals["batches"] += 1
+        totals["indexed"] += count
+        ack = {"batch": totals["batches"], "received": totals["received"] - acked, "indexed": count,
+               "errors": errors}
+        acked = totals["received"]
+        if checkpoints.maybe_save():
+            ack["saved"] = True
+        batch, errors = {}, []
+        return ack
 
-    # Create FAISS index
-    dim = vectors.shape[1]
-    index = faiss.IndexFlatIP(dim)
-    index.add(vectors)
+    try:
+        for number, doc in enumerate(documents, 1):
+            if isinstance(doc, (bytes, str)) and not doc.strip():
+                continue
+            totals["received"] += 1
+            try:
+                if doc is None:
+                    raise ValueError(f"line longer than {MAX_LINE_BYTES} bytes")
+                path, meta = document_meta(doc)
+            except (ValueError, TypeError) as e:
+                totals["failed"] += 1
+                errors.append({"line": number, "error": str(e)})
+                continue
+            batch[path] = meta
+            if len(batch) >= batch_size:
+                yield flush()
+        if batch:
+            yield flush()
+        elif errors:
+            yield {"batch": totals["batches"] + 1, "received": totals["received"] - acked, "indexed": 0,
+                   "errors": errors}
+    except Exception as e:
+        print("[INDEXER ERROR]", str(e))
+        yield {"error": f"{type(e).__name__}: {e}", **totals}
+    finally:
+        # ✅ Everything acknowledged so far is kept, even if the upload broke off
+        if shards.dirty and totals["indexed"]:
+            with INDEX_SECONDS.time(op="save"):
+                shards.save(convert=True)
+            print(f"✅ Indexed {totals['indexed']} streamed documents into '{STORE_DIR}'")
+    yield {"done": True, **totals}
+
+
+@app.route("/index/stream", methods=["POST"])
+def index_stream():
+    """
+    NDJSON upload, one {"path": ..., "content": ...} per line (plain or
+    chunked transfer encoding). Answers with NDJSON too: one acknowledgement
+    per indexed batch as it completes, then a summary.
+    """
+    init_db()
+    if not INDEX_LOCK.acquire(timeout=LOCK_TIMEOUT):
+        return jsonify({"error": "Another indexing run is in progress"}), 409
+    batch_size = max(1, request.args.get("batch", STREAM_BATCH, type=int))
+    acks = ingest(ndjson_lines(request.stream), batch_size)
+    response = Response(stream_with_context(json.dumps(ack) + "\n" for ack in acks),
+                        mimetype="application/x-ndjson")
+    # Released once the response is finished or abandoned (after ingest has saved)
+    response.call_on_close(INDEX_LOCK.release)
+    return response
 
-    # Save FAISS index and file paths
-    save_index(index, paths)
 
 @app.route("/index", methods=["POST"])
 def index_api():
+    # Whole-body JSON {"parsed_docs": {path: text}}, kept for existing clients;
+    # indexed through the same in-place batches as /index/stream
+    data = request.get_json(silent=True) or {}
+    parsed_docs = data.get("parsed_docs", {})
+    print(f"[INDEXER] Received {len(parsed_docs)} documents.")
+
+    init_db()
+    if not INDEX_LOCK.acquire(timeout=LOCK_TIMEOUT):
+        return jsonify({"error": "Another indexing run is in progress"}), 409
     try:
-        data = request.get_json()
-        parsed_docs = data.get("parsed_docs", {})
+        acks = list(ingest({"path": path, "content": text} for path, text in parsed_docs.items()))
+    finally:
+        INDEX_LOCK.release()
 
-        print(f"[INDEXER] Received {len(parsed_docs)} documents.")
-        index_documents(parsed_docs)
+    summary = acks[-1]
+    failed = [ack for ack in acks if "error" in ack]
+    if failed:
+        return jsonify({"error": failed[0]["error"], "count": summary["indexed"]}), 500
+    return jsonify({"message": "Indexed successfully", "count": summary["indexed"],
+                    "errors": [e for ack in acks for e in ack.get("errors", [])]}), 200
 
-        return jsonify({"message": "Indexed successfully", "count": len(parsed_docs)}), 200
-
-    except Exception as e:
-        import traceback
-        print("[INDEXER ERROR]", str(e))
-        traceback.print_exc()
-        return jsonify({"error": str(e)}), 500
 
 if __name__ == "__main__":
     print("⚙️ Indexer Service running on port 5002")
-    app.run(port=5002)
+    app.run(port=5002, threaded=True)
@@ -0,0 +1,233 @@
+# jobs.py
+import os
+import json
+import time
+import uuid
+import queue
+import threading
+import traceback
+
+JOBS_PATH = "Aaryan_store/jobs.json"
+SAVE_INTERVAL = 2.0   # seconds between progress snapshots on disk
+KEEP_FINISHED = 50    # finished jobs remembered in jobs.json
+
+ACTIVE_STATES = ("queued", "running")
+
+
+class Job:
+    """One background scan/index run and its live progress."""
+
+    def __init__(self, params=None, job_id=None):
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.params = params or {}
+        self.status = "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.resumed = False
+        self.progress = {}
+        self.stop = threading.Event()
+
+    def to_dict(self):
+        progress = dict(self.progress)
+        elapsed = ((self.finished or time.time()) - self.started) if self.started else 0.0
+        indexed = progress.get("indexed", 0)
+        to_process = progress.get("added", 0) + progress.get("updated", 0)
+        rate = indexed / elapsed if elapsed > 0 else 0.0
+
+        # ETA is only meaningful once the walk knows how many files changed
+        eta = None
+        if self.status == "running" and progress.get("walk_complete") and rate > 0:
+            eta = round(max(0, to_process - indexed) / rate, 1)
+
+        return {
+            "id": self.id,
+            "status": self.status,
+            "params": self.params,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "error": self.error,
+            "resumed": self.resumed,
+            "progress": {
+                "files_scanned": progress.get("scanned", 0),
+                "files_extracted": progress.get("extracted", 0),
+                "files_embedded": indexed,
+                "files_to_process": to_process,
+                "walk_complete": progress.get("walk_complete", False),
+                "files_per_second": round(rate, 2),
+                "eta_seconds": eta,
+            },
+            "result": {k: progress[k] for k in ("added", "updated", "deleted", "unchanged", "drives")
+                       if k in progress} if self.status == "completed" else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        job = cls(data.get("params"), data["id"])
+        job.status = data["status"]
+        job.created = data.get("created", time.time())
+        job.started = data.get("started")
+        job.finished = data.get("finished")
+        job.error = data.get("error")
+        job.resumed = data.get("resumed", False)
+        return job
+
+
+class JobManager:
+    """
+    Runs index jobs one at a time on a background worker thread.
+
+    Job state is snapshotted to JOBS_PATH, so jobs that were queued or running
+    when the process died are resumed on the next start. Resuming is cheap:
+    the pipeline skips files already checkpointed into the index and the
+    embedding cache covers the rest.
+
+    Request threads, the worker and its progress ticker all change jobs and
+    save them; `_lock` serializes both.
+    """
+
+    def __init__(self, runner, path=JOBS_PATH):
+        self.runner = runner  # callable(stop=Event, progress=dict, **params) -> stats
+        self.path = path
+        self.jobs = {}
+        self._queue = queue.Queue()
+        self._lock = threading.RLock()
+        self._worker = None
+        self._last_save = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._worker is not None:
+                return
+            self._load()
+            self._worker = threading.Thread(target=self._run, name="index-jobs", daemon=True)
+            self._worker.start()
+
+    def submit(self, **params):
+        self.start()
+        with self._lock:
+            active = self.active_job()
+            if active is not None:
+                return active, False
+            job = Job(params)
+            self.jobs[job.id] = job
+            self._queue.put(job)
+            self._save(force=True)
+        return job, True
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def all_jobs(self):
+        """Every remembered job, newest first."""
+        with self._lock:
+            return sorted(self.jobs.values(), key=lambda j: j.created, reverse=True)
+
+    def active_job(self):
+        with self._lock:
+            for job in self.jobs.values():
+                if job.status in ACTIVE_STATES:
+                    return job
+        return None
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status not in ACTIVE_STATES:
+                return job
+            job.stop.set()
+            if job.status == "queued":
+                job.status = "cancelled"
+                job.finished = time.time()
+            self._save(force=True)
+        return job
+
+    def _finish(self, job, status, error=None):
+        with self._lock:
+            job.status = status
+            job.error = error
+            job.finished = time.time()
+            self._save(force=True)
+
+    # ✅ Worker loop: one failing job (or a failed save) never stops the jobs queued behind it
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run_job(job)
+            except Exception as e:
+                traceback.print_exc()
+                if job.status in ACTIVE_STATES:
+                    self._finish(job, "failed", str(e))
+
+    def _run_job(self, job):
+        with self._lock:
+            if job.status != "queued":
+                return
+            job.status = "running"
+            job.started = time.time()
+            self._save(force=True)
+        print(f"⚙️ Job {job.id} started {job.params}")
+
+        ticker = threading.Thread(target=self._tick, args=(job,), daemon=True)
+        ticker.start()
+        try:
+            self.runner(stop=job.stop, progress=job.progress, **job.params)
+        except Exception as e:
+            traceback.print_exc()
+            self._finish(job, "failed", str(e))
+        else:
+            self._finish(job, "cancelled" if job.stop.is_set() else "completed")
+        print(f"⚙️ Job {job.id} {job.status}")
+
+    def _tick(self, job):
+        while job.status == "running":
+            self._save()
+            time.sleep(SAVE_INTERVAL)
+
+    # ✅ Persistence: best effort, a job keeps running even if its snapshot can't be written
+    def _save(self, force=False):
+        with self._lock:
+            now = time.time()
+            if not force and now - self._last_save < SAVE_INTERVAL:
+                return
+            self._last_save = now
+
+            jobs = sorted(self.jobs.values(), key=lambda j: j.created)
+            finished = [j for j in jobs if j.status not in ACTIVE_STATES][-KEEP_FINISHED:]
+            keep = [j for j in jobs if j.status in ACTIVE_STATES or j in finished]
+            tmp = f"{self.path}.{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp"
+            try:
+                data = [j.to_dict() for j in keep]
+                os.makedirs(os.path.dirname(self.path), exist_ok=True) if os.path.dirname(self.path) else None
+                with open(tmp, "w") as f:
+                    json.dump(data, f, indent=2)
+                os.replace(tmp, self.path)
+            except (OSError, TypeError, ValueError, RuntimeError) as e:
+                print(f"⚠ Could not save jobs to {self.path}: {e}")
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠ Could not read {self.path}: {e}")
+            return
+
+        for item in data:
+            job = Job.from_dict(item)
+            if job.status in ACTIVE_STATES:
+                # Interrupted by a restart: run it again from where the index left off
+                print(f"🔁 Resuming job {job.id}")
+                job.status = "queued"
+                job.resumed = True
+                self._queue.put(job)
+            self.jobs[job.id] = job
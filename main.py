@@ -1,9 +1,9 @@
-from embedder import Embedder
+from embedder import get_embedder
 from search import search_documents
 
 def main():
     print("🧠 Loading embedding model...")
-    embedder = Embedder()
+    embedder = get_embedder().warm_up()
 
     while True:
         query = input("\n🔎 Enter search query (or 'exit'): ").strip()
@@ -0,0 +1,203 @@
+# metrics.py
+import time
+import heapq
+import threading
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+
+# 🔧 Histogram buckets (seconds)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SLOWEST_FILES = 50    # slowest extractions kept for /metrics?format=json
+RECENT_FAILURES = 100  # last extraction errors kept with their reason
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+    def snapshot(self):
+        with self._lock:
+            return [{"labels": dict(key), "value": value} for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., +Inf count], sum
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][slot] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+    def snapshot(self):
+        out = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                n = sum(counts)
+                out.append({"labels": dict(key), "count": n, "sum": round(total, 6),
+                            "mean": round(total / n, 6) if n else None,
+                            "p50": self._quantile(counts, n, 0.5), "p99": self._quantile(counts, n, 0.99)})
+        return out
+
+    def _quantile(self, counts, n, q):
+        # Upper bound of the bucket holding the q-th observation
+        if not n:
+            return None
+        rank = q * n
+        cumulative = 0
+        for bound, count in zip(self.buckets + (None,), counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return None
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self._slowest = []  # min-heap of (seconds, path, ext)
+        self._failures = deque(maxlen=RECENT_FAILURES)
+        self._lock = threading.Lock()
+
+    def counter(self, name, help_text):
+        metric = Counter(name, help_text)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def note_file(self, path, ext, seconds):
+        with self._lock:
+            item = (seconds, path, ext)
+            if len(self._slowest) < SLOWEST_FILES:
+                heapq.heappush(self._slowest, item)
+            elif seconds > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, item)
+
+    def note_failure(self, path, ext, reason, error=None):
+        with self._lock:
+            self._failures.append({"path": path, "extension": ext, "reason": reason,
+                                   "error": error, "at": time.time()})
+
+    def render(self):
+        """Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        with self._lock:
+            slowest = sorted(self._slowest, reverse=True)
+            failures = list(self._failures)
+        return {
+            "metrics": {m.name: m.snapshot() for m in self.metrics},
+            "slowest_files": [{"path": p, "extension": e, "seconds": round(s, 4)} for s, p, e in slowest],
+            "recent_failures": failures,
+        }
+
+
+class StageTimer:
+    """Times named stages into a histogram and keeps this request's breakdown in ms."""
+
+    def __init__(self, histogram, **labels):
+        self.histogram = histogram
+        self.labels = labels
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.histogram.observe(seconds, stage=name, **self.labels)
+            self.stages[name] = round(self.stages.get(name, 0) + seconds * 1000, 3)
+
+
+registry = Registry()
+
+# ✅ Scan
+WALK_FILES = registry.counter("docfinder_walk_files_total", "Indexable files found by the walker")
+WALK_SECONDS = registry.histogram("docfinder_walk_seconds", "Time spent enumerating one scan root")
+EXTRACT_SECONDS = registry.histogram("docfinder_extract_seconds", "read_file_content latency per file")
+EXTRACT_FAILURES = registry.counter("docfinder_extract_failures_total",
+                                    "Files that produced no text (reason: error, timeout, empty)")
+EXTRACT_TRUNCATED = registry.counter("docfinder_extract_truncated_total",
+                                     "Files whose text was cut at a reader budget (reason: chars, pages, rows, time)")
+
+# ✅ Embedding
+EMBED_BATCH_SECONDS = registry.histogram("docfinder_embed_batch_seconds", "Model time per embed_texts batch")
+EMBED_TEXTS = registry.counter("docfinder_embed_texts_total", "Texts (chunks or queries) encoded")
+EMBED_TOKENS = registry.counter("docfinder_embed_tokens_total",
+                                "Whitespace tokens encoded (approximates model tokens)")
+QUERY_EMBED_CACHE = registry.counter("docfinder_query_embed_cache_total",
+                                     "Search query vectors by source (result: hit, miss, coalesced)")
+
+# ✅ Storage
+DB_WRITE_SECONDS = registry.histogram("docfinder_db_write_seconds", "SQLite write latency per batch")
+INDEX_SECONDS = registry.histogram("docfinder_index_seconds", "FAISS add/remove/convert/save latency")
+
+# ✅ Queries
+QUERY_SECONDS = registry.histogram("docfinder_query_seconds", "Search latency per stage")
@@ -0,0 +1,160 @@
+# ocr.py
+import io
+import os
+import time
+import hashlib
+import sqlite3
+import numpy as np
+from PIL import Image, ImageOps
+import pytesseract
+
+# 🔧 OCR configuration
+OCR_CACHE_PATH = "Aaryan_store/ocr_cache.db"
+OCR_CACHE_ENTRIES = 200_000   # cached results, least recently used go first
+OCR_LANG = "eng"
+OCR_MAX_SIDE = 2500           # longer side is downscaled to this before OCR
+TEXT_CHECK = True             # skip OCR on images that don't look like they hold text
+THUMB_SIDE = 384              # thumbnail used for the text check
+EDGE_STRENGTH = 48            # grey-level step counted as a sharp edge
+MIN_EDGE_DENSITY = 0.004      # sharp edges per pixel below this: blank or smooth image
+MIN_CRISPNESS = 0.22          # sharp edges / all edges below this: continuous-tone photo
+
+# Part of every cache key: changing a setting above that decides what OCR returns
+# (including which images the text check skips as "") invalidates old results.
+# Bump the leading number when the code changes what they return.
+OCR_VERSION = (f"2:{OCR_LANG}:{OCR_MAX_SIDE}:"
+               f"{TEXT_CHECK and (THUMB_SIDE, EDGE_STRENGTH, MIN_EDGE_DENSITY, MIN_CRISPNESS)}")
+
+
+def image_key(data):
+    """sha1 over (OCR settings, raw file bytes)."""
+    return hashlib.sha1(OCR_VERSION.encode() + b"\0" + data).digest()
+
+
+def normalize(img):
+    """First frame, EXIF-rotated, greyscale and at most OCR_MAX_SIDE on the longer side."""
+    img.seek(0)
+    img.draft("L", (OCR_MAX_SIDE, OCR_MAX_SIDE))  # JPEGs decode straight at a reduced scale
+    img = ImageOps.exif_transpose(img).convert("L")
+    if max(img.size) > OCR_MAX_SIDE:
+        img.thumbnail((OCR_MAX_SIDE, OCR_MAX_SIDE), Image.LANCZOS)
+    return img
+
+
+def likely_has_text(img):
+    """
+    Cheap text-presence check on a thumbnail of a normalized image.
+
+    Printed text is many sharp strokes on a flat background: plenty of
+    strong grey-level steps, and few soft gradients around them. Blank and
+    smooth images fail the first test, ordinary photos (mostly soft
+    gradients and texture) the second. Tune or turn off with TEXT_CHECK if
+    photos of signs and whiteboards matter.
+    """
+    thumb = img.copy()
+    thumb.thumbnail((THUMB_SIDE, THUMB_SIDE))
+    pixels = np.asarray(thumb, dtype=np.int16)
+    if pixels.shape[0] < 2 or pixels.shape[1] < 2:
+        return False
+    steps = np.concatenate([
+        np.abs(np.diff(pixels, axis=0)).ravel(),
+        np.abs(np.diff(pixels, axis=1)).ravel(),
+    ])
+    sharp = np.count_nonzero(steps >= EDGE_STRENGTH)
+    if sharp < MIN_EDGE_DENSITY * len(steps):
+        return False
+    edges = np.count_nonzero(steps >= 8)
+    return sharp >= MIN_CRISPNESS * edges
+
+
+class OcrCache:
+    """
+    OCR output on disk keyed by image content hash, so duplicate copies and
+    unchanged files are never OCR'd twice. Images that failed the text check
+    are cached too (as ""). Shared by the extraction worker processes.
+    """
+
+    def __init__(self, path=OCR_CACHE_PATH, max_entries=OCR_CACHE_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._checked = False
+        self._count = 0  # rows in the table, as far as this process knows
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._checked:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True) if os.path.dirname(self.path) else None
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS ocr (
+                    key BLOB PRIMARY KEY,
+                    text TEXT,
+                    last_used REAL
+                ) WITHOUT ROWID
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_used ON ocr(last_used)")
+            self._count = conn.execute("SELECT COUNT(*) FROM ocr").fetchone()[0]
+            self._checked = True
+        return conn
+
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute("SELECT text FROM ocr WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE ocr SET last_used = ? WHERE key = ?", (time.time(), key))
+        return None if row is None else row[0]
+
+    def put(self, key, text):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO ocr (key, text, last_used) VALUES (?, ?, ?)",
+                         (key, text, time.time()))
+            self._count += 1
+
+            # ✅ Size-bounded: evict least recently used entries. The running count may
+            # overshoot (replaced keys, other worker processes); it's corrected here
+            if self._count > self.max_entries:
+                self._count = conn.execute("SELECT COUNT(*) FROM ocr").fetchone()[0]
+                excess = self._count - self.max_entries
+                if excess > 0:
+                    conn.execute('''
+                        DELETE FROM ocr WHERE key IN (
+                            SELECT key FROM ocr ORDER BY last_used LIMIT ?
+                        )
+                    ''', (excess,))
+                    self._count -= excess
+
+
+_cache = None
+
+def get_cache():
+    """The process-wide OcrCache, created on first use."""
+    global _cache
+    if _cache is None:
+        _cache = OcrCache()
+    return _cache
+
+
+def ocr_image(path, timeout=0, cache=None):
+    """
+    OCR text of an image file, or "" when it holds no text.
+
+    The file is hashed and looked up in the cache first; on a miss it is
+    normalized, run through the text check and only then through
+    Tesseract. `timeout` (seconds, 0 = none) is passed to Tesseract, whose
+    RuntimeError on timeout propagates and nothing is cached. Raises
+    PIL.UnidentifiedImageError for files that aren't images.
+    """
+    cache = cache or get_cache()
+    with open(path, "rb") as f:
+        data = f.read()
+    key = image_key(data)
+    text = cache.get(key)
+    if text is not None:
+        return text
+
+    img = normalize(Image.open(io.BytesIO(data)))
+    text = ""
+    if not TEXT_CHECK or likely_has_text(img):
+        text = pytesseract.image_to_string(img, lang=OCR_LANG, timeout=timeout).strip()
+    cache.put(key, text)
+    return text
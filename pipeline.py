@@ -0,0 +1,294 @@
+# pipeline.py
+import os
+import time
+import queue
+import threading
+import numpy as np
+import faiss
+from extraction import extract_files, EXTRACT_WORKERS, EXTRACT_TIMEOUT
+from chunker import chunk_text, chunk_id
+from db import upsert_documents, get_indexed_files, delete_documents, replace_chunks
+from shards import ShardSet
+from store import STORE_DIR, WriterLock
+from metrics import DB_WRITE_SECONDS, INDEX_SECONDS
+
+# 🔧 Streaming configuration
+BATCH_SIZE = 256          # files per embed / DB insert / FAISS add
+QUEUE_BATCHES = 4         # extracted batches buffered ahead of the embedder
+CHECKPOINT_SECONDS = 60   # save the store at least this often so results show up early...
+CHECKPOINT_SHARE = 0.1    # ...but never spend more than this share of a run saving
+
+# Held by whoever is writing the index (full scans, watcher updates, the
+# indexer service), also across processes sharing STORE_DIR
+INDEX_LOCK = WriterLock(STORE_DIR)
+
+_DONE = object()
+
+
+def index_batch(batch: dict, embedder, shards):
+    """
+    Chunk and embed one batch of extracted files, then upsert it into SQLite
+    and the FAISS index of each file's shard (a shards.ShardSet). Old chunk
+    vectors of re-indexed files are replaced.
+
+    Returns:
+        int: files indexed.
+    """
+    # Embed before touching the DB so a crash never marks a file as indexed early
+    chunked = {}
+    texts = []
+    for path, meta in batch.items():
+        chunks = chunk_text(meta["content"] or "") or [(0, 0, meta["filename"])]
+        chunked[path] = [(start, end) for start, end, _ in chunks]
+        texts.extend(text for _, _, text in chunks)
+    if not texts:
+        return 0
+    vectors = embedder.embed_texts(texts)
+    faiss.normalize_L2(vectors)
+
+    with DB_WRITE_SECONDS.time(op="upsert_documents"):
+        ids = upsert_documents(batch)
+
+    groups = {}  # shard -> (rows, chunk ids, {doc_id: path}, {doc_id: modified})
+    doc_chunks = {}
+    row = 0
+    for path, spans in chunked.items():
+        doc_id = ids.get(path)
+        if doc_id is not None:
+            rows, chunk_ids, paths, modified = groups.setdefault(shards.route(path, doc_id), ([], [], {}, {}))
+            paths[doc_id] = path
+            modified[doc_id] = batch[path]["modified"]
+            doc_chunks[doc_id] = []
+            for no, (start, end) in enumerate(spans):
+                cid = chunk_id(doc_id, no)
+                doc_chunks[doc_id].append((cid, no, start, end))
+                chunk_ids.append(cid)
+                rows.append(row + no)
+        row += len(spans)
+
+    with DB_WRITE_SECONDS.time(op="replace_chunks"):
+        stale = replace_chunks(doc_chunks)
+    with INDEX_SECONDS.time(op="remove"):
+        shards.discard(stale, {ids[path]: path for path in chunked if path in ids})
+    with INDEX_SECONDS.time(op="add"):
+        for name, (rows, chunk_ids, paths, modified) in groups.items():
+            shards.add(name, vectors[rows], np.array(chunk_ids, dtype="int64"), paths, modified)
+    return len(doc_chunks)
+
+
+def build_index(documents: dict, embedder, roots=(), batch_size=BATCH_SIZE):
+    """
+    Replace the whole index with one built from an already extracted
+    {path: metadata} dict (see api.extract_documents): the same chunk ids,
+    shards and ann.INDEX_TYPE as run_pipeline produces. The previous index
+    keeps serving searches until the new one is saved. Takes INDEX_LOCK.
+
+    Returns:
+        (int, int): documents indexed, shards written.
+    """
+    items = list(documents.items())
+    indexed = 0
+    with INDEX_LOCK:
+        shards = ShardSet(roots=roots, fresh=True)
+        for i in range(0, len(items), batch_size):
+            indexed += index_batch(dict(items[i:i + batch_size]), embedder, shards)
+        if shards.dirty:
+            with INDEX_SECONDS.time(op="save"):
+                shards.save(convert=True)
+    return indexed, len(shards.labels)
+
+
+class Checkpoints:
+    """
+    When a long run saves its shards so partial results become searchable.
+
+    Each checkpoint rewrites the changed shards whole, so its cost grows
+    with the index. Checkpoints are therefore spaced by time, at least
+    CHECKPOINT_SECONDS apart and far enough that saving stays under
+    CHECKPOINT_SHARE of the run: a big first build does linear, not
+    quadratic, disk I/O.
+    """
+
+    def __init__(self, shards, seconds=CHECKPOINT_SECONDS, share=CHECKPOINT_SHARE):
+        self.shards = shards
+        self.seconds = seconds
+        self.share = share
+        self.next = time.monotonic() + seconds
+
+    def maybe_save(self):
+        """Save if a checkpoint is due; returns whether one was written."""
+        if time.monotonic() < self.next:
+            return False
+        start = time.monotonic()
+        with INDEX_SECONDS.time(op="save"):
+            self.shards.save()
+        spent = time.monotonic() - start
+        self.next = time.monotonic() + max(self.seconds, spent / self.share)
+        return True
+
+
+def _put(q, item, stop):
+    # Blocking put that still notices cancellation
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def run_pipeline(walked, embedder, full=False, workers=EXTRACT_WORKERS, timeout=EXTRACT_TIMEOUT,
+                 batch_size=BATCH_SIZE, stop=None, progress=None, deleted=None, roots=None, unlisted=None):
+    """
+    Stream files through extract → chunk/embed → SQLite → FAISS in fixed-size batches.
+
+    Only new or changed files are processed unless `full` is set. Vectors are
+    replaced in place, so searches keep hitting the previous vectors of files
+    that haven't been reached yet.
+
+    Args:
+        walked: iterable of (root, metadata) pairs, e.g. api.walk_files().
+        embedder: object with embed_texts(list[str]) -> np.ndarray.
+        full (bool): re-embed every file, not just changed ones.
+        stop (threading.Event): optional, set it to cancel the run.
+        progress (dict): optional, updated live with the counters below so
+            another thread (e.g. a job status endpoint) can read them.
+        deleted: optional paths known to be gone. Passing it makes this a
+            targeted update (e.g. from the watcher): `walked` only lists the
+            changed files, so nothing else is treated as deleted.
+        roots: the scan roots `walked` covers. Files under other roots are
+            not treated as deleted, and their shards are never touched.
+        unlisted: optional list the walk appends directories it couldn't
+            list to (see walker.walk_roots). Indexed files under them are
+            kept: an unmounted drive or a permission error is not a deletion.
+
+    Returns:
+        dict: added/updated/deleted/unchanged counts, scanned/extracted/indexed
+        progress counters plus per-root totals.
+    """
+    stop = stop or threading.Event()
+    targeted = deleted is not None
+    if targeted:
+        walked = list(walked)
+        deleted = set(deleted)
+        known = get_indexed_files([meta["path"] for _, meta in walked] + list(deleted))
+    else:
+        known = get_indexed_files()
+        if roots is not None:
+            known = {path: row for path, row in known.items() if any(path.startswith(r) for r in roots)}
+    shards = ShardSet(roots=roots or ())
+    # Rebuilding from scratch over an older store: keep that store serving
+    # searches until the new index is complete instead of checkpointing
+    checkpoint = not shards.replacing
+    if shards.empty:
+        full = True
+
+    seen = set()
+    stats = progress if progress is not None else {}
+    stats.update({
+        "added": 0, "updated": 0, "deleted": 0, "unchanged": 0,
+        "scanned": 0, "extracted": 0, "indexed": 0, "walk_complete": False, "drives": {},
+    })
+    if targeted and shards.empty:
+        # A partial update can't seed a new store; the first full scan does that
+        print("⚠ No chunk index yet, skipping targeted update until a full scan has run")
+        return stats
+
+    def changed_files():
+        for root, meta in walked:
+            if stop.is_set():
+                return
+            path = meta["path"]
+            seen.add(path)
+            stats["scanned"] += 1
+            old = known.get(path)
+            # A row whose id never made it into the index (crash before a
+            # checkpoint) counts as changed so the next run picks it up
+            if (not full and old and old[1] == meta["size"] and old[2] == meta["modified"]
+                    and shards.has(path, old[0])):
+                stats["unchanged"] += 1
+                continue
+            stats["added" if old is None else "updated"] += 1
+            yield path, (root, meta)
+        stats["walk_complete"] = True
+
+    batches = queue.Queue(maxsize=QUEUE_BATCHES)
+    errors = []
+
+    # ✅ Stage 1 (background thread): walk + pooled extraction, batched
+    def produce():
+        try:
+            batch = {}
+            for path, (root, meta), content in extract_files(changed_files(), workers=workers, timeout=timeout):
+                meta["content"] = content
+                batch[path] = meta
+                stats["extracted"] += 1
+                stats["drives"][root] = stats["drives"].get(root, 0) + 1
+                if len(batch) >= batch_size:
+                    if not _put(batches, batch, stop):
+                        return
+                    batch = {}
+                if stop.is_set():
+                    return
+            if batch:
+                _put(batches, batch, stop)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            _put(batches, _DONE, threading.Event())
+
+    producer = threading.Thread(target=produce, name="pipeline-extract", daemon=True)
+    producer.start()
+
+    # ✅ Stage 2 (this thread): embed → insert → add, one batch at a time
+    checkpoints = Checkpoints(shards)
+    try:
+        while True:
+            batch = batches.get()
+            if batch is _DONE:
+                break
+
+            stats["indexed"] += index_batch(batch, embedder, shards)
+
+            if checkpoint and checkpoints.maybe_save():
+                print(f"💾 Checkpoint: {stats['indexed']} files indexed so far")
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        # Drain so a producer blocked on a full queue can notice the stop flag
+        while producer.is_alive():
+            try:
+                batches.get(timeout=0.5)
+            except queue.Empty:
+                pass
+    if errors:
+        raise errors[0]
+
+    # ✅ Deletions are only trusted after a complete, uncancelled walk
+    if not stop.is_set():
+        if targeted:
+            gone = [path for path in deleted if path in known and path not in seen]
+        else:
+            # Prefixes of directories (or whole roots) the walk couldn't list
+            skipped = tuple(d if d.endswith(("/", "\\")) else d + os.sep for d in unlisted or ())
+            gone = [path for path in known if path not in seen and not path.startswith(skipped)]
+            if skipped:
+                print(f"⚠ {len(skipped)} directories could not be listed, their indexed files are kept")
+        gone_paths = {known[path][0]: path for path in gone}
+        with DB_WRITE_SECONDS.time(op="delete_documents"):
+            stale = replace_chunks({doc_id: [] for doc_id in gone_paths})
+            removed_ids = delete_documents(gone)
+        with INDEX_SECONDS.time(op="remove"):
+            shards.discard(stale, gone_paths)
+        shards.forget(removed_ids, gone_paths)
+        stats["deleted"] = len(removed_ids)
+
+    # A cancelled from-scratch rebuild is dropped so the old store stays intact
+    if stop.is_set() and not checkpoint:
+        return stats
+    if shards.dirty:
+        with INDEX_SECONDS.time(op="save"):
+            shards.save(convert=True)
+    return stats
@@ -1,44 +1,166 @@
-from sentence_transformers import SentenceTransformer
+import re
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
 import numpy as np
-from typing import List
+import faiss
+from embedder import get_embedder
+from metrics import QUERY_EMBED_CACHE
 
-class QueryEmbedder:
+# 🔧 Query vector cache
+QUERY_CACHE_SIZE = 10_000     # normalized queries kept, least recently used go first
+QUERY_CACHE_TTL = 3600        # seconds a cached vector is served for; 0 = forever
+
+# 🔧 Request coalescing: concurrent queries share one model call
+COALESCE_WAIT_MS = 2          # how long the first query of a batch waits for company
+COALESCE_MAX_BATCH = 64       # queries per model call
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_query(text):
+    """Cache key of a query: whitespace collapsed and trimmed."""
+    return _SPACES.sub(" ", text or "").strip()
+
+
+class QueryEncoder:
     """
-    Converts text queries and documents into vector embeddings using a sentence transformer.
+    Query → L2-normalized vector for search, in front of a shared embedder.
+
+    Repeated queries are answered from an LRU cache (QUERY_CACHE_SIZE
+    entries, QUERY_CACHE_TTL seconds). Misses are handed to one encoder
+    thread that waits up to COALESCE_WAIT_MS for other queries and encodes
+    them together; queries arriving while the model is busy simply join the
+    next batch, so under load requests share forward passes instead of
+    queueing for one each. The same query in flight twice is encoded once.
     """
 
-    def _init_(self, model_name: str = "all-MiniLM-L6-v2"):
-        """
-        Initialize the embedding model.
-        
-        Args:
-            model_name (str): Pretrained model name to load from sentence-transformers.
-        """
-        print(f"🔍 Loading embedding model: {model_name}")
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, embedder, cache_size=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL,
+                 wait_ms=COALESCE_WAIT_MS, max_batch=COALESCE_MAX_BATCH):
+        self.embedder = embedder
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.wait = wait_ms / 1000
+        self.max_batch = max_batch
+        self._cache = OrderedDict()  # key -> (vector, expires)
+        self._pending = OrderedDict()  # key -> Future, waiting for the encoder thread
+        self._in_flight = {}  # key -> Future, queued or being encoded
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._thread = None
 
-    def embed_query(self, query: str) -> np.ndarray:
-        """
-        Embed a single query string into a vector.
+    def _cached(self, key, now):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if self.ttl and entry[1] < now:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return entry[0]
 
-        Args:
-            query (str): The search query text.
-        
-        Returns:
-            np.ndarray: A (1, 384) shaped numpy array vector.
-        """
-        embedding = self.model.encode([query])
-        return np.array(embedding)
+    def _remember(self, vectors):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, vector in vectors.items():
+                self._cache[key] = (vector, expires)
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _encode(self, texts):
+        vectors = np.ascontiguousarray(self.embedder.embed_texts(texts), dtype="float32")
+        faiss.normalize_L2(vectors)
+        return vectors
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._wake.wait()
+                # ✅ Give concurrent queries a moment to join this batch
+                deadline = time.monotonic() + self.wait
+                while len(self._pending) < self.max_batch:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._wake.wait(left)
+                batch = []
+                while self._pending and len(batch) < self.max_batch:
+                    batch.append(self._pending.popitem(last=False))
+
+            keys = [key for key, _ in batch]
+            try:
+                vectors = self._encode(keys)
+            except Exception as e:
+                for key, future in batch:
+                    future.set_exception(e)
+            else:
+                self._remember(dict(zip(keys, vectors)))
+                for (key, future), vector in zip(batch, vectors):
+                    future.set_result(vector)
+            finally:
+                with self._lock:
+                    for key in keys:
+                        self._in_flight.pop(key, None)
 
-    def embed_documents(self, documents: List[str]) -> np.ndarray:
+    def embed_queries(self, texts, coalesce=True):
         """
-        Embed a list of document texts into vectors.
+        Normalized vectors for `texts`, shape (len(texts), dim).
 
         Args:
-            documents (List[str]): A list of document strings.
-        
-        Returns:
-            np.ndarray: An (N, 384) shaped numpy array, where N is the number of documents.
+            texts (List[str]): queries.
+            coalesce (bool): False encodes the misses right here in one call,
+                for callers that already bring a batch (see search.search_batch).
         """
-        embeddings = self.model.encode(documents, show_progress_bar=True)
-        return np.array(embeddings)
\ No newline at end of file
+        keys = [normalize_query(t) for t in texts]
+        found = {}
+        waiting = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                vector = self._cached(key, now)
+                if vector is not None:
+                    found[key] = vector
+                elif key in self._in_flight:
+                    waiting[key] = self._in_flight[key]
+                    QUERY_EMBED_CACHE.inc(result="coalesced")
+                elif coalesce:
+                    waiting[key] = self._in_flight[key] = self._pending[key] = Future()
+                    QUERY_EMBED_CACHE.inc(result="miss")
+            QUERY_EMBED_CACHE.inc(len(found), result="hit")
+            if waiting and coalesce:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="query-encoder", daemon=True)
+                    self._thread.start()
+                self._wake.notify()
+
+        missing = [key for key in dict.fromkeys(keys) if key not in found and key not in waiting]
+        if missing:
+            QUERY_EMBED_CACHE.inc(len(missing), result="miss")
+            fresh = dict(zip(missing, self._encode(missing)))
+            self._remember(fresh)
+            found.update(fresh)
+        for key, future in waiting.items():
+            found[key] = future.result()
+        if not keys:
+            return np.zeros((0, 0), dtype="float32")
+        return np.stack([found[key] for key in keys])
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+# ✅ One encoder (cache + coalescing thread) per shared embedder
+_encoders = {}
+_encoders_lock = threading.Lock()
+
+def get_query_encoder(embedder=None):
+    embedder = embedder or get_embedder()
+    with _encoders_lock:
+        encoder = _encoders.get(embedder)
+        if encoder is None:
+            encoder = _encoders[embedder] = QueryEncoder(embedder)
+        return encoder
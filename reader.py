@@ -1,9 +1,12 @@
 import os
-from PIL import Image, UnidentifiedImageError
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from PIL import UnidentifiedImageError
 import pytesseract
 from PyPDF2 import PdfReader
-from docx import Document
 import openpyxl
+from ocr import ocr_image
 
 # Required for image OCR
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
@@ -13,55 +16,179 @@ IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".bmp", ".webp", ".gif"]
 CODE_EXTENSIONS = [".py", ".java", ".cpp", ".c", ".js", ".sql"]
 SKIP_PREFIXES = ["~$"]
 
+# 🔧 Per-file extraction budgets: past these, the text so far is kept and marked truncated
+MAX_CHARS = 4_000_000    # characters of text per file (≈ bytes read from plain-text files)
+MAX_PAGES = 1000         # PDF pages
+MAX_ROWS = 100_000       # spreadsheet rows, all sheets together
+MAX_SECONDS = 60         # wall time, checked between pages/rows/blocks (extraction.EXTRACT_TIMEOUT still applies)
+READ_BLOCK = 1 << 20     # characters per read from plain-text files
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+class Budget:
+    """
+    Limits for extracting one file. Extractors stop early with stop(reason)
+    when they run out of pages or rows; the caller enforces chars and time
+    between the pieces they yield.
+    """
+
+    def __init__(self, chars=MAX_CHARS, pages=MAX_PAGES, rows=MAX_ROWS, seconds=MAX_SECONDS):
+        self.chars = chars
+        self.pages = pages
+        self.rows = rows
+        self.deadline = time.monotonic() + seconds
+        self.truncated = None  # "chars" | "pages" | "rows" | "time"
+
+    def remaining(self):
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.deadline
+
+    def stop(self, reason):
+        self.truncated = reason
+
+
+# ✅ Extractor registry: extension -> generator(path, budget) yielding text pieces
+EXTRACTORS = {}
+
+def register_extractor(*extensions):
+    def register(func):
+        for ext in extensions:
+            EXTRACTORS[ext.lower()] = func
+        return func
+    return register
+
+
+@register_extractor(".txt", *CODE_EXTENSIONS)
+def _read_text(path, budget):
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        while True:
+            block = f.read(READ_BLOCK)
+            if not block:
+                return
+            yield block
+
+
+@register_extractor(".pdf")
+def _read_pdf(path, budget):
+    # A file handle, not the path: given a path PyPDF2 copies the whole file into memory
+    with open(path, "rb") as f:
+        reader = PdfReader(f)
+        for number, page in enumerate(reader.pages):
+            if number >= budget.pages:
+                budget.stop("pages")
+                return
+            yield ("\n" if number else "") + (page.extract_text() or "")
+
+
+@register_extractor(".docx")
+def _read_docx(path, budget):
+    # Stream paragraphs out of the XML instead of building the whole document tree
+    with zipfile.ZipFile(path) as archive, archive.open("word/document.xml") as xml:
+        first = True
+        for _, element in ET.iterparse(xml):
+            if element.tag == _W + "p":
+                yield ("" if first else "\n") + "".join(t.text or "" for t in element.iter(_W + "t"))
+                first = False
+                element.clear()
+
+
+@register_extractor(".xlsx", ".xls")
+def _read_workbook(path, budget):
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = 0
+        for sheet in wb:
+            for row in sheet.iter_rows(values_only=True):
+                if rows >= budget.rows:
+                    budget.stop("rows")
+                    return
+                rows += 1
+                yield " ".join(str(cell) if cell else "" for cell in row) + "\n"
+    finally:
+        wb.close()
+
+
+@register_extractor(".db")
+def _read_database(path, budget):
+    yield f"[Database File: {os.path.basename(path)}]"
+
+
+@register_extractor(*IMAGE_EXTENSIONS)
+def _read_image(path, budget):
+    seconds = budget.remaining()
+    if not seconds:
+        budget.stop("time")
+        return
+    try:
+        text = ocr_image(path, timeout=seconds)
+    except UnidentifiedImageError:
+        return
+    except RuntimeError as e:
+        if "timeout" not in str(e).lower():
+            raise
+        budget.stop("time")
+        text = ""
+    yield f"[Image: {os.path.basename(path)}]\n{text}"
+
+
 def read_file_content(path):
     """
     Read and extract content based on file extension.
     Return None if file is unsupported, corrupted or skipped.
     """
     try:
-        filename = os.path.basename(path)
-        ext = os.path.splitext(path)[1].lower()
-
-        # Skip temp/lock files like ~$doc.docx
-        if any(filename.startswith(pfx) for pfx in SKIP_PREFIXES):
-            return None
-
-        if ext == ".txt":
-            with open(path, "r", encoding="utf-8", errors="ignore") as f:
-                return f.read()
-
-        elif ext == ".pdf":
-            reader = PdfReader(path)
-            return "\n".join([page.extract_text() or "" for page in reader.pages])
-
-        elif ext == ".docx":
-            doc = Document(path)
-            return "\n".join([p.text for p in doc.paragraphs])
-
-        elif ext in (".xlsx", ".xls"):
-            wb = openpyxl.load_workbook(path, data_only=True)
-            content = ""
-            for sheet in wb:
-                for row in sheet.iter_rows(values_only=True):
-                    content += " ".join(str(cell) if cell else "" for cell in row) + "\n"
-            return content
-
-        elif ext in CODE_EXTENSIONS:
-            with open(path, "r", encoding="utf-8", errors="ignore") as f:
-                return f.read()
-
-        elif ext == ".db":
-            return f"[Database File: {os.path.basename(path)}]"
-
-        elif ext in IMAGE_EXTENSIONS:
-            try:
-                img = Image.open(path)
-                text = pytesseract.image_to_string(img)
-                return f"[Image: {os.path.basename(path)}]\n{text.strip()}"
-            except UnidentifiedImageError:
-                return None
-
+        return extract_text(path)
     except Exception:
         return None
 
-    return None
\ No newline at end of file
+def extract_text(path):
+    """
+    Same as read_file_content, but parsing errors propagate so callers can
+    count and report them. Returns None for unsupported or skipped files.
+    """
+    return extract(path)[0]
+
+def extract(path, budget=None):
+    """
+    Run the registered extractor for `path` within `budget` (a fresh
+    default Budget if omitted). Parsing errors propagate.
+
+    Returns:
+        (text or None, truncated) - truncated names the budget that cut
+        the text short ("chars", "pages", "rows", "time"), or is None.
+    """
+    filename = os.path.basename(path)
+    ext = os.path.splitext(path)[1].lower()
+
+    # Skip temp/lock files like ~$doc.docx
+    if any(filename.startswith(pfx) for pfx in SKIP_PREFIXES):
+        return None, None
+
+    extractor = EXTRACTORS.get(ext)
+    if extractor is None:
+        return None, None
+
+    budget = budget or Budget()
+    pieces = []
+    size = 0
+    pieces_iter = extractor(path, budget)
+    try:
+        for piece in pieces_iter:
+            if size + len(piece) > budget.chars:
+                pieces.append(piece[:budget.chars - size])
+                budget.stop("chars")
+                break
+            pieces.append(piece)
+            size += len(piece)
+            if budget.expired():
+                budget.stop("time")
+                break
+    finally:
+        pieces_iter.close()
+
+    if not pieces:
+        return None, budget.truncated
+    return "".join(pieces), budget.truncated
@@ -1,34 +1,455 @@
-import faiss
-import pickle
+import os
+import threading
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+from ann import dead_rows, search_params
+from chunker import CHUNK_BITS
+from db import get_chunk_spans, get_documents_by_ids, keyword_search
+from store import STORE_DIR, STORE_FORMAT, load_store, store_signature
+from shards import ShardPaths, read_manifest, shard_dir
+from filters import FilterIndex, SearchFilter
+from metrics import StageTimer, QUERY_SECONDS
+from query_embedder import get_query_encoder
 
-INDEX_PATH = "Aaryan_store/index.faiss"
-META_PATH = "Aaryan_store/meta.pkl"
+# How often (seconds) a query may look at the disk for a newer index
+RELOAD_CHECK_INTERVAL = 1.0
 
-def search_documents(query: str, embedder, top_k=5):
-    # ✅ Step 1: Embed the query
-    query_embedding = embedder.embed_texts([query])
-    faiss.normalize_L2(query_embedding)
+# Chunk hits fetched per requested document before aggregating
+CHUNK_FANOUT = 4
 
-    # ✅ Step 2: Load FAISS index
-    index = faiss.read_index(INDEX_PATH)
+# Hybrid search: reciprocal-rank fusion constant and per-retriever candidate depth
+SEARCH_MODES = ("vector", "keyword", "hybrid")
+SCORING_MODES = ("max", "sum")  # chunk scores folded into a document score
+RRF_K = 60
+HYBRID_DEPTH = 4
 
-    # ✅ Step 3: Load metadata (paths)
-    with open(META_PATH, "rb") as f:
-        all_paths = pickle.load(f)
+# Most queries accepted by one search_batch call
+MAX_BATCH = 1000
 
-    # ✅ Step 4: Perform search
-    D, I = index.search(query_embedding, top_k)
+# Shards searched in parallel for one query
+SEARCH_THREADS = min(8, os.cpu_count() or 1)
+
+# Runs the FTS5 query alongside the FAISS query in hybrid mode
+_keyword_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="keyword-search")
+
+# Fans one FAISS query out over the shards of the store
+_shard_pool = ThreadPoolExecutor(max_workers=SEARCH_THREADS, thread_name_prefix="shard-search")
+
+
+class Searcher:
+    """
+    Keeps the FAISS index and path table of every shard mapped in memory and
+    reloads a shard only when its store on disk changes. Queries fan out
+    over the shards in parallel and their hits are merged by score.
+    """
+
+    def __init__(self, store_dir=STORE_DIR):
+        self.store_dir = store_dir
+        self._lock = threading.Lock()
+        self._snapshot = None  # (signature, ((index, paths, fmt, FilterIndex, dead) per shard), paths, fmt)
+        self._shards = {}      # shard name -> (signature, (index, paths, fmt, FilterIndex, dead))
+        self._last_check = 0.0
+
+    def _sources(self):
+        # Sharded store, or a single older one that hasn't been split yet
+        manifest = read_manifest(self.store_dir)
+        if manifest is None:
+            return [(None, self.store_dir)]
+        return [(name, shard_dir(self.store_dir, name)) for name in sorted(manifest["shards"])]
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._last_check < RELOAD_CHECK_INTERVAL:
+            return
+
+        with self._lock:
+            if self._snapshot is not None and now - self._last_check < RELOAD_CHECK_INTERVAL:
+                return
+            self._last_check = now
+
+            sources = [(name, directory, store_signature(directory)) for name, directory in self._sources()]
+            signature = tuple((name, sig) for name, _, sig in sources)
+            if self._snapshot is not None and self._snapshot[0] == signature:
+                return
+
+            shards = {}
+            for name, directory, sig in sources:
+                cached = self._shards.get(name)
+                if cached is not None and cached[0] == sig:
+                    shards[name] = cached
+                    continue
+                loaded = load_store(directory)
+                if loaded is None:
+                    # Writer mid-swap: keep serving the old snapshot, retry next query
+                    self._last_check = 0.0
+                    if self._snapshot is None:
+                        raise RuntimeError("Index is being rebuilt, try again shortly.")
+                    return
+                sig, index, paths, fmt = loaded
+                if isinstance(paths, list):
+                    # Legacy meta.pkl: paths listed in FAISS row order
+                    paths = dict(enumerate(paths))
+                shards[name] = (sig, (index, paths, fmt, FilterIndex(index, paths, fmt), dead_rows(index) > 0))
+                print(f"📦 Loaded FAISS index ({index.ntotal} vectors) from '{directory}'")
+
+            self._shards = shards
+            parts = tuple(part for _, part in shards.values())
+            paths = parts[0][1] if len(parts) == 1 else ShardPaths([part[1] for part in parts])
+            fmt = min((part[2] for part in parts), default=STORE_FORMAT)
+            self._snapshot = (tuple((name, shard[0]) for name, shard in shards.items()), parts, paths, fmt)
+
+    def snapshot(self):
+        self._maybe_reload()
+        return self._snapshot
+
+    def invalidate(self):
+        self._last_check = 0.0
+
+    def search(self, query_vectors, top_k, nprobe=None, ef_search=None, filters=None, snapshot=None):
+        # Use one snapshot for the whole query so index and paths always match
+        _, parts, paths, fmt = snapshot or self.snapshot()
+
+        def search_shard(part):
+            index, _, _, filter_index, dead = part
+            k = min(top_k, max(index.ntotal, 1))
+            if filters or dead:
+                # Tombstoned HNSW rows match no document, so even an empty filter skips them
+                return filter_index.search(query_vectors, k, filters or SearchFilter(), nprobe=nprobe,
+                                           ef_search=ef_search)
+            return index.search(query_vectors, k, params=search_params(index, nprobe=nprobe, ef_search=ef_search))
+
+        if len(parts) == 1:
+            D, I = search_shard(parts[0])
+            return D, I, paths, fmt
+        if not parts:
+            empty = np.zeros((len(query_vectors), 0))
+            return empty.astype("float32"), empty.astype("int64"), paths, fmt
+
+        # ✅ Fan out: one search per shard in parallel, then keep the best top_k of all
+        results = list(_shard_pool.map(search_shard, parts))
+        D = np.hstack([D for D, _ in results])
+        I = np.hstack([I for _, I in results])
+        D = np.where(I >= 0, D, -np.inf)  # padding rows of small shards sort last
+        top = np.argsort(-D, axis=1, kind="stable")[:, :top_k]
+        D, I = np.take_along_axis(D, top, axis=1), np.take_along_axis(I, top, axis=1)
+        return D.astype("float32"), I, paths, fmt
+
+
+# ✅ Process-wide searcher shared by app.py, search_api.py and main.py
+searcher = Searcher()
+
+
+def aggregate_hits(scores, ids, fmt, scoring="max"):
+    """
+    Fold chunk hits into per-document hits.
+
+    Returns:
+        list of (doc_id, score, best_chunk_id) sorted by score; best_chunk_id
+        is None for stores that index whole documents.
+    """
+    docs = {}
+    for score, idx in zip(scores, ids):
+        if idx < 0:
+            continue
+        idx = int(idx)
+        doc_id = idx >> CHUNK_BITS if fmt >= 2 else idx
+        chunk = idx if fmt >= 2 else None
+        if doc_id not in docs:
+            docs[doc_id] = [float(score), float(score), chunk]
+            continue
+        hit = docs[doc_id]
+        hit[1] += float(score)
+        if score > hit[0]:
+            hit[0], hit[2] = float(score), chunk
+
+    key = 1 if scoring == "sum" else 0
+    ranked = sorted(docs.items(), key=lambda item: item[1][key], reverse=True)
+    return [(doc_id, hit[key], hit[2]) for doc_id, hit in ranked]
+
+
+def ann_hits(query_vectors, top_ks, scorings, nprobe=None, ef_search=None, filters=None, snapshot=None):
+    """
+    Document hits for a matrix of normalized query vectors that share search
+    options: one FAISS search over all rows, repeated with a wider k only for
+    the rows that came back with fewer than their top_k documents.
+
+    Returns:
+        ([[(doc_id, score, best_chunk_id)] per row], paths, fmt)
+    """
+    snapshot = snapshot or searcher.snapshot()
+    hits = [None] * len(query_vectors)
+    pending = list(range(len(query_vectors)))
+    k = max(top_ks) * CHUNK_FANOUT
+    while pending:
+        D, I, all_paths, fmt = searcher.search(query_vectors[pending], k, nprobe=nprobe, ef_search=ef_search,
+                                               filters=filters, snapshot=snapshot)
+        short = []
+        for row, i in enumerate(pending):
+            hits[i] = aggregate_hits(D[row], I[row], fmt, scorings[i])
+            # Done once there are enough documents or nothing more matches
+            if not (fmt < 2 or len(hits[i]) >= top_ks[i] or len(I[row]) < k or I[row][-1] < 0):
+                short.append(i)
+        pending = short
+        k *= CHUNK_FANOUT
+    hits = [[hit for hit in row if hit[0] in all_paths][:top_k] for row, top_k in zip(hits, top_ks)]
+    return hits, all_paths, fmt
+
+
+def _with_spans(hits, paths, fmt, spans):
+    return [
+        (doc_id if fmt >= 1 else None, paths[doc_id], score, spans.get(chunk))
+        for doc_id, score, chunk in hits
+    ]
+
+
+def vector_hits(query, embedder, top_k, scoring="max", nprobe=None, ef_search=None, timer=None, filters=None):
+    """
+    Semantic hits as [(doc_id, path, score, (start, end) or None)], best
+    first. doc_id is None for legacy positional stores. `filters` (a
+    filters.SearchFilter) is applied inside the FAISS search.
+    """
+    timer = timer or StageTimer(QUERY_SECONDS, mode="vector")
+
+    # ✅ Step 1: Embed the query (cached, and batched with concurrent queries)
+    with timer.stage("embed"):
+        query_embedding = get_query_encoder(embedder).embed_queries([query])
+
+    # ✅ Step 2: Search the in-memory index, widening until top_k documents show up
+    with timer.stage("ann"):
+        (hits,), all_paths, fmt = ann_hits(query_embedding, [top_k], [scoring], nprobe, ef_search, filters)
+
+    # ✅ Step 3: Look up where the best chunk of each hit sits in the file
+    with timer.stage("spans"):
+        spans = get_chunk_spans([chunk for _, _, chunk in hits if chunk is not None])
+    return _with_spans(hits, all_paths, fmt, spans)
+
+
+def keyword_hits(query, limit, timer, filters=None):
+    with timer.stage("keyword"):
+        return [(doc_id, path, score, None) for doc_id, path, score in keyword_search(query, limit, filters)]
+
+
+def fuse_hits(ranked_lists, top_k):
+    """Reciprocal-rank fusion of several [(doc_id, path, score, span)] lists, keyed by path."""
+    fused = {}
+    for hits in ranked_lists:
+        for rank, (doc_id, path, _, span) in enumerate(hits):
+            entry = fused.setdefault(path, [0.0, None, None])
+            entry[0] += 1.0 / (RRF_K + rank + 1)
+            entry[1] = entry[1] if entry[1] is not None else doc_id
+            entry[2] = entry[2] or span
+    ranked = sorted(fused.items(), key=lambda item: item[1][0], reverse=True)
+    return [(doc_id, path, score, span) for path, (score, doc_id, span) in ranked[:top_k]]
+
+
+def build_results(hits, metadata=None):
+    """
+    Turn hits into result dicts, filling filename/extension/size/modified
+    from the documents table in one query keyed by documents.id (or from
+    `metadata`, when the caller already fetched it).
+    """
+    if metadata is None:
+        metadata = get_documents_by_ids([doc_id for doc_id, _, _, _ in hits if doc_id is not None])
 
     results = []
-    for idx in I[0]:
-        if idx < len(all_paths):
-            path = all_paths[idx]
-            results.append({
-                "filename": path.split("\\")[-1],
-                "path": path,
-                "extension": "." + path.split(".")[-1],
-                "modified": "",  # Optional: Add os.path.getmtime(path)
-            })
+    for doc_id, path, score, span in hits:
+        meta = metadata.get(doc_id)
+        if meta is None:
+            # Legacy store or row vanished mid-refresh: derive what we can from the path
+            meta = {
+                "filename": path.replace("\\", "/").split("/")[-1],
+                "extension": os.path.splitext(path)[1].lower(),
+                "size": None,
+                "modified": None,
+            }
+        modified = meta["modified"]
+        results.append({
+            "filename": meta["filename"],
+            "path": path,
+            "extension": meta["extension"],
+            "filetype": meta["extension"].lstrip(".").upper() or "Unknown",
+            "size": meta["size"],
+            "modified": datetime.fromtimestamp(modified).strftime("%Y-%m-%d %H:%M:%S") if modified else "",
+            "score": score,
+        })
+        if span:
+            results[-1]["chunk"] = {"start": span[0], "end": span[1]}
+    return results
+
+
+def search_documents(query: str, embedder, top_k=5, scoring="max", nprobe=None, ef_search=None, mode="vector",
+                     timings=None, filters=None):
+    """
+    Search the indexed documents.
+
+    mode:
+        "vector"  - semantic search over the chunk index. Chunk hits are
+                    aggregated back to documents (`scoring` = "max" or "sum")
+                    and each result carries the span of its best chunk.
+        "keyword" - BM25 over the FTS5 table; never touches the model.
+        "hybrid"  - both at once, fused with reciprocal-rank fusion.
+
+    `nprobe` / `ef_search` override the IVF / HNSW defaults for this query.
+    `filters` (filters.SearchFilter) restricts every mode by extension,
+    folder category and modified date before ranking, not after.
+    Pass a dict as `timings` to get this query's per-stage breakdown in ms.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode '{mode}', expected one of {SEARCH_MODES}")
+
+    timer = StageTimer(QUERY_SECONDS, mode=mode)
+    with timer.stage("total"):
+        if mode == "keyword":
+            hits = keyword_hits(query, top_k, timer, filters)
+        elif mode == "vector":
+            hits = vector_hits(query, embedder, top_k, scoring, nprobe, ef_search, timer, filters)
+        else:
+            depth = top_k * HYBRID_DEPTH
+            keyword_future = _keyword_pool.submit(keyword_hits, query, depth, timer, filters)
+            semantic = vector_hits(query, embedder, depth, scoring, nprobe, ef_search, timer, filters)
+            keyword = keyword_future.result()
+            with timer.stage("fuse"):
+                hits = fuse_hits([semantic, keyword], top_k)
+
+        with timer.stage("fetch"):
+            results = build_results(hits)
+
+    if timings is not None:
+        timings.update(timer.stages)
+    return results
+
+
+def parse_batch(body):
+    """
+    Turn a /search/batch JSON body into search_batch requests.
+
+    body: {"queries": [...], plus optional defaults for every query: "top_k",
+    "mode", "scoring", "nprobe", "ef", and the filter fields "ext",
+    "category", "modified_after", "modified_before"}. Each query is a string
+    or an object with "q" and any of the same fields. Raises ValueError on
+    bad input.
+    """
+    if not isinstance(body, dict) or not isinstance(body.get("queries"), list):
+        raise ValueError('Expected a JSON object with a "queries" list')
+    queries = body["queries"]
+    if not queries:
+        raise ValueError("No queries provided")
+    if len(queries) > MAX_BATCH:
+        raise ValueError(f"At most {MAX_BATCH} queries per batch")
+
+    shared = {key: value for key, value in body.items() if key != "queries"}
+    requests = []
+    for position, item in enumerate(queries):
+        item = {"q": item} if isinstance(item, str) else item
+        if not isinstance(item, dict):
+            raise ValueError(f"Query {position}: expected a string or an object")
+        options = {**shared, **item}
+        query = str(options.get("q") or "").strip()
+        if not query:
+            raise ValueError(f"Query {position}: no query provided")
+        mode = options.get("mode", "vector")
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Query {position}: mode must be one of {', '.join(SEARCH_MODES)}")
+        scoring = options.get("scoring", "max")
+        if scoring not in SCORING_MODES:
+            raise ValueError(f"Query {position}: scoring must be one of {', '.join(SCORING_MODES)}")
+        try:
+            top_k = int(options.get("top_k", 5))
+            nprobe = int(options["nprobe"]) if options.get("nprobe") else None
+            ef_search = int(options["ef"]) if options.get("ef") else None
+            filters = SearchFilter.from_args(options)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Query {position}: {e}")
+        if top_k < 1:
+            raise ValueError(f"Query {position}: top_k must be at least 1")
+        requests.append({
+            "query": query,
+            "top_k": top_k,
+            "mode": mode,
+            "scoring": scoring,
+            "nprobe": nprobe,
+            "ef_search": ef_search,
+            "filters": filters,
+        })
+    return requests
+
+
+def search_batch(requests, embedder, timings=None):
+    """
+    Run many searches at once (see parse_batch for the request dicts).
+
+    All semantic queries are embedded in one model batch. Queries sharing
+    filters and nprobe / ef_search go through one FAISS search over their
+    rows of the query matrix, keyword queries run concurrently on the FTS5
+    pool, and chunk spans and document metadata are fetched once for the
+    whole batch.
+
+    Returns:
+        one result list per request, in order, shaped like search_documents'.
+    """
+    timer = StageTimer(QUERY_SECONDS, mode="batch")
+    with timer.stage("total"):
+        depths = [r["top_k"] * HYBRID_DEPTH if r["mode"] == "hybrid" else r["top_k"] for r in requests]
+
+        # ✅ Keyword side starts first and runs while the model works
+        keyword = {
+            i: _keyword_pool.submit(keyword_search, r["query"], depths[i], r["filters"])
+            for i, r in enumerate(requests) if r["mode"] != "vector"
+        }
+
+        # ✅ Step 1: One model batch for every semantic query
+        semantic = [i for i, r in enumerate(requests) if r["mode"] != "keyword"]
+        chunk_hits = {}
+        if semantic:
+            with timer.stage("embed"):
+                vectors = get_query_encoder(embedder).embed_queries([requests[i]["query"] for i in semantic],
+                                                                    coalesce=False)
+
+            # ✅ Step 2: One FAISS search per group of queries with the same options
+            with timer.stage("ann"):
+                snapshot = searcher.snapshot()
+                groups = {}
+                for row, i in enumerate(semantic):
+                    r = requests[i]
+                    key = (r["filters"].key() if r["filters"] else None, r["nprobe"], r["ef_search"])
+                    groups.setdefault(key, []).append((row, i))
+                for members in groups.values():
+                    first = requests[members[0][1]]
+                    rows = [row for row, _ in members]
+                    hits, all_paths, fmt = ann_hits(
+                        vectors[rows], [depths[i] for _, i in members], [requests[i]["scoring"] for _, i in members],
+                        first["nprobe"], first["ef_search"], first["filters"], snapshot,
+                    )
+                    chunk_hits.update({i: h for (_, i), h in zip(members, hits)})
+
+            # ✅ Step 3: Spans for every best chunk in one query
+            with timer.stage("spans"):
+                spans = get_chunk_spans([chunk for h in chunk_hits.values() for _, _, chunk in h if chunk is not None])
+            chunk_hits = {i: _with_spans(h, all_paths, fmt, spans) for i, h in chunk_hits.items()}
+
+        with timer.stage("keyword"):
+            keyword = {
+                i: [(doc_id, path, score, None) for doc_id, path, score in future.result()]
+                for i, future in keyword.items()
+            }
+
+        hits = []
+        with timer.stage("fuse"):
+            for i, r in enumerate(requests):
+                if r["mode"] == "vector":
+                    hits.append(chunk_hits[i])
+                elif r["mode"] == "keyword":
+                    hits.append(keyword[i])
+                else:
+                    hits.append(fuse_hits([chunk_hits[i], keyword[i]], r["top_k"]))
+
+        # ✅ Step 4: Document metadata for all hits in one query
+        with timer.stage("fetch"):
+            metadata = get_documents_by_ids({doc_id for h in hits for doc_id, _, _, _ in h if doc_id is not None})
+            results = [build_results(h, metadata) for h in hits]
 
+    if timings is not None:
+        timings.update(timer.stages)
     return results
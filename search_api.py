@@ -1,26 +1,72 @@
-from flask import Flask, request, jsonify
-from search import search_documents
-from embedder import Embedder
+from flask import Flask, Response, request, jsonify
+from metrics import registry
+from filters import SearchFilter
+from search import SEARCH_MODES, parse_batch, search_batch, search_documents
+from embedder import get_embedder, warm_up_async
 
 app = Flask(__name__)
-embedder = Embedder()  # Ensure model is loaded
+embedder = get_embedder()  # shared, loads on first use
 
 @app.route("/search", methods=["GET"])
 def search():
     query = request.args.get("q", "").strip()
     if not query:
         return jsonify({"error": "No query provided"}), 400
+    mode = request.args.get("mode", "vector")
+    if mode not in SEARCH_MODES:
+        return jsonify({"error": f"mode must be one of {', '.join(SEARCH_MODES)}"}), 400
+    # ✅ Optional filters: ext=pdf,docx  category=Downloads  modified_after / modified_before=YYYY-MM-DD
+    try:
+        filters = SearchFilter.from_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
+    # ?timings=1 adds this request's per-stage breakdown (ms) to the response
+    timings = {} if request.args.get("timings") else None
     try:
-        results = search_documents(query, embedder)
+        results = search_documents(
+            query, embedder,
+            nprobe=request.args.get("nprobe", type=int),
+            ef_search=request.args.get("ef", type=int),
+            mode=mode,
+            timings=timings,
+            filters=filters,
+        )
+        if timings is not None:
+            return jsonify({"results": results, "timings": timings})
         return jsonify({"results": results})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/search/batch", methods=["POST"])
+def search_batch_route():
+    # ✅ {"queries": ["...", {"q": "...", "top_k": 10, "ext": "pdf"}], "mode": "hybrid", ...}
+    try:
+        batch = parse_batch(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    timings = {} if request.args.get("timings") else None
+    try:
+        results = search_batch(batch, embedder, timings=timings)
+        if timings is not None:
+            return jsonify({"results": results, "timings": timings})
+        return jsonify({"results": results})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/metrics")
+def metrics():
+    # Prometheus text format; ?format=json adds the slowest files and recent failures
+    if request.args.get("format") == "json":
+        return jsonify(registry.snapshot())
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route("/")
 def root():
     return "🔍 Search API is running!"
 
 if __name__ == "__main__":
     print("🚀 Starting Search API on http://127.0.0.1:5002")
+    warm_up_async()
     app.run(port=5002)
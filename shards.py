@@ -0,0 +1,329 @@
+# shards.py
+import os
+import re
+import json
+import shutil
+import hashlib
+import threading
+import numpy as np
+import ann
+from chunker import CHUNK_BITS
+from store import (STORE_DIR, STORE_FORMAT, PathTable, load_store, save_store, store_exists, store_paths,
+                   remove_store)
+
+# 🔧 Sharding: "root" = one shard per scan root, "size" = fixed ranges of document ids
+SHARD_BY = "root"
+SHARD_DOCS = 250_000      # documents per shard with SHARD_BY = "size"
+SHARDS_DIR = "shards"     # under STORE_DIR, one store directory per shard
+MANIFEST_FILE = "shards.json"
+
+SHARD_MODES = ("root", "size")
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9]+")
+
+
+# ✅ Manifest: {"by": "root" | "size", "shards": {name: root or first document id}}
+def read_manifest(store_dir=STORE_DIR):
+    try:
+        with open(os.path.join(store_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if isinstance(manifest, dict) and "shards" in manifest else None
+
+
+def _write_manifest(store_dir, manifest):
+    path = os.path.join(store_dir, MANIFEST_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def shard_dir(store_dir, name):
+    return os.path.join(store_dir, SHARDS_DIR, name)
+
+
+def index_exists(store_dir=STORE_DIR):
+    """True once there is something to search: a sharded store or an older single one."""
+    manifest = read_manifest(store_dir)
+    if manifest is not None:
+        return any(store_exists(shard_dir(store_dir, name)) for name in manifest["shards"])
+    return store_exists(store_dir)
+
+
+def _modified_times(table):
+    """{doc_id: mtime} from a path table's date column (empty for tables without one)."""
+    if getattr(table, "modified", None) is None:
+        return {}
+    return dict(zip(table.ids.tolist(), table.modified.tolist()))
+
+
+def root_of(path, roots=()):
+    """
+    The scan root a path belongs to: the longest matching entry of `roots`,
+    otherwise its drive (C:\\) or top-level folder (/home).
+    """
+    folded = os.path.normcase(path)
+    matches = [root for root in roots if folded.startswith(os.path.normcase(root))]
+    if matches:
+        return max(matches, key=len)
+    drive, rest = os.path.splitdrive(path)
+    if drive:
+        return drive + os.sep
+    top = [part for part in re.split(r"[\\/]+", rest) if part]
+    return os.sep + top[0] if len(top) > 1 else os.sep
+
+
+def root_shard_name(root):
+    """Readable, filesystem-safe and unique: "C-1a2b3c" for C:\\."""
+    slug = _UNSAFE.sub("-", root).strip("-")[:40] or "root"
+    return f"{slug}-{hashlib.sha1(root.encode('utf-8', 'surrogateescape')).hexdigest()[:6]}"
+
+
+class ShardPaths:
+    """Read-only {id: path} over the path tables of several shards."""
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    def _table(self, doc_id):
+        for table in self.tables:
+            if doc_id in table:
+                return table
+        return None
+
+    def __len__(self):
+        return sum(len(table) for table in self.tables)
+
+    def __contains__(self, doc_id):
+        return self._table(doc_id) is not None
+
+    def __getitem__(self, doc_id):
+        table = self._table(doc_id)
+        if table is None:
+            raise KeyError(doc_id)
+        return table[doc_id]
+
+    def get(self, doc_id, default=None):
+        table = self._table(doc_id)
+        return default if table is None else table[doc_id]
+
+    def items(self):
+        for table in self.tables:
+            yield from table.items()
+
+
+class ShardSet:
+    """
+    Writer-side view of the sharded store.
+
+    Every document lives in exactly one shard, picked by route(): its scan
+    root (SHARD_BY = "root") or its id range (SHARD_BY = "size"). Each shard
+    is an ordinary store directory (index + path table + generation) under
+    STORE_DIR/shards/. has() only maps a shard's path table; its index is
+    read once the shard is changed, so a run that only touches D:\\ never
+    reads, rewrites or invalidates the C:\\ shard, and an unchanged rescan
+    loads no index at all. save() writes the shards that changed, then the
+    manifest.
+
+    An older single store, or shards laid out by the other SHARD_BY mode,
+    are split into the new layout from their stored vectors on first
+    use, without re-embedding anything. Stores too old to split leave
+    `replacing` set: the caller rebuilds from scratch.
+
+    Writers must hold pipeline.INDEX_LOCK.
+    """
+
+    def __init__(self, store_dir=STORE_DIR, roots=(), by=None, fresh=False):
+        self.store_dir = store_dir
+        self.by = by or SHARD_BY
+        if self.by not in SHARD_MODES:
+            raise ValueError(f"Unknown shard mode '{self.by}', expected one of {SHARD_MODES}")
+        self.roots = list(roots)
+        self.labels = {}   # shard name -> root, or first document id, for shards with data
+        self._routes = {}  # same, for every shard route() has named
+        self.dirty = set()
+        self.replacing = False
+        self._shards = {}  # shard name -> [index or None, {doc_id: path}, {doc_id: modified}]
+        self._tables = {}  # shard name -> mapped PathTable or None, for has() on shards not loaded
+        self._load_lock = threading.Lock()
+        self._fresh = fresh
+        self._previous = None  # manifest being replaced by a split or fresh build
+        self._retire = fresh   # remove what the next save() replaces
+
+        manifest = read_manifest(store_dir)
+        if fresh:
+            self._previous = manifest
+        elif manifest is not None and manifest.get("by", "root") == self.by:
+            self.labels = dict(manifest["shards"])
+            if self.by == "root":
+                self.roots += [root for root in self.labels.values() if root not in self.roots]
+        else:
+            self._previous = manifest
+            self._split(manifest)
+
+    @property
+    def empty(self):
+        return not self.labels
+
+    def route(self, path, doc_id):
+        if self.by == "size":
+            first = doc_id // SHARD_DOCS * SHARD_DOCS
+            name = f"docs-{first // SHARD_DOCS:05d}"
+            self._routes.setdefault(name, first)
+            return name
+        root = root_of(path, self.roots)
+        name = root_shard_name(root)
+        self._routes.setdefault(name, root)
+        return name
+
+    def shard(self, name):
+        """
+        [index or None, {doc_id: path}, {doc_id: modified}] of one shard,
+        loaded from disk on first use for changing it. An entry is only
+        published once it is loaded, so has() on the pipeline's producer
+        thread never sees a half-loaded shard.
+        """
+        entry = self._shards.get(name)
+        if entry is not None:
+            return entry
+        with self._load_lock:
+            entry = self._shards.get(name)
+            if entry is None:
+                entry = [None, {}, {}]
+                directory = shard_dir(self.store_dir, name)
+                loaded = load_store(directory, mmap_index=False) if not self._fresh and store_exists(directory) else None
+                if loaded and loaded[3] == STORE_FORMAT and ann.is_id_mapped(loaded[1]):
+                    entry[0], entry[1], entry[2] = loaded[1], dict(loaded[2].items()), _modified_times(loaded[2])
+                self._shards[name] = entry
+                self._tables.pop(name, None)  # the entry answers has() from now on
+        return entry
+
+    def _path_table(self, name):
+        """Mapped path table of a shard's current generation (None if it has none)."""
+        if name in self._tables:
+            return self._tables[name]
+        with self._load_lock:
+            if name not in self._tables:
+                table = None
+                directory = shard_dir(self.store_dir, name)
+                paths_file = store_paths(directory)[1]
+                if not self._fresh and os.path.exists(paths_file):
+                    try:
+                        table = PathTable(paths_file)
+                    except (OSError, ValueError):
+                        table = None
+                    if table is not None and table.fmt != STORE_FORMAT:
+                        table = None
+                self._tables[name] = table
+            return self._tables[name]
+
+    def has(self, path, doc_id):
+        """Whether the document's vectors are in its shard, without loading its index."""
+        name = self.route(path, doc_id)
+        entry = self._shards.get(name)
+        if entry is not None:
+            return doc_id in entry[1]
+        table = self._path_table(name)
+        return table is not None and doc_id in table
+
+    def add(self, name, vectors, ids, paths, modified=None):
+        """Add chunk vectors of documents ({doc_id: path}, optional {doc_id: mtime}) to a shard."""
+        entry = self.shard(name)
+        if entry[0] is None:
+            # Stream into an exact index; save(convert=True) converts to ann.INDEX_TYPE
+            entry[0] = ann.make_index(vectors.shape[1], "flat")
+        entry[0].add_with_ids(vectors, ids)
+        entry[1].update(paths)
+        entry[2].update(modified or {})
+        self.labels.setdefault(name, self._routes.get(name))
+        self.dirty.add(name)
+
+    def _by_shard(self, doc_ids, doc_paths):
+        groups = {}
+        for doc_id in doc_ids:
+            path = doc_paths.get(doc_id)
+            if path is not None:
+                groups.setdefault(self.route(path, doc_id), []).append(doc_id)
+        return groups
+
+    def discard(self, chunk_ids, doc_paths):
+        """Remove chunk vectors; doc_paths ({doc_id: path}) says which shard they are in."""
+        chunk_ids = np.asarray(list(chunk_ids), dtype="int64")
+        if not len(chunk_ids):
+            return
+        docs = chunk_ids >> CHUNK_BITS
+        for name, doc_ids in self._by_shard(set(docs.tolist()), doc_paths).items():
+            entry = self.shard(name)
+            if entry[0] is not None:
+                entry[0] = ann.remove_ids(entry[0], chunk_ids[np.isin(docs, doc_ids)])
+                self.dirty.add(name)
+
+    def forget(self, doc_ids, doc_paths):
+        """Drop deleted documents from their shards' path tables."""
+        for name, ids in self._by_shard(doc_ids, doc_paths).items():
+            entry = self.shard(name)
+            for doc_id in ids:
+                entry[1].pop(doc_id, None)
+                entry[2].pop(doc_id, None)
+            self.dirty.add(name)
+
+    def _split(self, manifest):
+        # Sources: shards of the other SHARD_BY mode, or an older single store
+        if manifest is not None:
+            sources = [shard_dir(self.store_dir, name) for name in manifest["shards"]]
+        elif store_exists(self.store_dir):
+            sources = [self.store_dir]
+        else:
+            return
+        self._retire = True
+        print(f"🔁 Splitting the vector store into shards by {self.by}...")
+        for source in sources:
+            loaded = load_store(source, mmap_index=False) if store_exists(source) else None
+            if not loaded or loaded[3] != STORE_FORMAT or not ann.is_id_mapped(loaded[1]):
+                if source == self.store_dir:
+                    # Older layout: ids can't be mapped to documents, rebuild instead
+                    self.replacing = True
+                continue
+            index, paths, modified = loaded[1], dict(loaded[2].items()), _modified_times(loaded[2])
+            for vectors, ids in ann.stored_vectors(index):
+                docs = ids >> CHUNK_BITS
+                # Vectors of documents missing from the path table are orphans: left behind
+                known = np.array([d in paths for d in docs.tolist()], dtype=bool)
+                vectors, ids, docs = vectors[known], ids[known], docs[known]
+                names = np.array([self.route(paths[d], d) for d in docs.tolist()])
+                for name in set(names.tolist()):
+                    rows = names == name
+                    moved = set(docs[rows].tolist())
+                    self.add(name, np.ascontiguousarray(vectors[rows]), ids[rows], {d: paths[d] for d in moved},
+                             {d: modified[d] for d in moved if d in modified})
+
+    def save(self, convert=False):
+        """
+        Write every changed shard as a new generation, then the manifest.
+        `convert` brings them to ann.INDEX_TYPE first (end of a run).
+        Shards left without documents are dropped; untouched shards are
+        neither read nor rewritten.
+        """
+        for name in sorted(self.dirty):
+            entry = self.shard(name)
+            if entry[0] is None or ann.live_count(entry[0]) == 0:
+                self.labels.pop(name, None)
+                shutil.rmtree(shard_dir(self.store_dir, name), ignore_errors=True)
+                continue
+            if convert:
+                entry[0] = ann.ensure_index_type(entry[0])
+            save_store(entry[0], entry[1], shard_dir(self.store_dir, name), modified=entry[2])
+        self.dirty.clear()
+
+        os.makedirs(self.store_dir, exist_ok=True)
+        _write_manifest(self.store_dir, {"by": self.by, "shards": self.labels})
+        if self._retire:
+            # Now that the manifest points at the new shards, retire what they replace
+            old = set((self._previous or {}).get("shards", {})) - set(self.labels)
+            for name in old:
+                shutil.rmtree(shard_dir(self.store_dir, name), ignore_errors=True)
+            remove_store(self.store_dir)
+            self._previous = None
+            self._fresh = self._retire = self.replacing = False
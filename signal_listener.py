@@ -1,23 +1,59 @@
 import json
 import time
 import os
+import select
+
+def _scan_complete(status_file):
+    try:
+        with open(status_file, "r") as f:
+            return json.load(f).get("status") == "complete"
+    except (OSError, ValueError):
+        return False  # missing, or caught mid-write
+
+def _wait_with_inotify(status_file, timeout):
+    # Block on writes/renames in the signal folder instead of sleeping between checks
+    from watcher import _load_libc, IN_CLOSE_WRITE, IN_MOVED_TO, IN_CREATE, IN_CLOEXEC
+    libc = _load_libc()
+    fd = libc.inotify_init1(IN_CLOEXEC)
+    if fd < 0:
+        raise OSError("inotify_init1 failed")
+    try:
+        folder = os.path.dirname(os.path.abspath(status_file))
+        if libc.inotify_add_watch(fd, os.fsencode(folder), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE) < 0:
+            raise OSError(f"cannot watch {folder}")
+        deadline = time.time() + timeout
+        while not _scan_complete(status_file):
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            if select.select([fd], [], [], remaining)[0]:
+                os.read(fd, 4096)
+        return True
+    finally:
+        os.close(fd)
 
 def wait_for_scan_complete(status_file="../signals/scan_status.json", timeout=60):
     print("⏳ Waiting for scan to complete...")
     start = time.time()
 
+    try:
+        if _wait_with_inotify(status_file, timeout):
+            print("✅ Scan complete signal received.")
+            return True
+        print("⚠ Timed out waiting for scan completion.")
+        return False
+    except (OSError, ImportError):
+        pass  # no inotify here, or the signal folder doesn't exist yet
+
     while time.time() - start < timeout:
-        if os.path.exists(status_file):
-            with open(status_file, "r") as f:
-                data = json.load(f)
-                if data.get("status") == "complete":
-                    print("✅ Scan complete signal received.")
-                    return True
+        if _scan_complete(status_file):
+            print("✅ Scan complete signal received.")
+            return True
         time.sleep(2)
 
     print("⚠ Timed out waiting for scan completion.")
     return False
 
 # Optional standalone run
-if __name__ == "_main_":
+if __name__ == "__main__":
     wait_for_scan_complete()
\ No newline at end of file
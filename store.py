@@ -0,0 +1,364 @@
+# store.py
+import os
+import re
+import mmap
+import pickle
+import time
+import uuid
+import struct
+import threading
+import numpy as np
+import faiss
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+from filters import path_columns, EXT_WIDTH
+
+STORE_DIR = "Aaryan_store"
+INDEX_FILE = "index.{generation}.faiss"
+PATHS_FILE = "paths.{generation}.bin"
+GENERATION_FILE = "generation"
+LOCK_FILE = "writer.lock"
+LOCK_POLL = 0.1  # seconds between attempts on a lock another process holds
+
+# Path table layouts (fmt):
+#   0 - paths in FAISS row order (original format)
+#   1 - {documents.id: path}, FAISS ids are document ids
+#   2 - {documents.id: path}, FAISS ids are chunk ids (see chunker.chunk_id)
+STORE_FORMAT = 2
+
+# Older stores: pickled path table, files swapped in place
+LEGACY_INDEX_FILE = "index.faiss"
+LEGACY_META_FILE = "meta.pkl"
+
+# 🔧 Readers map the index instead of copying it (falls back to a normal read
+# where the index type or FAISS build doesn't support it)
+MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | getattr(faiss, "IO_FLAG_READ_ONLY", 0)
+
+# paths.<generation>.bin: header, int64 ids[n] (sorted), uint64 offsets[n + 1],
+# [float64 modified[n], S8 extension[n], uint8 category[n]], UTF-8 blob
+PATHS_MAGIC = b"DFPATHS1"
+HAS_COLUMNS = 1  # header flag: the search filter columns are present
+_HEADER = struct.Struct("<8sIIQ")  # magic, fmt, flags, n
+_STORE_FILE = re.compile(r"^(?:index\.(\d+)\.faiss|paths\.(\d+)\.bin)$")
+
+
+class PathTable:
+    """
+    Read-only {id: path} mapping over a memory-mapped paths.<generation>.bin.
+
+    Nothing is decoded up front: ids are binary-searched and a path is only
+    turned into a str when it is looked up, so opening a table of millions
+    of paths is a few page faults and every process shares the page cache.
+    `modified`, `extension` and `category` are per-id columns for search
+    filters (None in tables written without them).
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.fmt, flags, n = _HEADER.unpack_from(self._mm, 0)
+        if magic != PATHS_MAGIC:
+            raise ValueError(f"{path} is not a path table")
+        self.ids = np.frombuffer(self._mm, dtype="<i8", count=n, offset=_HEADER.size)
+        self.offsets = np.frombuffer(self._mm, dtype="<u8", count=n + 1, offset=_HEADER.size + 8 * n)
+        offset = _HEADER.size + 16 * n + 8
+        self.modified = self.extension = self.category = None
+        if flags & HAS_COLUMNS:
+            self.modified = np.frombuffer(self._mm, dtype="<f8", count=n, offset=offset)
+            self.extension = np.frombuffer(self._mm, dtype=f"S{EXT_WIDTH}", count=n, offset=offset + 8 * n)
+            self.category = np.frombuffer(self._mm, dtype="u1", count=n, offset=offset + (8 + EXT_WIDTH) * n)
+            offset += (9 + EXT_WIDTH) * n
+        self._blob_start = offset
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _find(self, doc_id):
+        i = int(np.searchsorted(self.ids, doc_id))
+        return i if i < len(self.ids) and self.ids[i] == doc_id else -1
+
+    def _path(self, i):
+        start = self._blob_start + int(self.offsets[i])
+        end = self._blob_start + int(self.offsets[i + 1])
+        return self._mm[start:end].decode("utf-8", "surrogateescape")
+
+    def __contains__(self, doc_id):
+        return self._find(doc_id) >= 0
+
+    def __getitem__(self, doc_id):
+        i = self._find(doc_id)
+        if i < 0:
+            raise KeyError(doc_id)
+        return self._path(i)
+
+    def get(self, doc_id, default=None):
+        i = self._find(doc_id)
+        return self._path(i) if i >= 0 else default
+
+    def items(self):
+        for i, doc_id in enumerate(self.ids.tolist()):
+            yield doc_id, self._path(i)
+
+    def to_dict(self):
+        """Decode everything into a plain dict (for writers that need to mutate it)."""
+        return dict(self.items())
+
+
+def write_path_table(path, paths, fmt=STORE_FORMAT, modified=None):
+    """
+    Args:
+        paths: {id: path}, or a list of paths in FAISS row order for fmt 0.
+        modified: optional {id: mtime} for date filters (missing ids stay undated).
+    """
+    if isinstance(paths, dict):
+        ids = np.fromiter(paths.keys(), dtype="<i8", count=len(paths))
+        order = np.argsort(ids, kind="stable")
+        ids = ids[order]
+        values = list(paths.values())
+        values = [values[i] for i in order.tolist()]
+    else:
+        ids = np.arange(len(paths), dtype="<i8")
+        values = paths
+    encoded = [p.encode("utf-8", "surrogateescape") for p in values]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    np.cumsum(np.fromiter(map(len, encoded), dtype="<u8", count=len(encoded)), out=offsets[1:])
+    modified = modified or {}
+    mtimes = np.fromiter((modified.get(doc_id, np.nan) or np.nan for doc_id in ids.tolist()),
+                         dtype="<f8", count=len(ids))
+    extensions, categories = path_columns(values)
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(PATHS_MAGIC, fmt, HAS_COLUMNS, len(encoded)))
+        f.write(ids.tobytes())
+        f.write(offsets.tobytes())
+        f.write(mtimes.tobytes())
+        f.write(extensions.tobytes())
+        f.write(categories.tobytes())
+        f.write(b"".join(encoded))
+
+
+# ✅ Generation counter: names the index/paths files currently in use
+def read_generation(store_dir=STORE_DIR):
+    try:
+        with open(os.path.join(store_dir, GENERATION_FILE), "r") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def _write_generation(store_dir, generation):
+    path = os.path.join(store_dir, GENERATION_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(str(generation))
+    os.replace(tmp, path)
+
+
+def store_paths(store_dir=STORE_DIR, generation=None):
+    """(index file, path table file) of a generation, or of the store's current one."""
+    if generation is None:
+        generation = read_generation(store_dir)
+    return (os.path.join(store_dir, INDEX_FILE.format(generation=generation)),
+            os.path.join(store_dir, PATHS_FILE.format(generation=generation)))
+
+
+def legacy_store_paths(store_dir=STORE_DIR):
+    return os.path.join(store_dir, LEGACY_INDEX_FILE), os.path.join(store_dir, LEGACY_META_FILE)
+
+
+def _current_files(store_dir):
+    generation = read_generation(store_dir)
+    files = store_paths(store_dir, generation)
+    if all(os.path.exists(p) for p in files):
+        return generation, files, False
+    return generation, legacy_store_paths(store_dir), True
+
+
+def store_exists(store_dir=STORE_DIR):
+    return all(os.path.exists(p) for p in _current_files(store_dir)[1])
+
+
+def store_signature(store_dir=STORE_DIR):
+    """
+    Cheap fingerprint of the on-disk store. Changes whenever a writer swaps
+    in a new index, including writers that don't bump the generation file.
+    """
+    generation, files, _ = _current_files(store_dir)
+    stamps = []
+    for path in files:
+        try:
+            stamps.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            stamps.append(None)
+    return (generation, *stamps)
+
+
+def _remove_stale(store_dir, keep):
+    """
+    Best-effort removal of files from generations not in `keep` (and of a
+    legacy store). The previous generation is kept so a reader that has just
+    read the generation file can still open it. On Windows a file that
+    another process has mapped can't be deleted yet; the next save retries.
+    """
+    names = [LEGACY_INDEX_FILE, LEGACY_META_FILE]
+    for name in os.listdir(store_dir):
+        match = _STORE_FILE.match(name)
+        if match and int(match.group(1) or match.group(2)) not in keep:
+            names.append(name)
+    for name in names:
+        try:
+            os.remove(os.path.join(store_dir, name))
+        except OSError:
+            pass
+
+
+def remove_store(store_dir=STORE_DIR):
+    """Best-effort removal of every generation (and legacy file) in `store_dir`, e.g. once it has been re-sharded."""
+    _remove_stale(store_dir, keep=())
+    try:
+        os.remove(os.path.join(store_dir, GENERATION_FILE))
+    except OSError:
+        pass
+
+
+def _try_lock(f):
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class WriterLock:
+    """
+    Exclusive right to write the stores under `store_dir`, across threads
+    and processes: app.py, the api.py watcher and indexer_service.py all
+    write the same shards and generation files. An OS file lock on
+    STORE_DIR/writer.lock is held for a whole load → modify → save run, so
+    one writer never saves over shards another has changed since it loaded
+    them. Same acquire/release interface as threading.Lock, and release()
+    may come from another thread.
+    """
+
+    def __init__(self, store_dir=STORE_DIR):
+        self.store_dir = store_dir
+        self._thread_lock = threading.Lock()
+        self._file = None
+
+    def acquire(self, blocking=True, timeout=-1):
+        deadline = None if timeout is None or timeout < 0 else time.monotonic() + timeout
+        if not (self._thread_lock.acquire(timeout=timeout) if blocking else self._thread_lock.acquire(False)):
+            return False
+        f = None
+        try:
+            os.makedirs(self.store_dir, exist_ok=True)
+            f = open(os.path.join(self.store_dir, LOCK_FILE), "a+b")
+            while not _try_lock(f):
+                if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                    f.close()
+                    self._thread_lock.release()
+                    return False
+                time.sleep(LOCK_POLL)
+        except BaseException:
+            if f is not None:
+                f.close()
+            self._thread_lock.release()
+            raise
+        self._file = f
+        return True
+
+    def release(self):
+        f, self._file = self._file, None
+        try:
+            _unlock(f)
+        finally:
+            f.close()
+            self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def save_store(index, paths, store_dir=STORE_DIR, fmt=STORE_FORMAT, modified=None):
+    """
+    Write the FAISS index and its id → path table as a new generation, then
+    point the generation file at it. Files are never replaced in place, so
+    readers that have them mapped keep a consistent pair and never observe a
+    new index paired with old metadata (or vice versa). `modified` ({id:
+    mtime}) feeds the date filters. Callers hold the store's WriterLock.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    previous = read_generation(store_dir)
+    generation = previous + 1
+    index_path, paths_path = store_paths(store_dir, generation)
+
+    # Write next to the targets first so a crash never leaves a truncated
+    # generation; tmp names are unique so two writers can never share one
+    tmp = f".{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp"
+    faiss.write_index(index, index_path + tmp)
+    write_path_table(paths_path + tmp, paths, fmt, modified)
+    os.replace(index_path + tmp, index_path)
+    os.replace(paths_path + tmp, paths_path)
+    _write_generation(store_dir, generation)
+    _remove_stale(store_dir, keep=(previous, generation))
+
+
+def read_index(index_path, mmap_index=True):
+    if mmap_index and MMAP_FLAGS:
+        try:
+            return faiss.read_index(index_path, MMAP_FLAGS)
+        except RuntimeError:
+            pass
+    return faiss.read_index(index_path)
+
+
+def load_store(store_dir=STORE_DIR, mmap_index=True):
+    """
+    Load (signature, index, paths, fmt) from disk.
+
+    `paths` is a memory-mapped PathTable (a dict or list for legacy stores).
+    With `mmap_index` the FAISS index is mapped read-only where its type
+    allows it; writers that go on to modify the index must pass False
+    (FAISS aborts on adding to a mapped index).
+    Returns None if a writer swapped files while we were reading.
+    """
+    before = store_signature(store_dir)
+    _, (index_path, paths_path), legacy = _current_files(store_dir)
+    try:
+        index = read_index(index_path, mmap_index)
+        if legacy:
+            with open(paths_path, "rb") as f:
+                meta = pickle.load(f)
+        else:
+            meta = PathTable(paths_path)
+    except (OSError, RuntimeError):
+        # Removed by a writer cleaning up after two newer generations
+        return None
+
+    if store_signature(store_dir) != before:
+        return None
+    if not legacy:
+        return before, index, meta, meta.fmt
+    if isinstance(meta, list):
+        return before, index, meta, 0
+    if "format" not in meta:
+        return before, index, meta, 1
+    return before, index, meta["paths"], meta["format"]
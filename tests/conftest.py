@@ -0,0 +1,47 @@
+# conftest.py
+import os
+import sys
+import zlib
+import numpy as np
+import pytest
+
+# Modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """A fresh SQLite database for one test."""
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "test.db"))
+    db.init_db()
+    return db
+
+
+def unit_vectors(n, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, dim)).astype("float32")
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def meta(path, content="", modified=1.0):
+    return {
+        "filename": os.path.basename(path),
+        "path": path,
+        "extension": os.path.splitext(path)[1].lower(),
+        "size": len(content),
+        "modified": modified,
+        "content": content,
+    }
+
+
+class WordEmbedder:
+    """Deterministic bag-of-words vectors, enough to index and search without the model."""
+
+    def embed_texts(self, texts):
+        vectors = np.zeros((len(texts), 16), dtype="float32")
+        for row, text in enumerate(texts):
+            for word in text.split():
+                vectors[row, zlib.crc32(word.encode()) % 16] += 1
+        return vectors + 1e-3
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+import ann
+from conftest import unit_vectors
+
+
+def _flat(n, dim=8):
+    index = ann.make_index(dim, "flat")
+    index.add_with_ids(unit_vectors(n, dim), np.arange(n, dtype="int64") + 100)
+    return index
+
+
+@pytest.mark.parametrize("kind", ann.INDEX_TYPES)
+def test_every_kind_maps_our_ids(kind):
+    vectors = unit_vectors(800, 16)
+    index = ann.make_index(16, kind, train_vectors=vectors, ntotal=len(vectors))
+    index.add_with_ids(vectors, np.arange(800, dtype="int64") * 7)
+    assert ann.is_id_mapped(index)
+    _, labels = index.search(vectors[:5], 3)
+    assert set(labels.ravel().tolist()) <= set(range(0, 5600, 7))
+
+
+@pytest.mark.parametrize("kind, enough", [("ivf", 16 * ann.MIN_TRAIN_PER_LIST),
+                                          ("ivfpq", 256 * ann.MIN_TRAIN_PER_LIST)])
+def test_too_small_to_train_stays_as_is(kind, enough):
+    assert ann.min_train_vectors(kind) == enough
+    index = _flat(enough - 1)
+    assert ann.ensure_index_type(index, kind) is index
+    assert ann.index_kind(ann.make_index(8, kind, train_vectors=unit_vectors(enough - 1))) == "flat"
+
+
+def test_conversion_keeps_every_vector():
+    index = _flat(ann.min_train_vectors("ivf"))
+    converted = ann.ensure_index_type(index, "ivf")
+    assert ann.index_kind(converted) == "ivf"
+    assert sorted(ann.stored_ids(converted).tolist()) == sorted(ann.stored_ids(index).tolist())
+    assert ann.ensure_index_type(converted, "ivf") is converted
+
+
+def test_hnsw_removals_are_tombstoned_then_compacted():
+    vectors = unit_vectors(50)
+    ids = np.arange(50, dtype="int64") + 100
+    index = ann.make_index(8, "hnsw")
+    index.add_with_ids(vectors, ids)
+
+    assert ann.remove_ids(index, ids[:5]) is index  # no rebuild
+    assert (index.ntotal, ann.dead_rows(index), ann.live_count(index)) == (50, 5, 45)
+    assert ann.ensure_index_type(index, "hnsw") is index  # 10% dead: below HNSW_MAX_DEAD
+
+    ann.remove_ids(index, ids[5:15])
+    compacted = ann.ensure_index_type(index, "hnsw")
+    assert compacted is not index
+    assert (compacted.ntotal, ann.dead_rows(compacted)) == (35, 0)
+    assert sorted(ann.stored_ids(compacted).tolist()) == ids[15:].tolist()
@@ -0,0 +1,39 @@
+import numpy as np
+from chunker import CHUNK_BITS, chunk_id, chunk_text, doc_ids_of
+
+
+def test_chunk_id_packs_document_and_chunk_number():
+    cid = chunk_id(123456, 7)
+    assert cid >> CHUNK_BITS == 123456
+    assert cid & ((1 << CHUNK_BITS) - 1) == 7
+    assert doc_ids_of(np.array([cid, chunk_id(9, 0)])).tolist() == [123456, 9]
+
+
+def test_empty_text_has_no_chunks():
+    assert chunk_text("") == []
+    assert chunk_text("   \n\t") == []
+
+
+def test_short_text_is_one_chunk():
+    text = "  one two three  "
+    assert chunk_text(text, size=10) == [(2, 15, "one two three")]
+
+
+def test_windows_overlap_and_cover_the_end():
+    words = [f"w{i}" for i in range(10)]
+    chunks = chunk_text(" ".join(words), size=4, overlap=1)
+    assert [c[2].split() for c in chunks] == [words[0:4], words[3:7], words[6:10]]
+
+
+def test_offsets_point_into_the_text():
+    text = "alpha  beta\ngamma delta\tepsilon zeta"
+    for start, end, chunk in chunk_text(text, size=3, overlap=1):
+        assert text[start:end] == chunk
+
+
+def test_long_documents_are_capped():
+    text = " ".join(f"w{i}" for i in range(10_000))
+    chunks = chunk_text(text, size=100, overlap=10, max_chunks=8)
+    assert len(chunks) == 8
+    assert chunks[0][2].startswith("w0 ")
+    assert chunks[-1][2].endswith("w9999")
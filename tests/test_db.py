@@ -0,0 +1,117 @@
+import sqlite3
+import threading
+from chunker import chunk_id
+from filters import SearchFilter
+from conftest import meta
+
+
+def test_chunks_are_replaced_and_returned(database):
+    doc_id = database.upsert_documents({"/d/a.txt": meta("/d/a.txt", "x")})["/d/a.txt"]
+    first = [(chunk_id(doc_id, no), no, no * 10, no * 10 + 5) for no in range(3)]
+    assert database.replace_chunks({doc_id: first}) == []
+    assert database.get_chunk_spans([chunk_id(doc_id, 1)]) == {chunk_id(doc_id, 1): (10, 15)}
+    stale = database.replace_chunks({doc_id: first[:1]})
+    assert sorted(stale) == [c[0] for c in first]
+    assert database.get_chunk_spans([c[0] for c in first]) == {first[0][0]: (0, 5)}
+
+
+def test_keyword_search_ranks_filenames_first_and_escapes_syntax(database):
+    ids = database.upsert_documents({
+        "/d/notes.txt": meta("/d/notes.txt", "budget budget budget"),
+        "/d/budget.txt": meta("/d/budget.txt", "numbers"),
+    })
+    hits = database.keyword_search("budget")
+    assert [doc_id for doc_id, _, _ in hits] == [ids["/d/budget.txt"], ids["/d/notes.txt"]]
+    # User text is never parsed as FTS5 query syntax
+    assert database.keyword_search('NEAR( "budget AND*') != []
+    assert database.keyword_search("   ") == []
+
+
+def test_upsert_keeps_ids_and_replaces_fts_rows(database):
+    ids = database.upsert_documents({"/d/a.txt": meta("/d/a.txt", "old words"), "/d/b.pdf": meta("/d/b.pdf", "other")})
+    again = database.upsert_documents({"/d/a.txt": meta("/d/a.txt", "new words", modified=2.0)})
+    assert again["/d/a.txt"] == ids["/d/a.txt"]
+    assert database.get_indexed_files()["/d/a.txt"] == (ids["/d/a.txt"], 9, 2.0)
+    assert database.keyword_search("old") == []
+    assert [hit[:2] for hit in database.keyword_search("new")] == [(ids["/d/a.txt"], "/d/a.txt")]
+
+
+def test_upsert_is_idempotent(database):
+    docs = {f"/d/{i}.txt": meta(f"/d/{i}.txt", "same text") for i in range(5)}
+    first = database.upsert_documents(docs)
+    assert database.upsert_documents(docs) == first
+    with sqlite3.connect(database.DB_PATH) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] == 5
+        assert conn.execute("SELECT COUNT(*) FROM documents_fts").fetchone()[0] == 5
+
+
+def test_old_fts_table_is_migrated_to_id_keyed_rows(tmp_path, monkeypatch):
+    import db
+    path = str(tmp_path / "old.db")
+    monkeypatch.setattr(db, "DB_PATH", path)
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE documents (id INTEGER PRIMARY KEY AUTOINCREMENT, filename TEXT, "
+                     "path TEXT UNIQUE, extension TEXT, size INTEGER, modified REAL)")
+        conn.execute("INSERT INTO documents (filename, path, extension, size, modified) "
+                     "VALUES ('a.txt', '/d/a.txt', '.txt', 1, 1.0)")
+        conn.execute("CREATE VIRTUAL TABLE documents_fts USING fts5(filename, path, content)")
+        # One extra row per rescan: only the newest must survive
+        conn.execute("INSERT INTO documents_fts (filename, path, content) VALUES ('a.txt', '/d/a.txt', 'stale')")
+        conn.execute("INSERT INTO documents_fts (filename, path, content) VALUES ('a.txt', '/d/a.txt', 'fresh')")
+
+    db.init_db()
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == db.SCHEMA_VERSION
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    doc_id = db.get_document_ids(["/d/a.txt"])["/d/a.txt"]
+    assert db.keyword_search("stale") == []
+    assert [hit[0] for hit in db.keyword_search("fresh")] == [doc_id]
+
+
+def test_documents_by_ids_spans_several_lookup_batches(database):
+    ids = database.upsert_documents({f"/d/{i}.txt": meta(f"/d/{i}.txt") for i in range(1200)})
+    found = database.get_documents_by_ids(ids.values())
+    assert len(found) == 1200
+    assert found[ids["/d/7.txt"]]["filename"] == "7.txt"
+
+
+def test_read_connections_are_pooled(database, monkeypatch):
+    opened = []
+    open_read = database._open_read
+    monkeypatch.setattr(database, "_open_read", lambda: opened.append(1) or open_read())
+    doc_id = database.upsert_documents({"/d/a.txt": meta("/d/a.txt", "pooled")})["/d/a.txt"]
+    errors = []
+
+    def read():
+        try:
+            for _ in range(20):
+                assert doc_id in database.get_documents_by_ids([doc_id])
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=read) for _ in range(3 * database.READ_POOL_SIZE)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert 0 < len(opened) <= database.READ_POOL_SIZE
+
+
+def test_get_paths_under_is_a_prefix_scan(database):
+    database.upsert_documents({p: meta(p) for p in ["/d/x/a.txt", "/d/x/sub/b.txt", "/d/xy/c.txt"]})
+    assert sorted(database.get_paths_under("/d/x")) == ["/d/x/a.txt", "/d/x/sub/b.txt"]
+    assert sorted(database.get_paths_under("/d/x/")) == ["/d/x/a.txt", "/d/x/sub/b.txt"]
+
+
+def test_keyword_search_applies_filters(database):
+    ids = database.upsert_documents({
+        "/home/u/Downloads/a.txt": meta("/home/u/Downloads/a.txt", "shared", modified=10.0),
+        "/home/u/Downloads/b.pdf": meta("/home/u/Downloads/b.pdf", "shared", modified=20.0),
+        "/home/u/Documents/c.pdf": meta("/home/u/Documents/c.pdf", "shared", modified=30.0),
+    })
+
+    def search(**kwargs):
+        return sorted(doc_id for doc_id, _, _ in database.keyword_search("shared", filters=SearchFilter(**kwargs)))
+    assert search(exts=["pdf"]) == sorted([ids["/home/u/Downloads/b.pdf"], ids["/home/u/Documents/c.pdf"]])
+    assert search(categories=["Downloads"], exts=["pdf"]) == [ids["/home/u/Downloads/b.pdf"]]
+    assert search(modified_after=15, modified_before=30) == [ids["/home/u/Downloads/b.pdf"]]
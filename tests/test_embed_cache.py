@@ -0,0 +1,76 @@
+import sqlite3
+import time
+import numpy as np
+import pytest
+from embed_cache import CachedEmbedder, cache_key
+
+
+class CountingEmbedder:
+    model_name = "test-model"
+
+    def __init__(self):
+        self.encoded = []
+        self.closed = False
+
+    def embed_texts(self, texts):
+        self.encoded.extend(texts)
+        return np.array([[len(t), t.count(" "), 1.0] for t in texts], dtype="float32")
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def cached(tmp_path):
+    inner = CountingEmbedder()
+    return inner, CachedEmbedder(inner, path=str(tmp_path / "cache" / "embed.db"))
+
+
+def test_each_distinct_text_is_encoded_once(cached):
+    inner, cache = cached
+    first = cache.embed_texts(["a b", "c", "a b"])
+    assert inner.encoded == ["a b", "c"]
+    assert first.tolist() == [[3, 1, 1], [1, 0, 1], [3, 1, 1]]
+
+    # Whitespace differences hit the same entry
+    again = cache.embed_texts(["  a   b ", "new"])
+    assert inner.encoded == ["a b", "c", "new"]
+    assert again[0].tolist() == first[0].tolist()
+    assert (cache.hits, cache.misses) == (1, 3)
+    assert cache.embed_texts([]).shape == (0, 0)
+
+
+def test_cache_survives_restarts_and_is_per_model(cached, tmp_path):
+    inner, cache = cached
+    cache.embed_texts(["persisted"])
+    reopened = CachedEmbedder(inner, path=cache.path)
+    reopened.embed_texts(["persisted"])
+    assert inner.encoded == ["persisted"]
+
+    other = CachedEmbedder(inner, model_name="other-model", path=cache.path)
+    other.embed_texts(["persisted"])
+    assert inner.encoded == ["persisted", "persisted"]
+    assert cache_key("a", "x") != cache_key("b", "x")
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    inner = CountingEmbedder()
+    cache = CachedEmbedder(inner, path=str(tmp_path / "embed.db"), max_entries=3)
+    for text in ("one", "two", "three"):
+        cache.embed_texts([text])
+        time.sleep(0.01)
+    cache.embed_texts(["one"])  # touched: "two" is now the oldest
+    time.sleep(0.01)
+    cache.embed_texts(["four"])
+
+    with sqlite3.connect(cache.path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] == 3
+    inner.encoded.clear()
+    cache.embed_texts(["one", "three", "four", "two"])
+    assert inner.encoded == ["two"]
+
+
+def test_close_stops_the_wrapped_engine(cached):
+    inner, cache = cached
+    cache.close()
+    assert inner.closed
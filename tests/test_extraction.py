@@ -0,0 +1,69 @@
+import os
+import time
+import zipfile
+import pytest
+import extraction
+from extraction import extract_files
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def _docx(path, text):
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("word/document.xml",
+                   f'<w:document xmlns:w="{W}"><w:body><w:p><w:r><w:t>{text}</w:t></w:r></w:p></w:body></w:document>')
+    return str(path)
+
+
+@pytest.fixture
+def slow_reads(monkeypatch):
+    """Text reads that take as long as the number in the file name (threads only)."""
+    real = extraction.read_timed
+
+    def read_timed(path, token=None, started=None):
+        if started is not None:
+            started.put(token)
+        time.sleep(float(os.path.basename(path).split("-")[0]))
+        return real(path)
+    monkeypatch.setattr(extraction, "read_timed", read_timed)
+
+
+def _files(tmp_path, names):
+    for name in names:
+        (tmp_path / name).write_text(name)
+    return [(str(tmp_path / name), name) for name in names]
+
+
+def test_timeouts_start_when_a_worker_picks_the_file_up(tmp_path, slow_reads):
+    # Three 0.3s files through one thread: the last waits 0.6s but only runs for 0.3s
+    items = _files(tmp_path, ["0.3-a.txt", "0.3-b.txt", "0.3-c.txt"])
+    results = {payload: content for _, payload, content in extract_files(items, workers=1, threads=1, timeout=0.5)}
+    assert results == {name: name for _, name in items}
+
+
+def test_slow_files_time_out_without_holding_up_the_rest(tmp_path, slow_reads):
+    items = _files(tmp_path, ["1.5-slow.txt", "0-a.txt", "0-b.txt"])
+    start = time.monotonic()
+    results = {payload: content for _, payload, content in extract_files(items, workers=1, threads=2, timeout=0.3)}
+    assert time.monotonic() - start < 1.2
+    assert results == {"1.5-slow.txt": None, "0-a.txt": "0-a.txt", "0-b.txt": "0-b.txt"}
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="needs a FIFO to hang a worker on")
+def test_process_pool_is_reused_and_reset_after_a_stuck_file(tmp_path):
+    docs = [(_docx(tmp_path / f"d{i}.docx", f"docx number {i}"), i) for i in range(2)]
+    try:
+        results = {payload: content for _, payload, content in extract_files(docs, workers=2, timeout=30)}
+        assert results == {0: "docx number 0", 1: "docx number 1"}
+        pool = extraction._pool
+        list(extract_files(docs[:1], workers=2, timeout=30))
+        assert extraction._pool is pool
+
+        # Opening a FIFO nobody writes to blocks the worker forever
+        os.mkfifo(tmp_path / "hang.pdf")
+        results = {payload: content for _, payload, content
+                   in extract_files([(str(tmp_path / "hang.pdf"), "hang")] + docs, workers=2, timeout=1)}
+        assert results == {"hang": None, 0: "docx number 0", 1: "docx number 1"}
+        assert extraction._pool is not pool
+    finally:
+        extraction.reset_pool()
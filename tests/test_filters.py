@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+import ann
+import filters
+from chunker import chunk_id
+from filters import FilterIndex, SearchFilter, get_folder_category
+from store import PathTable, write_path_table
+from conftest import unit_vectors
+
+
+def test_from_args_normalizes_extensions_and_categories():
+    search_filter = SearchFilter.from_args({"ext": "PDF, .docx,,", "category": ["downloads"],
+                                            "modified_after": "1700000000"})
+    assert search_filter.key() == ((".docx", ".pdf"), ("Downloads",), 1700000000.0, None)
+    assert search_filter
+    assert not SearchFilter.from_args({})
+
+
+@pytest.mark.parametrize("args", [
+    {"category": "Nope"},
+    {"modified_before": "yesterday"},
+    {"ext": [1]},
+    {"category": {"Downloads": True}},
+])
+def test_from_args_rejects_bad_input(args):
+    with pytest.raises(ValueError):
+        SearchFilter.from_args(args)
+
+
+def test_folder_category():
+    assert get_folder_category("/home/u/Downloads/x.pdf") == "Downloads"
+    assert get_folder_category("/srv/data/x.pdf") == "Other"
+
+
+@pytest.fixture
+def store(tmp_path):
+    # 40 documents of 3 chunks each, alternating .pdf / .txt, dated 0..39
+    paths = {doc: f"/home/u/Documents/f{doc}.{'pdf' if doc % 2 else 'txt'}" for doc in range(1, 41)}
+    write_path_table(tmp_path / "paths.bin", paths, modified={doc: float(doc) for doc in paths})
+    ids = np.array([chunk_id(doc, no) for doc in paths for no in range(3)], dtype="int64")
+    vectors = unit_vectors(len(ids))
+    return ids, vectors, PathTable(str(tmp_path / "paths.bin"))
+
+
+def _docs(labels):
+    return {int(i) >> 12 for i in labels.ravel() if i >= 0}
+
+
+@pytest.mark.parametrize("exact_max", [0, 4096])
+@pytest.mark.parametrize("kind", ["flat", "hnsw"])
+def test_filtered_search_only_returns_matching_documents(store, monkeypatch, kind, exact_max):
+    ids, vectors, paths = store
+    monkeypatch.setattr(filters, "EXACT_SEARCH_MAX", exact_max)  # 0: bitmap plan, else exact plan
+    index = ann.make_index(vectors.shape[1], kind)
+    index.add_with_ids(vectors, ids)
+    filter_index = FilterIndex(index, paths, 2)
+
+    _, labels = filter_index.search(vectors[:5], 20, SearchFilter(exts=["pdf"], modified_after=10, modified_before=20))
+    assert _docs(labels) and _docs(labels) <= {11, 13, 15, 17, 19}
+    _, labels = filter_index.search(vectors[:1], 5, SearchFilter(exts=["xlsx"]))
+    assert labels.size == 0
+
+
+def test_ivf_filter_uses_ids(store):
+    ids, vectors, paths = store
+    index = ann.make_index(vectors.shape[1], "ivf", train_vectors=np.tile(vectors, (6, 1)), ntotal=len(ids))
+    if ann.index_kind(index) != "ivf":
+        pytest.skip("too few vectors to train IVF")
+    index.add_with_ids(vectors, ids)
+    _, labels = FilterIndex(index, paths, 2).search(vectors[:3], 10, SearchFilter(exts=["txt"]), nprobe=4)
+    assert _docs(labels) and all(doc % 2 == 0 for doc in _docs(labels))
@@ -0,0 +1,79 @@
+import io
+import json
+import threading
+import pytest
+from conftest import WordEmbedder
+from store import WriterLock
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch, database):
+    """indexer_service with its store under tmp_path and the model swapped for WordEmbedder."""
+    monkeypatch.chdir(tmp_path)  # STORE_DIR and the embedding cache are relative paths
+    import indexer_service
+    monkeypatch.setattr(indexer_service, "index_embedder", WordEmbedder())
+    return indexer_service
+
+
+def lines(*docs):
+    return [json.dumps(doc).encode() + b"\n" if isinstance(doc, dict) else doc for doc in docs]
+
+
+def test_one_acknowledgement_per_batch(service, database):
+    acks = list(service.ingest(lines(
+        {"path": "/d/a.txt", "content": "alpha"},
+        b"not json\n",
+        {"path": "/d/b.txt", "content": "beta", "modified": 5},
+        b"\n",
+        {"content": "no path"},
+        {"path": "/d/c.txt", "content": "gamma"},
+        None,
+    ), batch_size=2))
+
+    assert [(a["batch"], a["received"], a["indexed"], [e["line"] for e in a["errors"]]) for a in acks[:2]] == [
+        (1, 3, 2, [2]), (2, 3, 1, [5, 7])]
+    assert acks[-1] == {"done": True, "received": 6, "indexed": 3, "failed": 3, "batches": 2}
+    assert set(database.get_indexed_files()) == {"/d/a.txt", "/d/b.txt", "/d/c.txt"}
+    assert database.get_indexed_files()["/d/b.txt"][2] == 5.0
+
+
+def test_oversized_lines_are_skipped(service, monkeypatch):
+    monkeypatch.setattr(service, "MAX_LINE_BYTES", 32)
+    stream = io.BytesIO(b'{"path": "/d/a.txt", "content": "' + b"x" * 100 + b'"}\n{"path": "/d/b.txt"}\n')
+    assert list(service.ndjson_lines(stream)) == [None, b'{"path": "/d/b.txt"}\n']
+
+
+def test_stream_endpoint_answers_ndjson_and_releases_the_lock(service, database):
+    client = service.app.test_client()
+    body = b"".join(lines(*({"path": f"/d/{i}.txt", "content": f"doc {i}"} for i in range(5))))
+    response = client.post("/index/stream?batch=2", data=body, content_type="application/x-ndjson")
+    acks = [json.loads(line) for line in response.data.splitlines()]
+    response.close()  # what the server does once the body is sent
+    assert response.status_code == 200
+    assert [ack["indexed"] for ack in acks[:-1]] == [2, 2, 1]
+    assert acks[-1]["done"] and acks[-1]["indexed"] == 5
+
+    assert service.INDEX_LOCK.acquire(timeout=1)
+    service.INDEX_LOCK.release()
+
+
+def test_a_second_writer_gets_409(service, monkeypatch):
+    monkeypatch.setattr(service, "LOCK_TIMEOUT", 0.1)
+    # Another process holding the store: a separate lock object on the same directory
+    other = WriterLock(service.STORE_DIR)
+    held = threading.Event()
+    done = threading.Event()
+
+    def hold():
+        with other:
+            held.set()
+            done.wait(5)
+    thread = threading.Thread(target=hold)
+    thread.start()
+    try:
+        held.wait(5)
+        response = service.app.test_client().post("/index", json={"parsed_docs": {"/d/a.txt": "x"}})
+        assert response.status_code == 409
+    finally:
+        done.set()
+        thread.join()
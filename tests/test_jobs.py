@@ -0,0 +1,127 @@
+import json
+import time
+import threading
+import pytest
+import jobs
+from jobs import JobManager
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+class Runner:
+    """Index runner stand-in: blocks until released (or stopped), can fail on request."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = []
+
+    def __call__(self, stop, progress, fail=False, **params):
+        self.calls.append(params)
+        progress.update({"scanned": 3, "indexed": 1, "added": 1, "updated": 0, "deleted": 0, "unchanged": 2})
+        while not (self.release.is_set() or stop.is_set()):
+            time.sleep(0.01)
+        if fail:
+            raise RuntimeError("boom")
+
+
+@pytest.fixture
+def runner():
+    runner = Runner()
+    yield runner
+    runner.release.set()
+
+
+def saved(manager):
+    with open(manager.path) as f:
+        return {job["id"]: job for job in json.load(f)}
+
+
+def test_jobs_run_one_at_a_time_and_are_saved(tmp_path, runner):
+    manager = JobManager(runner, path=str(tmp_path / "store" / "jobs.json"))
+    job, created = manager.submit(full=True)
+    assert created
+    wait_for(lambda: job.status == "running")
+    again, created = manager.submit(full=False)
+    assert again is job and not created
+
+    runner.release.set()
+    wait_for(lambda: job.status == "completed")
+    assert runner.calls == [{"full": True}]
+    assert saved(manager)[job.id]["result"]["added"] == 1
+    assert manager.all_jobs() == [job]
+
+
+def test_cancel_stops_a_running_job(tmp_path, runner):
+    manager = JobManager(runner, path=str(tmp_path / "jobs.json"))
+    job, _ = manager.submit()
+    wait_for(lambda: job.status == "running")
+    manager.cancel(job.id)
+    wait_for(lambda: job.status == "cancelled")
+    assert saved(manager)[job.id]["status"] == "cancelled"
+    assert manager.cancel("nope") is None
+
+
+def test_a_failed_job_does_not_stop_the_worker(tmp_path, runner):
+    manager = JobManager(runner, path=str(tmp_path / "jobs.json"))
+    runner.release.set()
+    failed, _ = manager.submit(fail=True)
+    wait_for(lambda: failed.status == "failed")
+    assert failed.error == "boom"
+    job, created = manager.submit()
+    assert created
+    wait_for(lambda: job.status == "completed")
+
+
+def test_jobs_keep_running_when_they_cannot_be_saved(tmp_path, runner):
+    (tmp_path / "store").write_text("a file where the directory should be")
+    manager = JobManager(runner, path=str(tmp_path / "store" / "jobs.json"))
+    runner.release.set()
+    first, _ = manager.submit()
+    wait_for(lambda: first.status == "completed")
+    second, _ = manager.submit()
+    wait_for(lambda: second.status == "completed")
+
+
+def test_interrupted_jobs_resume_on_start(tmp_path, runner):
+    path = str(tmp_path / "jobs.json")
+    with open(path, "w") as f:
+        json.dump([
+            {"id": "old", "status": "completed", "params": {}, "created": 1.0},
+            {"id": "cut", "status": "running", "params": {"full": True}, "created": 2.0, "started": 2.0},
+        ], f)
+    manager = JobManager(runner, path=path)
+    manager.start()
+    runner.release.set()
+    wait_for(lambda: manager.get("cut").status == "completed")
+    assert manager.get("cut").resumed
+    assert manager.get("old").status == "completed"
+    assert runner.calls == [{"full": True}]
+
+
+def test_concurrent_saves_never_corrupt_the_file(tmp_path, runner, monkeypatch):
+    monkeypatch.setattr(jobs, "SAVE_INTERVAL", 0.0)
+    manager = JobManager(runner, path=str(tmp_path / "jobs.json"))
+    manager.start()
+    errors = []
+
+    def hammer():
+        try:
+            for _ in range(30):
+                job, _ = manager.submit()
+                manager.cancel(job.id)
+                manager._save()
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=hammer) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(saved(manager)) <= jobs.KEEP_FINISHED + 1
+    assert not [p for p in tmp_path.iterdir() if p.suffix == ".tmp"]
@@ -0,0 +1,145 @@
+import os
+import time
+import shutil
+import pytest
+import walker
+from pipeline import Checkpoints, build_index, index_batch, run_pipeline
+from shards import ShardSet, read_manifest, shard_dir
+from store import load_store
+from walker import ExclusionRules, walk_roots
+from conftest import WordEmbedder, meta
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch, database):
+    """Roots a/ and b/ to scan, with the store (a relative STORE_DIR) under tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    for root in ("a", "b"):
+        (tmp_path / root).mkdir()
+    return tmp_path
+
+
+def write(path, text, modified=None):
+    path.write_text(text)
+    if modified is not None:
+        os.utime(path, (modified, modified))
+    return str(path)
+
+
+def refresh(roots):
+    roots = [str(root) for root in roots]
+    unlisted = []
+    walked = walk_roots(roots, [".txt"], ExclusionRules([]), unlisted)
+    return run_pipeline(walked, WordEmbedder(), workers=1, roots=roots, unlisted=unlisted)
+
+
+def counts(stats):
+    return {key: stats[key] for key in ("added", "updated", "deleted", "unchanged")}
+
+
+def test_refresh_adds_updates_and_deletes_only_what_changed(workspace, database):
+    a = workspace / "a"
+    one = write(a / "1.txt", "alpha words", modified=1_000)
+    two = write(a / "2.txt", "beta words", modified=1_000)
+    assert counts(refresh([a])) == {"added": 2, "updated": 0, "deleted": 0, "unchanged": 0}
+    assert counts(refresh([a])) == {"added": 0, "updated": 0, "deleted": 0, "unchanged": 2}
+
+    ids = {path: row[0] for path, row in database.get_indexed_files().items()}
+    write(a / "1.txt", "alpha words changed", modified=2_000)
+    (a / "sub").mkdir()
+    three = write(a / "sub" / "3.txt", "gamma")
+    os.remove(two)
+    assert counts(refresh([a])) == {"added": 1, "updated": 1, "deleted": 1, "unchanged": 0}
+
+    indexed = database.get_indexed_files()
+    assert set(indexed) == {one, three}
+    assert indexed[one][0] == ids[one] and indexed[one][2] == 2_000
+    shards = ShardSet()
+    assert shards.has(one, ids[one]) and shards.has(three, indexed[three][0])
+    assert not shards.has(two, ids[two])
+
+
+def test_files_under_a_root_that_disappears_are_kept(workspace, database):
+    a, b = workspace / "a", workspace / "b"
+    kept = write(b / "kept.txt", "on the removable drive")
+    gone = write(a / "gone.txt", "deleted for real")
+    write(a / "stays.txt", "still here")
+    refresh([a, b])
+
+    shutil.move(str(b), str(workspace / "unplugged"))
+    os.remove(gone)
+    stats = refresh([a, b])
+    assert stats["deleted"] == 1
+
+    indexed = database.get_indexed_files()
+    assert kept in indexed and gone not in indexed
+    assert ShardSet().has(kept, indexed[kept][0])
+
+
+def test_unlisted_directories_are_reported(workspace, monkeypatch):
+    a = workspace / "a"
+    (a / "locked").mkdir()
+    write(a / "locked" / "secret.txt", "x")
+    write(a / "open.txt", "x")
+    scandir = os.scandir
+
+    def deny(path):
+        if os.path.basename(path) == "locked":
+            raise PermissionError(13, "Permission denied", path)
+        return scandir(path)
+    monkeypatch.setattr(walker.os, "scandir", deny)
+
+    unlisted = []
+    found = [meta["path"] for _, meta in walk_roots([str(a), str(workspace / "missing")], [".txt"],
+                                                    ExclusionRules([]), unlisted)]
+    assert found == [str(a / "open.txt")]
+    assert sorted(unlisted) == sorted([str(a / "locked"), str(workspace / "missing")])
+
+
+def test_batches_carry_their_modified_times_into_the_shards(workspace, database):
+    shards = ShardSet(roots=[str(workspace / "a")])
+    batch = {str(workspace / "a" / f"{i}.txt"): meta(str(workspace / "a" / f"{i}.txt"), f"doc {i}", modified=100.0 + i)
+             for i in range(3)}
+    assert index_batch(batch, WordEmbedder(), shards) == 3
+    shards.save()
+
+    (name,) = read_manifest()["shards"]
+    _, index, table, _ = load_store(shard_dir(shards.store_dir, name))
+    assert index.ntotal == 3
+    assert sorted(table.modified.tolist()) == [100.0, 101.0, 102.0]
+
+
+class SlowSaves:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.saves = 0
+
+    def save(self):
+        time.sleep(self.seconds)
+        self.saves += 1
+
+
+def test_checkpoints_back_off_as_saves_get_slower():
+    shards = SlowSaves(0.05)
+    checkpoints = Checkpoints(shards, seconds=0, share=0.25)
+    assert checkpoints.maybe_save()
+    # A 0.05s save at a 25% share: the next one is due 0.2s later, not on the next batch
+    assert not checkpoints.maybe_save()
+    time.sleep(0.25)
+    assert checkpoints.maybe_save()
+    assert shards.saves == 2
+
+    assert not Checkpoints(shards, seconds=3600).maybe_save()
+
+
+def test_build_index_replaces_the_whole_store(workspace, database):
+    a, b = str(workspace / "a"), str(workspace / "b")
+    first = {f"{a}/{i}.txt": meta(f"{a}/{i}.txt", f"first {i}") for i in range(3)}
+    assert build_index(first, WordEmbedder(), roots=[a, b]) == (3, 1)
+    second = {f"{b}/{i}.txt": meta(f"{b}/{i}.txt", f"second {i}") for i in range(2)}
+    assert build_index(second, WordEmbedder(), roots=[a, b]) == (2, 1)
+
+    assert list(read_manifest()["shards"].values()) == [b]
+    shards = ShardSet()
+    ids = database.get_document_ids(list(second))
+    assert all(shards.has(path, doc_id) for path, doc_id in ids.items())
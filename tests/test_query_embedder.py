@@ -0,0 +1,66 @@
+import threading
+import time
+import numpy as np
+from query_embedder import QueryEncoder, get_query_encoder, normalize_query
+
+
+class SlowEmbedder:
+    """Records each model call; every call takes a little while, like a forward pass."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = []
+
+    def embed_texts(self, texts):
+        self.calls.append(list(texts))
+        time.sleep(self.delay)
+        return np.array([[len(t), 1.0] for t in texts], dtype="float32")
+
+
+def test_repeated_queries_come_from_the_cache():
+    embedder = SlowEmbedder(0)
+    encoder = QueryEncoder(embedder)
+    first = encoder.embed_queries(["tax  return", "cats"])
+    again = encoder.embed_queries([" tax return ", "cats"])
+    assert embedder.calls == [["tax return", "cats"]]
+    assert np.allclose(first, again)
+    assert np.allclose(np.linalg.norm(first, axis=1), 1.0)
+
+    encoder.clear()
+    encoder.embed_queries(["cats"], coalesce=False)
+    assert embedder.calls[-1] == ["cats"]
+    assert normalize_query("\ta  b \n") == "a b"
+
+
+def test_expired_and_evicted_entries_are_encoded_again():
+    embedder = SlowEmbedder(0)
+    encoder = QueryEncoder(embedder, cache_size=2, ttl=0.05, wait_ms=0)
+    encoder.embed_queries(["a", "b", "c"])
+    encoder.embed_queries(["a"])  # evicted by "c"
+    time.sleep(0.1)
+    encoder.embed_queries(["c"])  # expired
+    assert embedder.calls == [["a", "b", "c"], ["a"], ["c"]]
+
+
+def test_concurrent_queries_share_model_calls():
+    embedder = SlowEmbedder(0.05)
+    encoder = QueryEncoder(embedder, wait_ms=50)
+    results = {}
+
+    def query(text):
+        results[text] = encoder.embed_queries([text])[0]
+    threads = [threading.Thread(target=query, args=(f"q{i % 4}",)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == ["q0", "q1", "q2", "q3"]
+    encoded = [text for call in embedder.calls for text in call]
+    assert sorted(encoded) == ["q0", "q1", "q2", "q3"]  # each distinct query once
+    assert len(embedder.calls) < 4
+
+
+def test_one_encoder_per_embedder():
+    embedder = SlowEmbedder(0)
+    assert get_query_encoder(embedder) is get_query_encoder(embedder)
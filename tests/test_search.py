@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+import ann
+import search
+from chunker import chunk_id
+from search import MAX_BATCH, Searcher, parse_batch
+from shards import ShardSet
+from store import save_store
+from conftest import unit_vectors
+
+
+def _save(store_dir, docs):
+    index = ann.make_index(8, "flat")
+    index.add_with_ids(unit_vectors(len(docs)), np.array([chunk_id(doc, 0) for doc in docs], dtype="int64"))
+    save_store(index, docs, store_dir)
+
+
+def test_searcher_keeps_the_store_resident_until_it_changes(tmp_path, monkeypatch):
+    store_dir = str(tmp_path)
+    _save(store_dir, {1: "/a.txt", 2: "/b.txt"})
+    searcher = Searcher(store_dir)
+    first = searcher.snapshot()
+    assert searcher.snapshot() is first
+
+    _save(store_dir, {1: "/a.txt", 2: "/b.txt", 3: "/c.txt"})
+    monkeypatch.setattr(search, "RELOAD_CHECK_INTERVAL", 3600)
+    assert searcher.snapshot() is first  # not looked at before the interval is up
+    searcher.invalidate()
+    second = searcher.snapshot()
+    assert second is not first
+    assert second[1][0][0].ntotal == 3 and second[2][3] == "/c.txt"
+
+
+def test_aggregate_hits_folds_chunks_into_documents():
+    ids = np.array([chunk_id(1, 0), chunk_id(2, 0), chunk_id(1, 1), -1])
+    scores = np.array([0.9, 0.8, 0.5, 0.0], dtype="float32")
+    assert search.aggregate_hits(scores, ids, 2) == [(1, pytest.approx(0.9), chunk_id(1, 0)),
+                                                     (2, pytest.approx(0.8), chunk_id(2, 0))]
+    assert [hit[0] for hit in search.aggregate_hits(scores, ids, 2, "sum")] == [1, 2]
+
+
+def test_fuse_hits_rewards_documents_both_retrievers_found():
+    vector = [(1, "/a", 0.9, (0, 5)), (2, "/b", 0.8, None)]
+    keyword = [(3, "/c", -2.0, None), (2, "/b", -1.0, None)]
+    fused = search.fuse_hits([vector, keyword], 3)
+    assert [hit[1] for hit in fused] == ["/b", "/a", "/c"]
+    assert fused[0][2] == pytest.approx(1 / (search.RRF_K + 2) * 2)
+    assert fused[1][3] == (0, 5)
+
+
+def test_sharded_search_matches_a_single_index(tmp_path):
+    docs = {doc: f"/{'ab'[doc % 2]}/{doc}.txt" for doc in range(1, 61)}
+    ids = np.array([chunk_id(doc, 0) for doc in docs], dtype="int64")
+    vectors = unit_vectors(len(ids), seed=3)
+
+    single = ann.make_index(8, "flat")
+    single.add_with_ids(vectors, ids)
+    save_store(single, docs, str(tmp_path / "single"))
+
+    shard_set = ShardSet(str(tmp_path / "sharded"), roots=["/a", "/b"])
+    for row, (doc, path) in enumerate(docs.items()):
+        shard_set.add(shard_set.route(path, doc), vectors[row:row + 1], ids[row:row + 1], {doc: path})
+    shard_set.save()
+
+    queries = unit_vectors(4, seed=9)
+    D1, I1, _, _ = Searcher(str(tmp_path / "single")).search(queries, 10)
+    D2, I2, paths, _ = Searcher(str(tmp_path / "sharded")).search(queries, 10)
+    assert np.allclose(D1, D2)
+    assert I1.tolist() == I2.tolist()
+    assert len(paths) == 60 and paths[7] == "/b/7.txt"
+
+
+
+def test_tombstoned_rows_are_never_returned(tmp_path):
+    docs = {doc: f"/d/{doc}.txt" for doc in range(1, 21)}
+    vectors = unit_vectors(len(docs))
+    ids = np.array([chunk_id(doc, 0) for doc in docs], dtype="int64")
+    index = ann.make_index(8, "hnsw")
+    index.add_with_ids(vectors, ids)
+    ann.remove_ids(index, ids[:3])
+    save_store(index, {doc: path for doc, path in docs.items() if doc > 3}, str(tmp_path))
+
+    _, labels, _, _ = Searcher(str(tmp_path)).search(vectors[:3], 5)
+    found = labels[labels >= 0] >> 12
+    assert found.size and found.min() > 3
+
+
+def test_parse_batch_applies_shared_options():
+    requests = parse_batch({"queries": ["one", {"q": "two", "top_k": 9, "mode": "hybrid", "ext": "pdf"}],
+                            "top_k": 3, "scoring": "sum"})
+    assert [(r["query"], r["top_k"], r["mode"], r["scoring"]) for r in requests] == [
+        ("one", 3, "vector", "sum"), ("two", 9, "hybrid", "sum")]
+    assert not requests[0]["filters"]
+    assert requests[1]["filters"].exts == (".pdf",)
+
+
+@pytest.mark.parametrize("body, message", [
+    ([], '"queries" list'),
+    ({"queries": []}, "No queries"),
+    ({"queries": ["x"] * (MAX_BATCH + 1)}, "At most"),
+    ({"queries": [5]}, "Query 0: expected a string"),
+    ({"queries": ["ok", " "]}, "Query 1: no query"),
+    ({"queries": ["x"], "mode": "fuzzy"}, "mode must be"),
+    ({"queries": ["x"], "scoring": "avg"}, "scoring must be"),
+    ({"queries": ["x"], "top_k": 0}, "top_k must be"),
+    ({"queries": ["x"], "top_k": "many"}, "Query 0"),
+    ({"queries": [{"q": "x", "ext": [1]}]}, '"ext" must be'),
+    ({"queries": ["x"], "category": "Nope"}, "Unknown category"),
+])
+def test_parse_batch_rejects_bad_bodies(body, message):
+    with pytest.raises(ValueError, match=message):
+        parse_batch(body)
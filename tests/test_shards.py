@@ -0,0 +1,122 @@
+import os
+import numpy as np
+import pytest
+import ann
+import shards
+from chunker import chunk_id
+from shards import ShardSet, index_exists, read_manifest, root_of, root_shard_name, shard_dir
+from store import load_store, save_store, store_exists
+from conftest import unit_vectors
+
+
+def test_root_of_prefers_the_longest_scan_root():
+    roots = ["/data", "/data/projects"]
+    assert root_of("/data/projects/a.txt", roots) == "/data/projects"
+    assert root_of("/data/b.txt", roots) == "/data"
+    assert root_of("/home/u/c.txt", roots) == os.sep + "home"
+
+
+def test_shard_names_are_safe_and_stable():
+    name = root_shard_name("C:\\")
+    assert name == root_shard_name("C:\\")
+    assert name.startswith("C-") and os.sep not in name
+    assert root_shard_name("/data/a") != root_shard_name("/data-a")
+
+
+def test_size_mode_routes_by_document_id(tmp_path, monkeypatch):
+    monkeypatch.setattr(shards, "SHARD_DOCS", 100)
+    shard_set = ShardSet(str(tmp_path), by="size")
+    assert shard_set.route("/x", 5) == shard_set.route("/y", 99) == "docs-00000"
+    assert shard_set.route("/x", 100) == "docs-00001"
+
+
+def test_unknown_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ShardSet(str(tmp_path), by="hash")
+
+
+def _add(shard_set, docs):
+    """docs: {doc_id: path}, one chunk each."""
+    for doc_id, path in docs.items():
+        vectors = unit_vectors(1, seed=doc_id)
+        shard_set.add(shard_set.route(path, doc_id), vectors, np.array([chunk_id(doc_id, 0)]), {doc_id: path})
+
+
+def test_documents_land_in_their_root_shard(tmp_path):
+    store_dir = str(tmp_path)
+    shard_set = ShardSet(store_dir, roots=["/a", "/b"])
+    assert shard_set.empty
+    _add(shard_set, {1: "/a/1.txt", 2: "/a/2.txt", 3: "/b/3.txt"})
+    shard_set.save()
+
+    manifest = read_manifest(store_dir)
+    assert manifest["by"] == "root"
+    assert sorted(manifest["shards"].values()) == ["/a", "/b"]
+    assert index_exists(store_dir)
+    _, index, paths, _ = load_store(shard_dir(store_dir, root_shard_name("/a")))
+    assert index.ntotal == 2 and paths.to_dict() == {1: "/a/1.txt", 2: "/a/2.txt"}
+
+    reopened = ShardSet(store_dir)
+    assert reopened.has("/b/3.txt", 3) and not reopened.has("/b/4.txt", 4)
+
+
+def test_has_reads_path_tables_without_loading_indexes(tmp_path, monkeypatch):
+    store_dir = str(tmp_path)
+    shard_set = ShardSet(store_dir, roots=["/a", "/b"])
+    _add(shard_set, {1: "/a/1.txt", 2: "/b/2.txt"})
+    shard_set.save()
+
+    loads = []
+    monkeypatch.setattr(shards, "load_store", lambda *args, **kwargs: loads.append(args) or load_store(*args, **kwargs))
+    reopened = ShardSet(store_dir)
+    assert reopened.has("/a/1.txt", 1) and reopened.has("/b/2.txt", 2)
+    assert not reopened.has("/a/3.txt", 3) and not reopened.has("/c/4.txt", 4)
+    assert loads == []
+
+    # Changing a shard loads its index, and has() then follows the changes
+    reopened.forget([1], {1: "/a/1.txt"})
+    assert loads == [(shard_dir(store_dir, root_shard_name("/a")),)]
+    assert not reopened.has("/a/1.txt", 1) and reopened.has("/b/2.txt", 2)
+
+
+def test_emptied_shards_are_dropped(tmp_path):
+    store_dir = str(tmp_path)
+    shard_set = ShardSet(store_dir, roots=["/a", "/b"])
+    _add(shard_set, {1: "/a/1.txt", 2: "/b/2.txt"})
+    shard_set.save()
+
+    shard_set = ShardSet(store_dir)
+    shard_set.discard([chunk_id(2, 0)], {2: "/b/2.txt"})
+    shard_set.forget([2], {2: "/b/2.txt"})
+    shard_set.save()
+    assert list(read_manifest(store_dir)["shards"].values()) == ["/a"]
+    assert not os.path.exists(shard_dir(store_dir, root_shard_name("/b")))
+
+
+def test_single_store_is_split_without_reembedding(tmp_path):
+    store_dir = str(tmp_path)
+    index = ann.make_index(8, "flat")
+    index.add_with_ids(unit_vectors(4), np.array([chunk_id(d, 0) for d in (1, 2, 3, 4)]))
+    # Document 4 has no path: its vector is an orphan and is left behind
+    save_store(index, {1: "/a/1.txt", 2: "/a/2.txt", 3: "/b/3.txt"}, store_dir)
+
+    shard_set = ShardSet(store_dir, roots=["/a", "/b"])
+    assert not shard_set.replacing
+    shard_set.save(convert=True)
+    assert not store_exists(store_dir)
+    counts = {root: load_store(shard_dir(store_dir, name))[1].ntotal
+              for name, root in read_manifest(store_dir)["shards"].items()}
+    assert counts == {"/a": 2, "/b": 1}
+
+
+def test_fresh_build_retires_previous_shards(tmp_path):
+    store_dir = str(tmp_path)
+    shard_set = ShardSet(store_dir, roots=["/a"])
+    _add(shard_set, {1: "/a/1.txt"})
+    shard_set.save()
+
+    rebuilt = ShardSet(store_dir, roots=["/b"], fresh=True)
+    _add(rebuilt, {2: "/b/2.txt"})
+    rebuilt.save()
+    assert list(read_manifest(store_dir)["shards"].values()) == ["/b"]
+    assert not os.path.exists(shard_dir(store_dir, root_shard_name("/a")))
@@ -0,0 +1,96 @@
+import pickle
+import threading
+import faiss
+import numpy as np
+import pytest
+import ann
+from filters import CATEGORY_CODES
+from store import (PathTable, WriterLock, load_store, read_generation, save_store, store_exists,
+                   write_path_table)
+from conftest import unit_vectors
+
+
+def test_path_table_round_trip(tmp_path):
+    odd = b"/home/u/Downloads/caf\xe9.PDF".decode("utf-8", "surrogateescape")
+    paths = {42: "/home/u/Documents/notes.txt", 7: "/home/u/Documents/ünïcode.docx", 1000: odd}
+    write_path_table(tmp_path / "paths.bin", paths, fmt=2, modified={42: 5.5})
+
+    table = PathTable(str(tmp_path / "paths.bin"))
+    assert table.fmt == 2
+    assert len(table) == 3
+    assert table.ids.tolist() == [7, 42, 1000]
+    assert table.to_dict() == paths
+    assert table[1000] == odd
+    assert 42 in table and 43 not in table
+    assert table.get(43, "missing") == "missing"
+    with pytest.raises(KeyError):
+        table[43]
+    assert table.extension.tolist() == [b".docx", b".txt", b".pdf"]
+    assert table.category.tolist() == [CATEGORY_CODES["Documents"]] * 2 + [CATEGORY_CODES["Downloads"]]
+    assert table.modified[1] == 5.5 and np.isnan(table.modified[0])
+
+
+def test_positional_path_table(tmp_path):
+    write_path_table(tmp_path / "paths.bin", ["/a", "/b"], fmt=0)
+    table = PathTable(str(tmp_path / "paths.bin"))
+    assert table.fmt == 0
+    assert table.to_dict() == {0: "/a", 1: "/b"}
+
+
+def test_not_a_path_table(tmp_path):
+    (tmp_path / "junk.bin").write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        PathTable(str(tmp_path / "junk.bin"))
+
+
+def test_save_store_writes_new_generations(tmp_path):
+    store_dir = str(tmp_path / "store")
+    assert not store_exists(store_dir)
+    index = ann.make_index(8, "flat")
+    index.add_with_ids(unit_vectors(3), np.array([1 << 12, 2 << 12, 3 << 12], dtype="int64"))
+
+    save_store(index, {1: "/a.txt", 2: "/b.txt", 3: "/c.txt"}, store_dir)
+    save_store(index, {1: "/a.txt", 2: "/b.txt", 3: "/c.txt"}, store_dir)
+    assert read_generation(store_dir) == 2
+    signature, loaded, paths, fmt = load_store(store_dir, mmap_index=False)
+    assert loaded.ntotal == 3 and fmt == 2
+    assert paths.to_dict() == {1: "/a.txt", 2: "/b.txt", 3: "/c.txt"}
+    assert not [name for name in (tmp_path / "store").iterdir() if name.suffix == ".tmp"]
+
+
+def test_readers_keep_their_generation_while_a_writer_swaps(tmp_path):
+    store_dir = str(tmp_path)
+    index = ann.make_index(8, "flat")
+    index.add_with_ids(unit_vectors(2), np.array([1 << 12, 2 << 12], dtype="int64"))
+    save_store(index, {1: "/a.txt", 2: "/b.txt"}, store_dir)
+    signature, _, old_paths, _ = load_store(store_dir)
+
+    save_store(index, {1: "/a2.txt", 2: "/b2.txt"}, store_dir)
+    assert old_paths[1] == "/a.txt"  # still mapped, not rewritten in place
+    new_signature, _, new_paths, _ = load_store(store_dir)
+    assert new_signature != signature and new_paths[1] == "/a2.txt"
+
+
+def test_legacy_meta_pkl_stores_still_load(tmp_path):
+    index = faiss.IndexFlatIP(8)
+    index.add(unit_vectors(2))
+    faiss.write_index(index, str(tmp_path / "index.faiss"))
+    with open(tmp_path / "meta.pkl", "wb") as f:
+        pickle.dump(["/a.txt", "/b.txt"], f)
+
+    assert store_exists(str(tmp_path))
+    _, loaded, paths, fmt = load_store(str(tmp_path))
+    assert (loaded.ntotal, paths, fmt) == (2, ["/a.txt", "/b.txt"], 0)
+
+
+def test_writer_lock_excludes_other_writers(tmp_path):
+    lock = WriterLock(str(tmp_path))
+    assert lock.acquire(timeout=1)
+    results = []
+    thread = threading.Thread(target=lambda: results.append(lock.acquire(timeout=0.2)))
+    thread.start()
+    thread.join()
+    assert results == [False]
+    lock.release()
+    with lock:
+        assert (tmp_path / "writer.lock").exists()
@@ -0,0 +1,48 @@
+import os
+import pytest
+from walker import ExclusionRules, walk_roots
+
+
+def test_names_match_whole_components_case_insensitively():
+    rules = ExclusionRules(["Lib", "node_modules", "$RECYCLE.BIN"])
+    assert rules.match_name("lib") and rules.match_name("LIB")
+    assert not rules.match_name("Library") and not rules.match_name("mylib")
+    assert rules.match_path("C:\\Python\\Lib\\os.py")
+    assert rules.match_path("/home/u/app/node_modules/x/index.js")
+    assert not rules.match_path("/home/u/Library/notes.txt")
+    assert rules.match_name("$recycle.bin")
+
+
+def test_wildcard_entries_are_globs():
+    rules = ExclusionRules(["*.egg-info", "cache?"])
+    assert rules.match_name("pkg.egg-info") and rules.match_name("Cache1")
+    assert not rules.match_name("egg-info") and not rules.match_name("cache12")
+    assert ExclusionRules([]).match_path("/any/where") is False
+
+
+def _tree(base, files):
+    for name in files:
+        path = base / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("x")
+
+
+def test_walk_skips_excluded_folders_and_other_extensions(tmp_path):
+    a, b = tmp_path / "a", tmp_path / "b"
+    _tree(a, ["keep.txt", "Library/keep.PDF", "Lib/skip.txt", "x/node_modules/skip.txt", "notes.md"])
+    _tree(b, ["deep/er/keep.txt"])
+    walked = list(walk_roots([str(a), str(b)], [".txt", ".pdf"], ExclusionRules(["lib", "node_modules"])))
+
+    found = sorted((root, os.path.relpath(meta["path"], root)) for root, meta in walked)
+    assert found == [(str(a), "Library/keep.PDF".replace("/", os.sep)), (str(a), "keep.txt"),
+                     (str(b), os.path.join("deep", "er", "keep.txt"))]
+    meta = next(meta for _, meta in walked if meta["filename"] == "keep.PDF")
+    assert meta["extension"] == ".pdf" and meta["size"] == 1 and meta["modified"] > 0
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="needs symlinks")
+def test_symlinked_folders_are_not_followed(tmp_path):
+    _tree(tmp_path / "real", ["a.txt"])
+    (tmp_path / "root").mkdir()
+    os.symlink(tmp_path / "real", tmp_path / "root" / "link", target_is_directory=True)
+    assert list(walk_roots([str(tmp_path / "root")], [".txt"], ExclusionRules([]))) == []
@@ -0,0 +1,99 @@
+import os
+import shutil
+import sys
+import threading
+import time
+import pytest
+from watcher import ChangeQueue, InotifyWatcher, PollingWatcher
+
+
+def drain(changes, timeout=5.0):
+    """Everything queued once events have been quiet for 0.3s."""
+    stop = threading.Event()
+    timer = threading.Timer(timeout, stop.set)
+    timer.start()
+    try:
+        drained = changes.drain(stop, debounce=0.3, max_delay=timeout)
+    finally:
+        timer.cancel()
+    return drained[0] if drained else {}
+
+
+def test_events_are_coalesced_per_path():
+    changes = ChangeQueue()
+    changes.put("/d/a.txt")
+    changes.put("/d/b.txt")
+    changes.put("/d/a.txt", "deleted")
+    changes.put("/d/a.txt")
+    assert len(changes) == 2
+    assert drain(changes) == {"/d/b.txt": "changed", "/d/a.txt": "changed"}
+    assert len(changes) == 0
+
+
+def test_drain_hands_over_at_most_max_batch():
+    changes = ChangeQueue()
+    for i in range(5):
+        changes.put(f"/d/{i}.txt")
+    stop = threading.Event()
+    first, _ = changes.drain(stop, debounce=60, max_batch=3)
+    assert list(first) == ["/d/0.txt", "/d/1.txt", "/d/2.txt"]
+    assert list(drain(changes)) == ["/d/3.txt", "/d/4.txt"]
+
+
+def test_overflow_is_reported():
+    changes = ChangeQueue()
+    changes.overflow()
+    assert changes.drain(threading.Event(), debounce=0) == ({}, True)
+
+
+def _watch(source):
+    stop = threading.Event()
+    source.setup()
+    thread = threading.Thread(target=source.run, args=(stop,), daemon=True)
+    thread.start()
+    return stop, thread
+
+
+def _accept(path):
+    return path.endswith(".txt")
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux only")
+def test_inotify_reports_writes_deletes_and_new_folders(tmp_path):
+    (tmp_path / "old.txt").write_text("x")
+    (tmp_path / "gone").mkdir()
+    changes = ChangeQueue()
+    stop, thread = _watch(InotifyWatcher([str(tmp_path)], changes, _accept, lambda path: path.endswith("skip")))
+    try:
+        (tmp_path / "new.txt").write_text("x")
+        (tmp_path / "ignored.bin").write_text("x")
+        (tmp_path / "skip").mkdir()
+        (tmp_path / "skip" / "hidden.txt").write_text("x")
+        os.remove(tmp_path / "old.txt")
+        shutil.rmtree(tmp_path / "gone")
+        (tmp_path / "sub").mkdir()
+        time.sleep(0.2)  # watch on sub/ is in place
+        (tmp_path / "sub" / "deep.txt").write_text("x")
+        assert drain(changes) == {
+            str(tmp_path / "new.txt"): "changed",
+            str(tmp_path / "old.txt"): "deleted",
+            str(tmp_path / "gone"): "deleted_dir",
+            str(tmp_path / "sub" / "deep.txt"): "changed",
+        }
+    finally:
+        stop.set()
+        thread.join()
+
+
+def test_polling_diffs_snapshots(tmp_path):
+    (tmp_path / "old.txt").write_text("x")
+    (tmp_path / "same.txt").write_text("x")
+    changes = ChangeQueue()
+    stop, thread = _watch(PollingWatcher([str(tmp_path)], changes, _accept, lambda path: False, interval=0.1))
+    try:
+        (tmp_path / "new.txt").write_text("x")
+        os.remove(tmp_path / "old.txt")
+        assert drain(changes) == {str(tmp_path / "new.txt"): "changed", str(tmp_path / "old.txt"): "deleted"}
+    finally:
+        stop.set()
+        thread.join()
@@ -1,8 +1,9 @@
-from sentence_transformers import SentenceTransformer
+from embedder import MODEL_NAME, get_embedder
 
 class Embedder:
-    def _init_(self, model_name="all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name=MODEL_NAME):
+        # Thin handle on the process-wide model, so no second copy is loaded
+        self.shared = get_embedder(model_name)
 
     def embed_texts(self, texts):
-        return self.model.encode(texts, show_progress_bar=False, convert_to_numpy=True)
\ No newline at end of file
+        return self.shared.embed_texts(texts)
\ No newline at end of file
@@ -0,0 +1,137 @@
+# walker.py
+import os
+import re
+import queue
+import fnmatch
+import threading
+import time
+from metrics import WALK_FILES, WALK_SECONDS
+
+WALK_QUEUE = 256  # directory batches buffered between walker threads and the consumer
+
+_SEPARATORS = re.compile(r"[\\/]+")
+
+
+class ExclusionRules:
+    """
+    Folder exclusions matched against whole path components, case-insensitively,
+    so "Lib" excludes "...\\Lib\\..." but not "Library". Entries with
+    wildcards ("*.egg-info") are compiled into a single glob regex.
+    """
+
+    def __init__(self, names):
+        names = [n.lower() for n in names]
+        self.exact = frozenset(n for n in names if not any(c in n for c in "*?["))
+        globs = [fnmatch.translate(n) for n in names if n not in self.exact]
+        self.pattern = re.compile("|".join(globs)) if globs else None
+
+    def match_name(self, name):
+        name = name.lower()
+        return name in self.exact or (self.pattern is not None and self.pattern.match(name) is not None)
+
+    def match_path(self, path):
+        return any(self.match_name(part) for part in _SEPARATORS.split(path) if part)
+
+
+def _put(q, item, stop):
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def scan_tree(root, exts, rules, stop=None, unlisted=None):
+    """
+    Yield one list of file metadata per directory under `root`.
+
+    Uses os.scandir so directory checks come from the dirent type and each
+    kept file costs a single stat (free on Windows, where FindNextFile
+    already returns size and mtime). Only files whose extension is in `exts`
+    are stat'ed at all.
+
+    Directories that can't be listed (unmounted drive, no permission, I/O
+    error) are skipped and appended to `unlisted`: their files are unknown,
+    not gone.
+    """
+    stack = [root]
+    while stack:
+        if stop is not None and stop.is_set():
+            return
+        directory = stack.pop()
+        batch = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not rules.match_name(entry.name):
+                                stack.append(entry.path)
+                            continue
+                        name = entry.name
+                        dot = name.rfind(".")
+                        ext = name[dot:].lower() if dot > 0 else ""
+                        if ext not in exts:
+                            continue
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    batch.append({
+                        "filename": name,
+                        "path": entry.path,
+                        "extension": ext,
+                        "size": st.st_size,
+                        "modified": st.st_mtime,
+                    })
+        except OSError as e:
+            print(f"⚠ Could not list {directory}: {e}")
+            if unlisted is not None:
+                unlisted.append(directory)
+        if batch:
+            yield batch
+
+
+def walk_roots(roots, exts, rules, unlisted=None):
+    """
+    Walk every root on its own thread and yield (root, metadata) for each
+    matching file as it is found. Closing the generator stops the walkers.
+    Directories (or whole roots) that couldn't be listed are appended to
+    `unlisted` as the walk goes.
+    """
+    exts = frozenset(e.lower() for e in exts)
+    out = queue.Queue(maxsize=WALK_QUEUE)
+    stop = threading.Event()
+
+    def walk(root):
+        busy = 0.0  # time spent listing, not waiting on a slow consumer
+        batches = scan_tree(root, exts, rules, stop, unlisted)
+        try:
+            while True:
+                start = time.perf_counter()
+                batch = next(batches, None)
+                busy += time.perf_counter() - start
+                if batch is None:
+                    return
+                WALK_FILES.inc(len(batch), root=root)
+                if not _put(out, (root, batch), stop):
+                    return
+        finally:
+            WALK_SECONDS.observe(busy, root=root)
+            _put(out, (root, None), stop)
+
+    threads = [threading.Thread(target=walk, args=(root,), name=f"walk-{root}", daemon=True) for root in roots]
+    for thread in threads:
+        thread.start()
+    try:
+        remaining = len(threads)
+        while remaining:
+            root, batch = out.get()
+            if batch is None:
+                remaining -= 1
+                continue
+            for meta in batch:
+                yield root, meta
+    finally:
+        stop.set()
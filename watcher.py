@@ -0,0 +1,336 @@
+# watcher.py
+import os
+import sys
+import time
+import errno
+import struct
+import select
+import ctypes
+import ctypes.util
+import threading
+import traceback
+from itertools import islice
+
+# 🔧 Watch configuration
+WATCH_DEBOUNCE = 2.0      # seconds without new events before pending changes are indexed
+WATCH_MAX_DELAY = 30.0    # flush anyway during a long burst (e.g. unpacking an archive)
+WATCH_MAX_BATCH = 20_000  # paths handed to the indexer per flush
+POLL_INTERVAL = 300.0     # polling fallback: seconds between tree snapshots
+
+# inotify(7) event bits
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+# Files are picked up once the writer closes them (or when renamed into place)
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class ChangeQueue:
+    """
+    Pending filesystem changes, coalesced per path: a burst of events for
+    one file becomes a single entry holding the latest state, so nothing is
+    extracted or embedded twice.
+    """
+
+    def __init__(self):
+        self._pending = {}  # path -> "changed" | "deleted" | "deleted_dir"
+        self._cond = threading.Condition()
+        self._first = None
+        self._last = None
+        self._overflowed = False
+
+    def __len__(self):
+        return len(self._pending)
+
+    def put(self, path, kind="changed"):
+        with self._cond:
+            self._pending.pop(path, None)
+            self._pending[path] = kind
+            self._touch()
+
+    def overflow(self):
+        # The kernel dropped events: only a rescan can tell what changed
+        with self._cond:
+            self._overflowed = True
+            self._touch()
+
+    def _touch(self):
+        now = time.monotonic()
+        self._first = self._first or now
+        self._last = now
+        self._cond.notify()
+
+    def drain(self, stop, debounce=WATCH_DEBOUNCE, max_delay=WATCH_MAX_DELAY, max_batch=WATCH_MAX_BATCH):
+        """
+        Block until pending changes have settled for `debounce` seconds (or
+        have waited `max_delay`, or `max_batch` piled up), then pop them.
+
+        Returns:
+            (dict path -> kind, overflowed), or None once `stop` is set.
+        """
+        with self._cond:
+            while True:
+                if stop.is_set():
+                    return None
+                if not self._pending and not self._overflowed:
+                    self._cond.wait(0.5)
+                    continue
+                now = time.monotonic()
+                due = min(self._last + debounce, self._first + max_delay)
+                if now >= due or len(self._pending) >= max_batch:
+                    break
+                self._cond.wait(due - now)
+
+            changes = {path: self._pending[path] for path in islice(self._pending, max_batch)}
+            for path in changes:
+                del self._pending[path]
+            overflowed, self._overflowed = self._overflowed, False
+            self._first = time.monotonic() if self._pending else None
+            return changes, overflowed
+
+
+def _walk_dirs(top, exclude):
+    """Yield (directory, [files]) below top, skipping excluded directories."""
+    stack = [top]
+    while stack:
+        directory = stack.pop()
+        files = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not exclude(entry.path):
+                                stack.append(entry.path)
+                        else:
+                            files.append(entry)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+        yield directory, files
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        raise OSError("inotify is only available on Linux")
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    if not hasattr(libc, "inotify_init1"):
+        raise OSError("libc has no inotify support")
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return libc
+
+
+class InotifyWatcher:
+    """Recursive inotify watch over `roots` (Linux), via ctypes."""
+
+    def __init__(self, roots, changes, accept, exclude):
+        self.roots = roots
+        self.changes = changes
+        self.accept = accept
+        self.exclude = exclude
+        self._libc = _load_libc()
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1 failed: {os.strerror(err)}")
+        self._dirs = {}  # wd -> directory
+        self._wds = {}   # directory -> wd
+        self._limit_warned = False
+
+    def setup(self):
+        for root in self.roots:
+            if os.path.isdir(root):
+                self._add_tree(root, emit_files=False)
+        print(f"👀 inotify watching {len(self._wds)} folders")
+
+    def _add_tree(self, top, emit_files):
+        if self.exclude(top):
+            return
+        for directory, files in _walk_dirs(top, self.exclude):
+            self._add_watch(directory)
+            # Files created before the watch existed would otherwise be missed
+            if emit_files:
+                for entry in files:
+                    if self.accept(entry.path):
+                        self.changes.put(entry.path)
+
+    def _add_watch(self, directory):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC and not self._limit_warned:
+                self._limit_warned = True
+                print("⚠ inotify watch limit reached (fs.inotify.max_user_watches), "
+                      "some folders are not watched")
+            return
+        self._dirs[wd] = directory
+        self._wds[directory] = wd
+
+    def _forget_tree(self, top):
+        prefix = top + os.sep
+        for directory in [d for d in self._wds if d == top or d.startswith(prefix)]:
+            wd = self._wds.pop(directory)
+            self._dirs.pop(wd, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def run(self, stop):
+        try:
+            while not stop.is_set():
+                ready, _, _ = select.select([self._fd], [], [], 0.5)
+                if not ready:
+                    continue
+                try:
+                    data = os.read(self._fd, 1 << 20)
+                except BlockingIOError:
+                    continue
+                self._handle(data)
+        finally:
+            os.close(self._fd)
+
+    def _handle(self, data):
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+            offset += _EVENT.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                self.changes.overflow()
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                if self._wds.get(directory) == wd:
+                    del self._wds[directory]
+                continue
+
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path, emit_files=True)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._forget_tree(path)
+                    self.changes.put(path, "deleted_dir")
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                if self.accept(path):
+                    self.changes.put(path, "deleted")
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                if self.accept(path):
+                    self.changes.put(path)
+
+
+class PollingWatcher:
+    """Fallback for platforms without inotify: diff periodic tree snapshots."""
+
+    def __init__(self, roots, changes, accept, exclude, interval=POLL_INTERVAL):
+        self.roots = roots
+        self.changes = changes
+        self.accept = accept
+        self.exclude = exclude
+        self.interval = interval
+        self._before = {}
+
+    def setup(self):
+        self._before = self._snapshot()
+        print(f"👀 Polling {len(self._before)} files every {self.interval:.0f}s")
+
+    def _snapshot(self):
+        snapshot = {}
+        for root in self.roots:
+            if not os.path.isdir(root) or self.exclude(root):
+                continue
+            for _, files in _walk_dirs(root, self.exclude):
+                for entry in files:
+                    if self.accept(entry.path):
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        snapshot[entry.path] = (st.st_size, st.st_mtime)
+        return snapshot
+
+    def run(self, stop):
+        while not stop.wait(self.interval):
+            now = self._snapshot()
+            for path, signature in now.items():
+                if self._before.get(path) != signature:
+                    self.changes.put(path)
+            for path in self._before.keys() - now.keys():
+                self.changes.put(path, "deleted")
+            self._before = now
+
+
+class Watcher:
+    """
+    Keeps the index fresh without rescanning whole drives.
+
+    Events under `roots` are filtered with `accept(path)` / `exclude(dir)`,
+    coalesced per path and debounced, then handed to
+    `apply(changed, deleted, deleted_dirs)` in batches on a single thread.
+    If the kernel event queue overflows, `rescan()` runs instead.
+    """
+
+    def __init__(self, roots, apply, accept, exclude, rescan=None, polling=False):
+        self.roots = list(roots)
+        self.apply = apply
+        self.rescan = rescan
+        self.changes = ChangeQueue()
+        self._stop = threading.Event()
+        self._threads = []
+
+        self.source = None
+        if not polling:
+            try:
+                self.source = InotifyWatcher(self.roots, self.changes, accept, exclude)
+            except OSError as e:
+                print(f"⚠ inotify unavailable ({e}), falling back to polling")
+        if self.source is None:
+            self.source = PollingWatcher(self.roots, self.changes, accept, exclude)
+
+    def start(self):
+        self.source.setup()
+        for target, name in ((self.source.run, "watch-events"), (self._flush_loop, "watch-index")):
+            thread = threading.Thread(target=target, args=(self._stop,), name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _flush_loop(self, stop):
+        while True:
+            drained = self.changes.drain(stop)
+            if drained is None:
+                return
+            changes, overflowed = drained
+            try:
+                if overflowed and self.rescan:
+                    print("⚠ Filesystem event queue overflowed, running an incremental rescan")
+                    self.rescan()
+                    continue
+                changed = [p for p, kind in changes.items() if kind == "changed"]
+                deleted = [p for p, kind in changes.items() if kind == "deleted"]
+                deleted_dirs = [p for p, kind in changes.items() if kind == "deleted_dir"]
+                print(f"👀 {len(changed)} changed, {len(deleted)} deleted files, "
+                      f"{len(deleted_dirs)} removed folders")
+                self.apply(changed, deleted, deleted_dirs)
+            except Exception:
+                traceback.print_exc()